@@ -0,0 +1,129 @@
+"""ledger balances and checkpoints
+
+Revision ID: 06f7330dce40
+Revises: 50d761edf515
+Create Date: 2026-10-18 07:27:52.754760
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "06f7330dce40"
+down_revision: Union[str, None] = "50d761edf515"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ("gold_ledger", "ml_ledger", "potion_ledger"):
+        op.execute(
+            f"ALTER TABLE {table} "
+            "ADD COLUMN IF NOT EXISTS created_at timestamptz NOT NULL DEFAULT now()"
+        )
+        op.create_index(f"ix_{table}_created_at", table, ["created_at"])
+
+    op.create_table(
+        "ledger_balances",
+        sa.Column("account", sa.String(), primary_key=True),
+        sa.Column("balance", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.create_table(
+        "ledger_checkpoints",
+        sa.Column("id", sa.Integer(), sa.Identity(), primary_key=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.Column("balances", postgresql.JSONB(), nullable=False),
+        sa.Column("gold_ledger_id", sa.BigInteger(), nullable=False),
+        sa.Column("ml_ledger_id", sa.BigInteger(), nullable=False),
+        sa.Column("potion_ledger_id", sa.BigInteger(), nullable=False),
+    )
+    op.create_index(
+        "ix_ledger_checkpoints_created_at", "ledger_checkpoints", ["created_at"]
+    )
+
+    # global_inventory and potion_inventory were the source of truth until now.
+    # Book opening adjustments so the ledgers sum to the same values.
+    op.execute(
+        """
+        INSERT INTO gold_ledger (gold)
+        SELECT gold - (SELECT COALESCE(SUM(gold), 0) FROM gold_ledger)
+        FROM global_inventory
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO ml_ledger (red_ml, green_ml, blue_ml, dark_ml)
+        SELECT
+            gi.red_ml - booked.red_ml,
+            gi.green_ml - booked.green_ml,
+            gi.blue_ml - booked.blue_ml,
+            gi.dark_ml - booked.dark_ml
+        FROM global_inventory AS gi, (
+            SELECT
+                COALESCE(SUM(red_ml), 0) AS red_ml,
+                COALESCE(SUM(green_ml), 0) AS green_ml,
+                COALESCE(SUM(blue_ml), 0) AS blue_ml,
+                COALESCE(SUM(dark_ml), 0) AS dark_ml
+            FROM ml_ledger
+        ) AS booked
+        """
+    )
+    op.execute(
+        """
+        WITH target AS (
+            SELECT
+                CASE (red, green, blue, dark)
+                    WHEN (100, 0, 0, 0) THEN 'RED_POTION_0'
+                    WHEN (0, 100, 0, 0) THEN 'GREEN_POTION_0'
+                    WHEN (0, 0, 100, 0) THEN 'BLUE_POTION_0'
+                    WHEN (0, 0, 0, 100) THEN 'DARK_POTION_0'
+                    ELSE red || '_' || green || '_' || blue || '_' || dark
+                END AS sku,
+                SUM(quantity) AS quantity
+            FROM potion_inventory
+            GROUP BY 1
+        ), booked AS (
+            SELECT sku, SUM(quantity) AS quantity FROM potion_ledger GROUP BY sku
+        )
+        INSERT INTO potion_ledger (sku, quantity)
+        SELECT
+            COALESCE(target.sku, booked.sku),
+            COALESCE(target.quantity, 0) - COALESCE(booked.quantity, 0)
+        FROM target FULL JOIN booked ON target.sku = booked.sku
+        WHERE COALESCE(target.quantity, 0) <> COALESCE(booked.quantity, 0)
+        """
+    )
+
+    op.execute(
+        """
+        INSERT INTO ledger_balances (account, balance)
+        SELECT 'gold', COALESCE(SUM(gold), 0) FROM gold_ledger
+        UNION ALL SELECT 'red_ml', COALESCE(SUM(red_ml), 0) FROM ml_ledger
+        UNION ALL SELECT 'green_ml', COALESCE(SUM(green_ml), 0) FROM ml_ledger
+        UNION ALL SELECT 'blue_ml', COALESCE(SUM(blue_ml), 0) FROM ml_ledger
+        UNION ALL SELECT 'dark_ml', COALESCE(SUM(dark_ml), 0) FROM ml_ledger
+        UNION ALL SELECT 'potions', COALESCE(SUM(quantity), 0) FROM potion_ledger
+        UNION ALL
+        SELECT 'potion:' || sku, SUM(quantity) FROM potion_ledger GROUP BY sku
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_ledger_checkpoints_created_at", table_name="ledger_checkpoints")
+    op.drop_table("ledger_checkpoints")
+    op.drop_table("ledger_balances")
+    for table in ("gold_ledger", "ml_ledger", "potion_ledger"):
+        op.drop_index(f"ix_{table}_created_at", table_name=table)
@@ -0,0 +1,56 @@
+"""add search indexes
+
+Revision ID: 105c5d76d870
+Revises: d891077e0d1e
+Create Date: 2026-10-18 07:23:29.704472
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "105c5d76d870"
+down_revision: Union[str, None] = "d891077e0d1e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Trigram indexes let ILIKE '%term%' filters in /carts/search/ use an index.
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_carts_customer_trgm",
+        "carts",
+        ["customer"],
+        postgresql_using="gin",
+        postgresql_ops={"customer": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_potions_sku_trgm",
+        "potions",
+        ["sku"],
+        postgresql_using="gin",
+        postgresql_ops={"sku": "gin_trgm_ops"},
+    )
+
+    # B-tree indexes for sorting by each search column and for the joins.
+    op.create_index("ix_carts_timestamp_id", "carts", ["timestamp", "id"])
+    op.create_index("ix_carts_customer_id", "carts", ["customer", "id"])
+    op.create_index("ix_potions_sku", "potions", ["sku"])
+    op.create_index("ix_cart_items_cart_id", "cart_items", ["cart_id"])
+    op.create_index("ix_cart_items_potion_id", "cart_items", ["potion_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_cart_items_potion_id", table_name="cart_items")
+    op.drop_index("ix_cart_items_cart_id", table_name="cart_items")
+    op.drop_index("ix_potions_sku", table_name="potions")
+    op.drop_index("ix_carts_customer_id", table_name="carts")
+    op.drop_index("ix_carts_timestamp_id", table_name="carts")
+    op.drop_index("ix_potions_sku_trgm", table_name="potions")
+    op.drop_index("ix_carts_customer_trgm", table_name="carts")
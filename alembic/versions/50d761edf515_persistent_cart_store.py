@@ -0,0 +1,64 @@
+"""persistent cart store
+
+Revision ID: 50d761edf515
+Revises: 105c5d76d870
+Create Date: 2026-10-18 07:25:48.963566
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "50d761edf515"
+down_revision: Union[str, None] = "105c5d76d870"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Cart lines are keyed by sku so set_item_quantity can upsert them.
+    op.add_column("cart_items", sa.Column("sku", sa.String(), nullable=True))
+    # Existing lines only know their potion_id; copy the sku across so order
+    # history stays visible to /carts/search/, which joins on it.
+    op.execute(
+        """
+        UPDATE cart_items
+        SET sku = potions.sku
+        FROM potions
+        WHERE potions.id = cart_items.potion_id
+        """
+    )
+    # Nothing kept old lines unique per sku; keep the newest of any repeats.
+    op.execute(
+        """
+        DELETE FROM cart_items AS older
+        USING cart_items AS newer
+        WHERE older.cart_id = newer.cart_id
+          AND older.sku = newer.sku
+          AND older.id < newer.id
+        """
+    )
+    op.create_unique_constraint(
+        "uq_cart_items_cart_sku", "cart_items", ["cart_id", "sku"]
+    )
+    op.create_index("ix_cart_items_sku", "cart_items", ["sku"])
+    op.drop_index("ix_cart_items_potion_id", table_name="cart_items")
+
+    op.add_column(
+        "carts",
+        sa.Column("checked_out_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("carts", "checked_out_at")
+    op.create_index("ix_cart_items_potion_id", "cart_items", ["potion_id"])
+    op.drop_index("ix_cart_items_sku", table_name="cart_items")
+    op.drop_constraint("uq_cart_items_cart_sku", "cart_items", type_="unique")
+    op.drop_column("cart_items", "sku")
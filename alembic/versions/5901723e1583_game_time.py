@@ -0,0 +1,57 @@
+"""game time
+
+Revision ID: 5901723e1583
+Revises: ca2e38b7fcd9
+Create Date: 2026-10-18 07:35:30.002744
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5901723e1583"
+down_revision: Union[str, None] = "ca2e38b7fcd9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+LEDGERS = ("gold_ledger", "ml_ledger", "potion_ledger")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "game_time",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), primary_key=True),
+        sa.Column("day", sa.String(), nullable=False),
+        sa.Column("hour", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    for table in LEDGERS:
+        op.add_column(
+            table,
+            sa.Column(
+                "tick_id",
+                sa.BigInteger(),
+                sa.ForeignKey("game_time.id"),
+                nullable=True,
+            ),
+        )
+        op.create_index(f"ix_{table}_tick_id", table, ["tick_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in LEDGERS:
+        op.drop_index(f"ix_{table}_tick_id", table_name=table)
+        op.drop_column(table, "tick_id")
+    op.drop_table("game_time")
@@ -0,0 +1,62 @@
+"""hot path indexes
+
+Revision ID: 8ee206b3a29a
+Revises: 9c17822932d6
+Create Date: 2026-10-18 07:49:00.640075
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8ee206b3a29a"
+down_revision: Union[str, None] = "9c17822932d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # IF NOT EXISTS throughout: databases whose schema was built by hand
+    # before c81d50202d57 and d891077e0d1e were filled in may already have
+    # some of these indexes. potion_inventory is indexed by b4fa1aba4cc9,
+    # which reshapes it into one row per mix.
+    op.create_index(
+        "ix_order_items_order_id", "order_items", ["order_id"], if_not_exists=True
+    )
+    op.create_index("ix_orders_cart_id", "orders", ["cart_id"], if_not_exists=True)
+    op.create_index(
+        "ix_orders_created_at", "orders", ["created_at"], if_not_exists=True
+    )
+
+    # The forecaster replays sales, the negative potion_ledger entries, by tick.
+    op.create_index(
+        "ix_potion_ledger_sales_by_tick",
+        "potion_ledger",
+        ["tick_id", "sku"],
+        postgresql_include=["quantity"],
+        postgresql_where=sa.text("quantity < 0"),
+        if_not_exists=True,
+    )
+    # potion_balances() reads in-stock accounts by their 'potion:' prefix.
+    op.create_index(
+        "ix_ledger_balances_potions_in_stock",
+        "ledger_balances",
+        ["account"],
+        postgresql_ops={"account": "text_pattern_ops"},
+        postgresql_where=sa.text("balance > 0"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_ledger_balances_potions_in_stock", table_name="ledger_balances")
+    op.drop_index("ix_potion_ledger_sales_by_tick", table_name="potion_ledger")
+    op.drop_index("ix_orders_created_at", table_name="orders")
+    op.drop_index("ix_orders_cart_id", table_name="orders")
+    op.drop_index("ix_order_items_order_id", table_name="order_items")
@@ -0,0 +1,52 @@
+"""capacity ledger
+
+Revision ID: 9c17822932d6
+Revises: dcc673b91de3
+Create Date: 2026-10-18 07:44:42.809637
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9c17822932d6"
+down_revision: Union[str, None] = "dcc673b91de3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "capacity_ledger",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), primary_key=True),
+        sa.Column("potion_capacity", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("ml_capacity", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "tick_id", sa.BigInteger(), sa.ForeignKey("game_time.id"), nullable=True
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    op.create_index("ix_capacity_ledger_created_at", "capacity_ledger", ["created_at"])
+    op.create_index("ix_capacity_ledger_tick_id", "capacity_ledger", ["tick_id"])
+    op.add_column(
+        "ledger_checkpoints",
+        sa.Column(
+            "capacity_ledger_id", sa.BigInteger(), nullable=False, server_default="0"
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("ledger_checkpoints", "capacity_ledger_id")
+    op.drop_table("capacity_ledger")
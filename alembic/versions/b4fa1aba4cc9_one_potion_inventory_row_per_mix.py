@@ -0,0 +1,72 @@
+"""one potion_inventory row per mix
+
+Revision ID: b4fa1aba4cc9
+Revises: 8ee206b3a29a
+Create Date: 2026-10-18 07:50:09.055856
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b4fa1aba4cc9"
+down_revision: Union[str, None] = "8ee206b3a29a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fold the row-per-delivery history into one row per mix, with the SKU the
+    # catalog sells it under.
+    op.execute(
+        """
+        WITH deliveries AS (
+            DELETE FROM potion_inventory
+            RETURNING red, green, blue, dark, quantity
+        )
+        INSERT INTO potion_inventory (sku, red, green, blue, dark, quantity)
+        SELECT
+            CASE (red, green, blue, dark)
+                WHEN (100, 0, 0, 0) THEN 'RED_POTION_0'
+                WHEN (0, 100, 0, 0) THEN 'GREEN_POTION_0'
+                WHEN (0, 0, 100, 0) THEN 'BLUE_POTION_0'
+                WHEN (0, 0, 0, 100) THEN 'DARK_POTION_0'
+                ELSE red || '_' || green || '_' || blue || '_' || dark
+            END,
+            red, green, blue, dark, SUM(quantity)
+        FROM deliveries
+        GROUP BY red, green, blue, dark
+        """
+    )
+
+    op.drop_constraint("potion_inventory_pkey", "potion_inventory", type_="primary")
+    op.drop_column("potion_inventory", "id")
+    op.create_primary_key(
+        "potion_inventory_pkey", "potion_inventory", ["red", "green", "blue", "dark"]
+    )
+    op.alter_column("potion_inventory", "sku", nullable=False)
+    op.create_unique_constraint("uq_potion_inventory_sku", "potion_inventory", ["sku"])
+    # The catalog lists the mixes with the most stock.
+    op.create_index(
+        "ix_potion_inventory_in_stock",
+        "potion_inventory",
+        [sa.text("quantity DESC")],
+        postgresql_where=sa.text("quantity > 0"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_potion_inventory_in_stock", table_name="potion_inventory")
+    op.drop_constraint("uq_potion_inventory_sku", "potion_inventory", type_="unique")
+    op.alter_column("potion_inventory", "sku", nullable=True)
+    op.drop_constraint("potion_inventory_pkey", "potion_inventory", type_="primary")
+    op.add_column(
+        "potion_inventory",
+        sa.Column("id", sa.Integer(), sa.Identity(), primary_key=True),
+    )
@@ -0,0 +1,67 @@
+"""visits and customers
+
+Revision ID: bbe712eb7d5e
+Revises: 5901723e1583
+Create Date: 2026-10-18 07:36:24.850680
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "bbe712eb7d5e"
+down_revision: Union[str, None] = "5901723e1583"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "customers",
+        sa.Column("customer_id", sa.String(), primary_key=True),
+        sa.Column("customer_name", sa.String(), nullable=False),
+        sa.Column("character_class", sa.String(), nullable=False),
+        sa.Column(
+            "first_seen_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    op.create_index("ix_customers_character_class", "customers", ["character_class"])
+
+    op.create_table(
+        "visits",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), primary_key=True),
+        sa.Column("visit_id", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "customer_id",
+            sa.String(),
+            sa.ForeignKey("customers.customer_id"),
+            nullable=False,
+        ),
+        sa.Column("level", sa.Integer(), nullable=False),
+        sa.Column(
+            "tick_id", sa.BigInteger(), sa.ForeignKey("game_time.id"), nullable=True
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.UniqueConstraint("visit_id", "customer_id", name="uq_visits_visit_customer"),
+    )
+    op.create_index("ix_visits_customer_id", "visits", ["customer_id"])
+    op.create_index("ix_visits_tick_id", "visits", ["tick_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("visits")
+    op.drop_table("customers")
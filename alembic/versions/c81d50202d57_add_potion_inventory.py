@@ -5,6 +5,7 @@ Revises: adc339eb53f9
 Create Date: 2025-04-14 17:31:12.420203
 
 """
+
 from typing import Sequence, Union
 
 from alembic import op
@@ -12,17 +13,37 @@ import sqlalchemy as sa
 
 
 # revision identifiers, used by Alembic.
-revision: str = 'c81d50202d57'
-down_revision: Union[str, None] = 'adc339eb53f9'
+revision: str = "c81d50202d57"
+down_revision: Union[str, None] = "adc339eb53f9"
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
     """Upgrade schema."""
-    pass
+    # This revision shipped empty and potion_inventory was created by hand, so
+    # databases already stamped at or past it never run this body; it only
+    # builds fresh databases. 8ee206b3a29a creates its indexes with IF NOT
+    # EXISTS so that it applies to both.
+    op.create_table(
+        "potion_inventory",
+        sa.Column("id", sa.Integer(), sa.Identity(), primary_key=True),
+        sa.Column("sku", sa.String(), nullable=True),
+        sa.Column("red", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("green", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("blue", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("dark", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("quantity", sa.Integer(), nullable=False, server_default="0"),
+        sa.CheckConstraint(
+            "red + green + blue + dark = 100",
+            name="ck_potion_inventory_mix_sums_to_100",
+        ),
+        sa.CheckConstraint(
+            "quantity >= 0", name="ck_potion_inventory_quantity_non_negative"
+        ),
+    )
 
 
 def downgrade() -> None:
     """Downgrade schema."""
-    pass
+    op.drop_table("potion_inventory")
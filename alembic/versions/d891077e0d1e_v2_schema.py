@@ -5,6 +5,7 @@ Revises: c81d50202d57
 Create Date: 2025-04-16 23:26:52.044815
 
 """
+
 from typing import Sequence, Union
 
 from alembic import op
@@ -12,17 +13,132 @@ import sqlalchemy as sa
 
 
 # revision identifiers, used by Alembic.
-revision: str = 'd891077e0d1e'
-down_revision: Union[str, None] = 'c81d50202d57'
+revision: str = "d891077e0d1e"
+down_revision: Union[str, None] = "c81d50202d57"
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
     """Upgrade schema."""
-    pass
+    # This revision shipped empty and the v2 tables were created by hand, so
+    # databases already stamped at or past it never run this body; it only
+    # builds fresh databases. 8ee206b3a29a creates its indexes with IF NOT
+    # EXISTS so that it applies to both.
+    op.add_column(
+        "global_inventory",
+        sa.Column("dark_ml", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_check_constraint(
+        "ck_dark_ml_non_negative", "global_inventory", "dark_ml >= 0"
+    )
+
+    op.create_table(
+        "barrel_inventory",
+        sa.Column("id", sa.Integer(), sa.Identity(), primary_key=True),
+        sa.Column("sku", sa.String(), nullable=False),
+        sa.Column("ml_per_barrel", sa.Integer(), nullable=False),
+        sa.Column("red", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("green", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("blue", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("dark", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("quantity", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    op.create_table(
+        "gold_ledger",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), primary_key=True),
+        sa.Column("gold", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "ml_ledger",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), primary_key=True),
+        sa.Column("red_ml", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("green_ml", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("blue_ml", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("dark_ml", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_table(
+        "potion_ledger",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), primary_key=True),
+        sa.Column("sku", sa.String(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+    )
+
+    op.create_table(
+        "potions",
+        sa.Column("id", sa.Integer(), sa.Identity(), primary_key=True),
+        sa.Column("sku", sa.String(), nullable=False, unique=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("price", sa.Integer(), nullable=False),
+        sa.Column("red", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("green", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("blue", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("dark", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    op.create_table(
+        "carts",
+        sa.Column("id", sa.Integer(), sa.Identity(), primary_key=True),
+        sa.Column("customer", sa.String(), nullable=False),
+        sa.Column(
+            "timestamp",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    op.create_table(
+        "cart_items",
+        sa.Column("id", sa.Integer(), sa.Identity(), primary_key=True),
+        sa.Column(
+            "cart_id",
+            sa.Integer(),
+            sa.ForeignKey("carts.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("potion_id", sa.Integer(), sa.ForeignKey("potions.id")),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.CheckConstraint("quantity > 0", name="ck_cart_items_quantity_positive"),
+    )
+
+    op.create_table(
+        "orders",
+        sa.Column("order_id", sa.Integer(), sa.Identity(), primary_key=True),
+        sa.Column("cart_id", sa.Integer(), nullable=False),
+        sa.Column("total_gold_paid", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    op.create_table(
+        "order_items",
+        sa.Column("id", sa.Integer(), sa.Identity(), primary_key=True),
+        sa.Column(
+            "order_id",
+            sa.Integer(),
+            sa.ForeignKey("orders.order_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("sku", sa.String(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("line_item_total", sa.Integer(), nullable=False),
+    )
 
 
 def downgrade() -> None:
     """Downgrade schema."""
-    pass
+    op.drop_table("order_items")
+    op.drop_table("orders")
+    op.drop_table("cart_items")
+    op.drop_table("carts")
+    op.drop_table("potions")
+    op.drop_table("potion_ledger")
+    op.drop_table("ml_ledger")
+    op.drop_table("gold_ledger")
+    op.drop_table("barrel_inventory")
+    op.drop_constraint("ck_dark_ml_non_negative", "global_inventory", type_="check")
+    op.drop_column("global_inventory", "dark_ml")
@@ -0,0 +1,37 @@
+"""potion prices
+
+Revision ID: dcc673b91de3
+Revises: bbe712eb7d5e
+Create Date: 2026-10-18 07:39:28.349581
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "dcc673b91de3"
+down_revision: Union[str, None] = "bbe712eb7d5e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "potion_prices",
+        sa.Column(
+            "tick_id", sa.BigInteger(), sa.ForeignKey("game_time.id"), nullable=False
+        ),
+        sa.Column("sku", sa.String(), nullable=False),
+        sa.Column("price", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("tick_id", "sku"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("potion_prices")
@@ -0,0 +1,44 @@
+"""search cart items by sku
+
+Revision ID: f2bac9b8f141
+Revises: b4fa1aba4cc9
+Create Date: 2026-10-18 08:26:23.704084
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2bac9b8f141"
+down_revision: Union[str, None] = "b4fa1aba4cc9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # /carts/search/ filters potions with cart_items.sku ILIKE '%term%' now
+    # that line items carry their SKU; nothing searches potions.sku anymore.
+    op.create_index(
+        "ix_cart_items_sku_trgm",
+        "cart_items",
+        ["sku"],
+        postgresql_using="gin",
+        postgresql_ops={"sku": "gin_trgm_ops"},
+    )
+    op.drop_index("ix_potions_sku_trgm", table_name="potions")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        "ix_potions_sku_trgm",
+        "potions",
+        ["sku"],
+        postgresql_using="gin",
+        postgresql_ops={"sku": "gin_trgm_ops"},
+    )
+    op.drop_index("ix_cart_items_sku_trgm", table_name="cart_items")
@@ -0,0 +1,237 @@
+"""
+Compares the NumPy knapsack barrel planner against the pure-Python knapsack
+and the greedy loop it replaced, on catalogs of 10 to 10,000 SKUs.
+
+Run from the repository root:
+
+    python -m benchmarks.barrel_plan
+"""
+
+import random
+import time
+from functools import reduce
+from math import gcd
+from typing import Callable, List
+
+from src.api.barrels import Barrel, BarrelOrder, create_barrel_plan
+
+ML_SIZES = [200, 500, 1000, 2500, 10000]
+COLORS = [
+    [1.0, 0, 0, 0],
+    [0, 1.0, 0, 0],
+    [0, 0, 1.0, 0],
+    [0, 0, 0, 1.0],
+]
+
+
+def greedy_barrel_plan(
+    gold: int,
+    max_barrel_capacity: int,
+    current_red_ml: int,
+    current_green_ml: int,
+    current_blue_ml: int,
+    current_dark_ml: int,
+    wholesale_catalog: List[Barrel],
+) -> List[BarrelOrder]:
+    """The previous planner: re-sort the catalog for every barrel bought."""
+    current_ml_list = [
+        current_red_ml,
+        current_green_ml,
+        current_blue_ml,
+        current_dark_ml,
+    ]
+    cur_sto = sum(current_ml_list)
+    remaining = {barrel.sku: barrel.quantity for barrel in wholesale_catalog}
+    buyList: List[BarrelOrder] = []
+
+    while True:
+        least_ml_index = current_ml_list.index(min(current_ml_list))
+        per_catalog = sorted(
+            wholesale_catalog,
+            key=lambda barrel: (
+                0
+                if barrel.price == 0
+                else -(
+                    (barrel.ml_per_barrel * barrel.potion_type[least_ml_index])
+                    / barrel.price
+                )
+            ),
+        )
+
+        bought = False
+        for barrel in per_catalog:
+            if (
+                gold < barrel.price
+                or cur_sto + barrel.ml_per_barrel > max_barrel_capacity
+                or remaining[barrel.sku] <= 0
+            ):
+                continue
+
+            for order in buyList:
+                if order.sku == barrel.sku:
+                    order.quantity += 1
+                    break
+            else:
+                buyList.append(BarrelOrder(sku=barrel.sku, quantity=1))
+
+            gold -= barrel.price
+            cur_sto += barrel.ml_per_barrel
+            for i in range(4):
+                current_ml_list[i] += int(barrel.ml_per_barrel * barrel.potion_type[i])
+            remaining[barrel.sku] -= 1
+            bought = True
+            break
+
+        if not bought:
+            break
+
+    return buyList
+
+
+def python_knapsack_plan(
+    gold: int,
+    max_barrel_capacity: int,
+    current_red_ml: int,
+    current_green_ml: int,
+    current_blue_ml: int,
+    current_dark_ml: int,
+    wholesale_catalog: List[Barrel],
+) -> List[BarrelOrder]:
+    """The previous planner: the same knapsack, one Python step per volume."""
+    free_ml = max_barrel_capacity - (
+        current_red_ml + current_green_ml + current_blue_ml + current_dark_ml
+    )
+    candidates = [
+        barrel
+        for barrel in wholesale_catalog
+        if barrel.quantity > 0
+        and barrel.price <= gold
+        and barrel.ml_per_barrel <= free_ml
+    ]
+    if not candidates:
+        return []
+
+    step = reduce(gcd, (barrel.ml_per_barrel for barrel in candidates))
+    slots = free_ml // step
+
+    # Barrels of the same size are interchangeable, so only the cheapest units
+    # up to what fits in the free capacity can appear in an optimal plan.
+    usable = [0] * len(candidates)
+    room_by_size: dict[int, int] = {}
+    for index in sorted(range(len(candidates)), key=lambda i: candidates[i].price):
+        barrel = candidates[index]
+        size = barrel.ml_per_barrel // step
+        room = room_by_size.setdefault(size, slots // size)
+        if barrel.price > 0:
+            room = min(room, gold // barrel.price)
+        usable[index] = min(barrel.quantity, room)
+        room_by_size[size] -= usable[index]
+
+    # Split each SKU's usable quantity into pieces of 1, 2, 4, ... barrels so
+    # the bounded knapsack becomes a 0/1 knapsack over O(log quantity) pieces.
+    pieces: List[tuple[int, int, int, int]] = []
+    for index, barrel in enumerate(candidates):
+        size = barrel.ml_per_barrel // step
+        remaining = usable[index]
+        copies = 1
+        while remaining > 0:
+            count = min(copies, remaining)
+            pieces.append((index, count, count * size, count * barrel.price))
+            remaining -= count
+            copies *= 2
+
+    unreachable = gold + 1
+    cost = [0] + [unreachable] * slots
+    taken: List[bytearray] = []
+    for _, _, size, price in pieces:
+        chosen = bytearray(slots + 1)
+        for volume in range(slots, size - 1, -1):
+            total = cost[volume - size] + price
+            if total < cost[volume]:
+                cost[volume] = total
+                chosen[volume] = 1
+        taken.append(chosen)
+
+    volume = max(v for v in range(slots + 1) if cost[v] <= gold)
+
+    quantities = [0] * len(candidates)
+    for (index, count, size, _), chosen in zip(reversed(pieces), reversed(taken)):
+        if chosen[volume]:
+            quantities[index] += count
+            volume -= size
+
+    return [
+        BarrelOrder(sku=barrel.sku, quantity=quantity)
+        for barrel, quantity in zip(candidates, quantities)
+        if quantity > 0
+    ]
+
+
+def make_catalog(skus: int, quantity: int, rng: random.Random) -> List[Barrel]:
+    catalog = []
+    for i in range(skus):
+        ml = rng.choice(ML_SIZES)
+        catalog.append(
+            Barrel(
+                sku=f"BARREL_{i}",
+                ml_per_barrel=ml,
+                potion_type=rng.choice(COLORS),
+                price=max(1, int(ml * rng.uniform(0.05, 0.4))),
+                quantity=quantity,
+            )
+        )
+    return catalog
+
+
+def run(
+    planner: Callable[..., List[BarrelOrder]],
+    catalog: List[Barrel],
+    gold: int,
+    capacity: int,
+) -> tuple[float, int, int]:
+    """Best of up to five runs, stopping early once a second has been spent."""
+    by_sku = {barrel.sku: barrel for barrel in catalog}
+    timings = []
+    while len(timings) < 5 and sum(timings) < 1:
+        start = time.perf_counter()
+        orders = planner(gold, capacity, 0, 0, 0, 0, catalog)
+        timings.append(time.perf_counter() - start)
+    elapsed = min(timings)
+    ml = sum(by_sku[o.sku].ml_per_barrel * o.quantity for o in orders)
+    spent = sum(by_sku[o.sku].price * o.quantity for o in orders)
+    return elapsed, ml, spent
+
+
+def main() -> None:
+    rng = random.Random(7)
+    planners = {
+        "greedy": greedy_barrel_plan,
+        "python knapsack": python_knapsack_plan,
+        "numpy knapsack": create_barrel_plan,
+    }
+    print(
+        f"{'skus':>6} {'qty':>5} {'capacity':>9} "
+        + " ".join(f"{name + ' ms':>18}" for name in planners)
+        + " "
+        + " ".join(f"{name + ' ml/gold':>23}" for name in planners)
+    )
+    for skus, quantity, gold, capacity in [
+        (10, 10, 1000, 10000),
+        (100, 100, 5000, 10000),
+        (500, 5000, 50000, 100000),
+        (10000, 100, 50000, 100000),
+    ]:
+        catalog = make_catalog(skus, quantity, rng)
+        results = [
+            run(planner, catalog, gold, capacity) for planner in planners.values()
+        ]
+        print(
+            f"{skus:>6} {quantity:>5} {capacity:>9} "
+            + " ".join(f"{elapsed * 1000:>18.2f}" for elapsed, _, _ in results)
+            + " "
+            + " ".join(f"{ml / max(spent, 1):>23.2f}" for _, ml, spent in results)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compares the closed-form bottle planner against the random-walk loop it
+replaced, for potion capacities from 50 to 10,000.
+
+Run from the repository root:
+
+    python -m benchmarks.bottle_plan
+"""
+
+import random
+import time
+from typing import List
+
+from src.api.bottler import PotionMixes, create_bottle_plan
+
+
+def random_walk_bottle_plan(
+    red_ml: int,
+    green_ml: int,
+    blue_ml: int,
+    dark_ml: int,
+    maximum_potion_capacity: int,
+    current_potion_inventory: List[PotionMixes],
+) -> List[PotionMixes]:
+    """The previous planner: build each bottle one random ml at a time."""
+    plan: List[PotionMixes] = []
+    ml_list = [red_ml, green_ml, blue_ml, dark_ml]
+    bottled = sum(potion.quantity for potion in current_potion_inventory)
+
+    while sum(ml_list) >= 100 and bottled < maximum_potion_capacity:
+        potion = [0, 0, 0, 0]
+        while sum(potion) != 100:
+            i = random.randint(0, 3)
+            if ml_list[i] > potion[i]:
+                potion[i] += 1
+
+        for i in range(4):
+            ml_list[i] -= potion[i]
+
+        for existing in plan:
+            if existing.potion_type == potion:
+                existing.quantity += 1
+                break
+        else:
+            plan.append(PotionMixes(potion_type=potion, quantity=1))
+        bottled += 1
+
+    return plan
+
+
+def main() -> None:
+    random.seed(7)
+    print(f"{'capacity':>9} {'random walk ms':>15} {'closed form ms':>15}")
+    for capacity in [50, 500, 2000, 10000]:
+        ml = {
+            "red_ml": 40 * capacity + 37,
+            "green_ml": 30 * capacity + 61,
+            "blue_ml": 20 * capacity + 5,
+            "dark_ml": 10 * capacity + 12,
+        }
+
+        start = time.perf_counter()
+        random_walk_bottle_plan(
+            **ml, maximum_potion_capacity=capacity, current_potion_inventory=[]
+        )
+        walk = time.perf_counter() - start
+
+        start = time.perf_counter()
+        create_bottle_plan(
+            **ml, maximum_potion_capacity=capacity, current_potion_inventory=[]
+        )
+        closed = time.perf_counter() - start
+
+        print(f"{capacity:>9} {walk * 1000:>15.2f} {closed * 1000:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
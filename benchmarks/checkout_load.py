@@ -0,0 +1,187 @@
+"""
+Load test for cart checkout: runs many concurrent carts through the set-based
+checkout and through the previous per-SKU implementation, and reports
+throughput and latency percentiles for each.
+
+This writes to the database in POSTGRES_URI (potion_inventory, orders,
+order_items, global_inventory gold) and cleans up afterwards. Run it against
+a scratch database:
+
+    python -m benchmarks.checkout_load [--carts 2000] [--workers 16] [--skus 6]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import sqlalchemy
+
+from src import database as db
+from src.api import carts
+from src.api.carts import CartCheckout, CheckoutResponse
+from src.cart_store import InMemoryCartStore
+
+SKU_PREFIX = "BENCH_SKU_"
+
+
+def legacy_checkout(cart_id: int, cart_checkout: CartCheckout) -> CheckoutResponse:
+    """The previous checkout: a SELECT, UPDATE and INSERT per SKU."""
+    cart = carts.store.get_items(cart_id) or {}
+    total_potions_bought = 0
+    total_gold_paid = 0
+
+    with db.engine.begin() as connection:
+        order_id = connection.execute(
+            sqlalchemy.text("""
+                INSERT INTO orders (cart_id, total_gold_paid, created_at)
+                VALUES (:cart_id, :total_gold_paid, :created_at)
+                RETURNING order_id
+            """),
+            {"cart_id": cart_id, "total_gold_paid": 0, "created_at": datetime.utcnow()},
+        ).scalar_one()
+
+        for sku, quantity in cart.items():
+            potion_inventory = connection.execute(
+                sqlalchemy.text("""
+                    SELECT quantity FROM potion_inventory WHERE sku = :sku
+                """),
+                {"sku": sku},
+            ).one()
+            connection.execute(
+                sqlalchemy.text("""
+                    UPDATE potion_inventory SET quantity = :new_quantity
+                    WHERE sku = :sku
+                """),
+                {"sku": sku, "new_quantity": potion_inventory.quantity - quantity},
+            )
+            connection.execute(
+                sqlalchemy.text("""
+                    INSERT INTO order_items (order_id, sku, quantity, line_item_total)
+                    VALUES (:order_id, :sku, :quantity, :line_item_total)
+                """),
+                {
+                    "order_id": order_id,
+                    "sku": sku,
+                    "quantity": quantity,
+                    "line_item_total": quantity * 50,
+                },
+            )
+            total_potions_bought += quantity
+            total_gold_paid += quantity * 50
+
+        connection.execute(
+            sqlalchemy.text("UPDATE global_inventory SET gold = gold + :added_gold"),
+            {"added_gold": total_gold_paid},
+        )
+
+    return CheckoutResponse(
+        total_potions_bought=total_potions_bought, total_gold_paid=total_gold_paid
+    )
+
+
+def seed(skus: int) -> int:
+    # Stock is one row per mix; the bench mixes carry 1 ml of dark so they
+    # stay clear of anything really bottled. At most 99 SKUs.
+    with db.engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.text("""
+                INSERT INTO potion_inventory (sku, red, green, blue, dark, quantity)
+                SELECT :prefix || n, n, 0, 99 - n, 1, 100000000
+                FROM generate_series(1, :skus) AS n
+            """),
+            {"prefix": SKU_PREFIX, "skus": skus},
+        )
+        return connection.execute(
+            sqlalchemy.text("SELECT gold FROM global_inventory")
+        ).scalar_one()
+
+
+def cleanup(gold: int) -> None:
+    with db.engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.text("""
+                DELETE FROM orders WHERE order_id IN (
+                    SELECT order_id FROM order_items WHERE sku LIKE :like
+                )
+            """),
+            {"like": f"{SKU_PREFIX}%"},
+        )
+        connection.execute(
+            sqlalchemy.text("DELETE FROM order_items WHERE sku LIKE :like"),
+            {"like": f"{SKU_PREFIX}%"},
+        )
+        connection.execute(
+            sqlalchemy.text("DELETE FROM potion_inventory WHERE sku LIKE :like"),
+            {"like": f"{SKU_PREFIX}%"},
+        )
+        connection.execute(
+            sqlalchemy.text("UPDATE global_inventory SET gold = :gold"),
+            {"gold": gold},
+        )
+
+
+async def run_async(checkout, cart_ids: list[int], workers: int) -> list[float]:
+    limit = asyncio.Semaphore(workers)
+
+    async def timed(cart_id: int) -> float:
+        async with limit:
+            started = time.perf_counter()
+            await checkout(cart_id, CartCheckout(payment="bench"))
+            return (time.perf_counter() - started) * 1000
+
+    return await asyncio.gather(*(timed(cart_id) for cart_id in cart_ids))
+
+
+def run(checkout, cart_count: int, workers: int, skus: int) -> None:
+    cart_ids = []
+    for i in range(cart_count):
+        cart_id = carts.store.create("bench")
+        for n in range(1, skus + 1):
+            carts.store.set_item_quantity(cart_id, f"{SKU_PREFIX}{n}", 1 + (i + n) % 3)
+        cart_ids.append(cart_id)
+
+    start = time.perf_counter()
+    if asyncio.iscoroutinefunction(checkout):
+        latencies = asyncio.run(run_async(checkout, cart_ids, workers))
+    else:
+
+        def timed(cart_id: int) -> float:
+            started = time.perf_counter()
+            checkout(cart_id, CartCheckout(payment="bench"))
+            return (time.perf_counter() - started) * 1000
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            latencies = list(pool.map(timed, cart_ids))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{checkout.__name__:<16} {cart_count / elapsed:>10.1f} {p50:>8.2f} {p99:>8.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carts", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--skus", type=int, default=6)
+    args = parser.parse_args()
+
+    # Carts are kept in memory so only checkout itself is measured.
+    carts.store = InMemoryCartStore()
+    gold = seed(args.skus)
+    try:
+        print(f"{'checkout':<16} {'carts/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+        run(legacy_checkout, args.carts, args.workers, args.skus)
+        run(carts.checkout, args.carts, args.workers, args.skus)
+    finally:
+        cleanup(gold)
+
+
+if __name__ == "__main__":
+    main()
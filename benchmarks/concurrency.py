@@ -0,0 +1,82 @@
+"""
+Fires many simultaneous GET /catalog/ and GET /carts/search/ requests at one
+or more running servers and reports throughput and latency for each.
+
+To compare the async routes with the old sync ones, start a server from each
+build on different ports and pass both URLs:
+
+    python -m benchmarks.concurrency --url http://localhost:3000 \\
+        --url http://localhost:3001 --concurrency 200 --requests 5000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from src import config
+
+PATHS = {
+    "catalog": "/catalog/",
+    "search": "/carts/search/?sort_col=timestamp&sort_order=desc",
+}
+
+
+async def hammer(
+    client: httpx.AsyncClient, path: str, requests: int, concurrency: int
+) -> tuple[float, list[float], int]:
+    limit = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def one() -> float:
+        nonlocal errors
+        async with limit:
+            started = time.perf_counter()
+            response = await client.get(path)
+            if response.status_code != 200:
+                errors += 1
+            return (time.perf_counter() - started) * 1000
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one() for _ in range(requests)))
+    return time.perf_counter() - start, sorted(latencies), errors
+
+
+async def bench(urls: list[str], requests: int, concurrency: int) -> None:
+    headers = {"access_token": config.get_settings().API_KEY or ""}
+    limits = httpx.Limits(max_connections=concurrency)
+    print(
+        f"{'server':<26} {'endpoint':<8} {'req/s':>9} {'p50 ms':>8} "
+        f"{'p99 ms':>8} {'errors':>7}"
+    )
+    for url in urls:
+        async with httpx.AsyncClient(
+            base_url=url, headers=headers, limits=limits, timeout=60
+        ) as client:
+            for name, path in PATHS.items():
+                elapsed, latencies, errors = await hammer(
+                    client, path, requests, concurrency
+                )
+                p99 = latencies[int(len(latencies) * 0.99) - 1]
+                print(
+                    f"{url:<26} {name:<8} {requests / elapsed:>9.1f} "
+                    f"{statistics.median(latencies):>8.2f} {p99:>8.2f} {errors:>7}"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", action="append", default=[])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    asyncio.run(
+        bench(args.url or ["http://localhost:3000"], args.requests, args.concurrency)
+    )
+
+
+if __name__ == "__main__":
+    main()
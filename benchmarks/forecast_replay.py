@@ -0,0 +1,148 @@
+"""
+Replays a recorded order log through the demand forecaster and reports how
+well it predicts each tick's sales, next to a same-hour-yesterday baseline,
+along with the cost of updating the forecast and planning from it.
+
+The log is a CSV with columns tick_id, day, hour, sku, quantity, one row per
+SKU sold in a tick. To export one from the database:
+
+    \\copy (
+        SELECT g.id AS tick_id, g.day, g.hour, l.sku, -SUM(l.quantity) AS quantity
+        FROM potion_ledger l JOIN game_time g ON g.id = l.tick_id
+        WHERE l.quantity < 0
+        GROUP BY g.id, g.day, g.hour, l.sku
+        ORDER BY g.id
+    ) TO 'orders.csv' CSV HEADER
+
+Run from the repository root, with a synthetic log or a recorded one:
+
+    python -m benchmarks.forecast_replay
+    python -m benchmarks.forecast_replay --log orders.csv
+"""
+
+import argparse
+import csv
+import random
+import time
+from collections import defaultdict
+
+from src.api.bottler import create_bottle_plan
+from src.capacity import POTIONS_PER_UNIT
+from src.forecast import DemandForecaster
+from src.game_clock import Tick
+from src.recipes import registry
+
+DAYS = ["Hearthday", "Crownday", "Blesseday", "Soulday", "Edgeday", "Bloomday"]
+SKUS = ["RED_POTION_0", "GREEN_POTION_0", "BLUE_POTION_0", "50_0_50_0", "0_50_0_50"]
+
+Log = list[tuple[Tick, dict[str, int]]]
+
+
+def synthetic_log(days: int, seed: int = 7) -> Log:
+    """A tick every two game hours, with each SKU busiest at its own hour."""
+    rng = random.Random(seed)
+    peaks = {sku: rng.randrange(0, 24, 2) for sku in SKUS}
+    log: Log = []
+    tick_id = 0
+    for day in range(days):
+        for hour in range(0, 24, 2):
+            tick_id += 1
+            sales = {}
+            for sku in SKUS:
+                distance = min(abs(hour - peaks[sku]), 24 - abs(hour - peaks[sku]))
+                mean = 1 + 6 * max(0, 1 - distance / 6)
+                sold = sum(rng.random() < mean / 10 for _ in range(10))
+                if sold:
+                    sales[sku] = sold
+            log.append((Tick(tick_id, DAYS[day % len(DAYS)], hour), sales))
+    return log
+
+
+def read_log(path: str) -> Log:
+    ticks: dict[int, tuple[Tick, dict[str, int]]] = {}
+    with open(path, newline="") as log_file:
+        for row in csv.DictReader(log_file):
+            tick_id = int(row["tick_id"])
+            if tick_id not in ticks:
+                ticks[tick_id] = (Tick(tick_id, row["day"], int(row["hour"])), {})
+            ticks[tick_id][1][row["sku"]] = int(row["quantity"])
+    return [ticks[tick_id] for tick_id in sorted(ticks)]
+
+
+def replay(log: Log, alpha: float, warmup_ticks: int) -> None:
+    demand = DemandForecaster(alpha=alpha)
+    skus = sorted({sku for _, sales in log for sku in sales})
+    last_same_hour: dict[int, dict[str, int]] = defaultdict(dict)
+
+    errors = {"forecast": 0.0, "same hour yesterday": 0.0}
+    actual_total = 0
+    update_seconds = read_seconds = plan_seconds = 0.0
+    updates = reads = plans = 0
+
+    for index, (tick, sales) in enumerate(log):
+        start = time.perf_counter()
+        demand.advance(tick)
+        expected = demand.forecast_mix(tick.hour)
+        read_seconds += time.perf_counter() - start
+        reads += 1
+
+        target_mix = {
+            recipe.potion_type: units
+            for sku, units in expected.items()
+            if (recipe := registry.for_sku(sku)) is not None
+        }
+        start = time.perf_counter()
+        create_bottle_plan(
+            red_ml=5000,
+            green_ml=5000,
+            blue_ml=5000,
+            dark_ml=5000,
+            maximum_potion_capacity=POTIONS_PER_UNIT,
+            current_potion_inventory=[],
+            target_mix=target_mix,
+        )
+        plan_seconds += time.perf_counter() - start
+        plans += 1
+
+        if index >= warmup_ticks:
+            previous = last_same_hour[tick.hour]
+            for sku in skus:
+                actual = sales.get(sku, 0)
+                actual_total += actual
+                errors["forecast"] += abs(expected.get(sku, 0.0) - actual)
+                errors["same hour yesterday"] += abs(previous.get(sku, 0) - actual)
+        last_same_hour[tick.hour] = sales
+
+        # Checkouts arrive one order at a time; replay each unit as its own
+        # order to measure the per-checkout update.
+        for sku, quantity in sales.items():
+            for _ in range(quantity):
+                start = time.perf_counter()
+                demand.record_sales(tick, {sku: 1})
+                update_seconds += time.perf_counter() - start
+                updates += 1
+
+    scored = max(len(log) - warmup_ticks, 0)
+    print(f"ticks: {len(log)} (scored {scored}), skus: {len(skus)}, alpha: {alpha}")
+    for name, error in errors.items():
+        wape = error / actual_total if actual_total else 0.0
+        print(f"  {name:22} WAPE {wape:6.1%}")
+    print(f"  record_sales      {update_seconds / max(updates, 1) * 1e6:8.2f} us/order")
+    print(f"  forecast_mix      {read_seconds / max(reads, 1) * 1e6:8.2f} us/read")
+    print(f"  create_bottle_plan {plan_seconds / max(plans, 1) * 1e6:7.2f} us/plan")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--log", help="CSV order log; synthetic if omitted")
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--alpha", type=float, default=0.3)
+    parser.add_argument("--warmup-ticks", type=int, default=24)
+    args = parser.parse_args()
+
+    log = read_log(args.log) if args.log else synthetic_log(args.days)
+    replay(log, alpha=args.alpha, warmup_ticks=args.warmup_ticks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Per-call cost of the diagnostics on the /carts and /barrels/plan paths:
+the f-string prints they used to do against the level-gated queue logging
+that replaced them.
+
+Run from the repository root:
+
+    python -m benchmarks.logging_overhead
+"""
+
+import contextlib
+import logging
+import os
+import time
+from typing import Callable
+
+from src import log
+from src.api.barrels import Barrel
+
+CALLS = 20_000
+
+
+def make_catalog(size: int) -> list[Barrel]:
+    return [
+        Barrel(
+            sku=f"BARREL_{i}",
+            ml_per_barrel=500,
+            potion_type=[1.0, 0, 0, 0],
+            price=100,
+            quantity=10,
+        )
+        for i in range(size)
+    ]
+
+
+def per_call_us(fn: Callable[[], None], calls: int = CALLS) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main() -> None:
+    carts = {i: {"RED_POTION_0": i % 5} for i in range(1000)}
+    catalog = make_catalog(20)
+    logger = logging.getLogger("src.benchmark")
+
+    with open(os.devnull, "w") as devnull:
+        log.configure(level="INFO", stream=devnull)
+        with contextlib.redirect_stdout(devnull):
+            scenarios = [
+                (
+                    "carts: print(carts dict, 1000 carts)",
+                    lambda: print(f"cart_id: 1, item_sku: RED, carts: {carts}"),
+                ),
+                (
+                    "carts: logger.debug at INFO",
+                    lambda: logger.debug("cart %s: set %s to %s", 1, "RED", 2),
+                ),
+                (
+                    "barrels/plan: print(catalog, 20 barrels)",
+                    lambda: print(f"barrel catalog: {catalog}"),
+                ),
+                (
+                    "barrels/plan: logger.debug at INFO",
+                    lambda: logger.debug("barrel catalog: %s", catalog),
+                ),
+                (
+                    "enabled logger.info (queued)",
+                    lambda: logger.info("barrels delivered: %s order_id: %s", 3, 1),
+                ),
+            ]
+            results = [(name, per_call_us(fn, CALLS)) for name, fn in scenarios]
+        log.shutdown()
+
+    for name, us in results:
+        print(f"{name:45} {us:10.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
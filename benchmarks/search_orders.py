@@ -0,0 +1,140 @@
+"""
+Seeds carts, cart_items and potions with about 1M line items and times
+/carts/search/ for several filter, sort and page combinations.
+
+This writes to the database in POSTGRES_URI. Point it at a scratch database
+that has been migrated with `alembic upgrade head`, then run:
+
+    python -m benchmarks.search_orders [--line-items 1000000] [--keep]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import sqlalchemy
+
+from src import database as db
+from src.api.carts import SearchSortOptions, SearchSortOrder, search_orders
+
+CUSTOMER_PREFIX = "bench_customer_"
+SKU_PREFIX = "BENCH_"
+
+
+def seed(line_items: int) -> None:
+    carts = max(line_items // 3, 1)
+    with db.engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.text(
+                """
+                INSERT INTO potions (sku, price)
+                SELECT :sku_prefix || n, 10 + n
+                FROM generate_series(1, 50) AS n
+                """
+            ),
+            {"sku_prefix": SKU_PREFIX},
+        )
+        connection.execute(
+            sqlalchemy.text(
+                """
+                INSERT INTO carts (customer, timestamp)
+                SELECT :customer_prefix || (n % 20000),
+                       now() - (n || ' seconds')::interval
+                FROM generate_series(1, :carts) AS n
+                """
+            ),
+            {"customer_prefix": CUSTOMER_PREFIX, "carts": carts},
+        )
+        connection.execute(
+            sqlalchemy.text(
+                """
+                INSERT INTO cart_items (cart_id, potion_id, quantity)
+                SELECT carts.id, potions.id, 1 + (random() * 4)::int
+                FROM (
+                    SELECT id, row_number() OVER () AS rn
+                    FROM carts WHERE customer LIKE :customer_like
+                ) AS carts
+                CROSS JOIN generate_series(1, 3) AS item
+                JOIN (
+                    SELECT id, row_number() OVER (ORDER BY id) - 1 AS rn
+                    FROM potions WHERE sku LIKE :sku_like
+                ) AS potions ON potions.rn = (carts.rn * 3 + item) % 50
+                LIMIT :line_items
+                """
+            ),
+            {
+                "customer_like": f"{CUSTOMER_PREFIX}%",
+                "sku_like": f"{SKU_PREFIX}%",
+                "line_items": line_items,
+            },
+        )
+        connection.execute(sqlalchemy.text("ANALYZE carts, cart_items, potions"))
+
+
+def cleanup() -> None:
+    with db.engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.text(
+                """
+                DELETE FROM cart_items
+                USING carts
+                WHERE cart_items.cart_id = carts.id AND carts.customer LIKE :customer_like
+                """
+            ),
+            {"customer_like": f"{CUSTOMER_PREFIX}%"},
+        )
+        connection.execute(
+            sqlalchemy.text("DELETE FROM carts WHERE customer LIKE :customer_like"),
+            {"customer_like": f"{CUSTOMER_PREFIX}%"},
+        )
+        connection.execute(
+            sqlalchemy.text("DELETE FROM potions WHERE sku LIKE :sku_like"),
+            {"sku_like": f"{SKU_PREFIX}%"},
+        )
+
+
+async def time_search(runs: int = 20, **kwargs) -> tuple[float, float]:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await search_orders(**kwargs)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+async def run_scenarios() -> None:
+    first = await search_orders()
+    scenarios = {
+        "default (timestamp desc)": {},
+        "next page": {"search_page": first.next or ""},
+        "customer filter": {"customerName": "customer_1234"},
+        "sku filter": {"potion_sku": "bench_4"},
+        "sort by total asc": {
+            "sort_col": SearchSortOptions.line_item_total,
+            "sort_order": SearchSortOrder.asc,
+        },
+        "sort by customer": {"sort_col": SearchSortOptions.customer_name},
+    }
+    print(f"{'scenario':<28} {'p50 ms':>8} {'max ms':>8}")
+    for name, kwargs in scenarios.items():
+        p50, worst = await time_search(**kwargs)
+        print(f"{name:<28} {p50:>8.2f} {worst:>8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--line-items", type=int, default=1_000_000)
+    parser.add_argument("--keep", action="store_true", help="keep seeded rows")
+    args = parser.parse_args()
+
+    seed(args.line_items)
+    try:
+        asyncio.run(run_scenarios())
+    finally:
+        if not args.keep:
+            cleanup()
+
+
+if __name__ == "__main__":
+    main()
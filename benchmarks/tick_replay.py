@@ -0,0 +1,402 @@
+"""
+Replays synthetic potion-exchange ticks against the API and reports latency
+percentiles and throughput for every endpoint the exchange calls.
+
+Each tick posts the time, polls the catalog, plans and takes delivery of
+barrels and bottles, posts the tick's visitors, and then runs that many
+customers through create cart / set item / checkout, --concurrency at a time.
+
+By default a server is started on a free port against POSTGRES_URI (the
+queries are Postgres-specific, so there is no SQLite stand-in); pass --url to
+target one that is already running. The game state is reset first, so point
+it at a scratch database:
+
+    python -m benchmarks.tick_replay --migrate --ticks 24 --customers 50
+    python -m benchmarks.tick_replay --url http://localhost:3000
+
+With --thresholds the run fails (exit status 1) if any endpoint's p95/p99 or
+the error rate is above the limits in the file; --write-thresholds records
+the current run, with headroom, as the new limits.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Iterator
+
+import httpx
+
+from src import config
+
+DAYS = ["Hearthday", "Crownday", "Blesseday", "Soulday", "Edgeday", "Bloomday"]
+CLASSES = ["Wizard", "Warrior", "Rogue", "Cleric", "Druid", "Bard"]
+WHOLESALE_CATALOG = [
+    {
+        "sku": f"{size}_{color}_BARREL",
+        "ml_per_barrel": ml,
+        "potion_type": potion_type,
+        "price": price,
+        "quantity": 10,
+    }
+    for color, potion_type in [
+        ("RED", [1.0, 0, 0, 0]),
+        ("GREEN", [0, 1.0, 0, 0]),
+        ("BLUE", [0, 0, 1.0, 0]),
+        ("DARK", [0, 0, 0, 1.0]),
+    ]
+    for size, ml, price in [("SMALL", 500, 100), ("MEDIUM", 2500, 250)]
+]
+DEFAULT_THRESHOLDS = os.path.join(
+    os.path.dirname(__file__), "tick_replay_thresholds.json"
+)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.rejected: dict[str, int] = defaultdict(int)
+        self.unanswered: dict[str, int] = defaultdict(int)
+
+    async def call(
+        self,
+        client: httpx.AsyncClient,
+        endpoint: str,
+        method: str,
+        path: str,
+        **kwargs,
+    ) -> httpx.Response | None:
+        """Times one request. 5xx and transport failures count as errors."""
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.unanswered[endpoint] += 1
+            self.errors[endpoint] += 1
+            return None
+        self.latencies[endpoint].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 500:
+            self.errors[endpoint] += 1
+            return None
+        if response.status_code >= 400:
+            self.rejected[endpoint] += 1
+            return None
+        return response
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of values sorted ascending."""
+    if not values:
+        return 0.0
+    return values[max(0, min(len(values) - 1, round(fraction * len(values)) - 1))]
+
+
+async def customer(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    limit: asyncio.Semaphore,
+    rng: random.Random,
+    visitor: dict,
+    skus: list[str],
+) -> None:
+    async with limit:
+        response = await recorder.call(
+            client, "POST /carts/", "POST", "/carts/", json=visitor
+        )
+        if response is None or not skus:
+            return
+        cart_id = response.json()["cart_id"]
+        for sku in rng.sample(skus, k=min(len(skus), rng.randint(1, 2))):
+            await recorder.call(
+                client,
+                "POST /carts/{cart_id}/items/{sku}",
+                "POST",
+                f"/carts/{cart_id}/items/{sku}",
+                json={"quantity": rng.randint(1, 3)},
+            )
+        await recorder.call(
+            client,
+            "POST /carts/{cart_id}/checkout",
+            "POST",
+            f"/carts/{cart_id}/checkout",
+            json={"payment": "gold"},
+        )
+
+
+async def replay_tick(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    rng: random.Random,
+    tick: int,
+    customers: int,
+    concurrency: int,
+    order_ids: Iterator[int],
+) -> None:
+    day, hour = DAYS[tick // 12 % len(DAYS)], tick % 12 * 2
+    await recorder.call(
+        client,
+        "POST /info/current_time",
+        "POST",
+        "/info/current_time",
+        json={"day": day, "hour": hour},
+    )
+
+    plan = await recorder.call(
+        client, "POST /barrels/plan", "POST", "/barrels/plan", json=WHOLESALE_CATALOG
+    )
+    if plan is not None and plan.json():
+        by_sku = {barrel["sku"]: barrel for barrel in WHOLESALE_CATALOG}
+        delivered = [
+            {**by_sku[order["sku"]], "quantity": order["quantity"]}
+            for order in plan.json()
+        ]
+        await recorder.call(
+            client,
+            "POST /barrels/deliver/{order_id}",
+            "POST",
+            f"/barrels/deliver/{next(order_ids)}",
+            json=delivered,
+        )
+
+    plan = await recorder.call(client, "POST /bottler/plan", "POST", "/bottler/plan")
+    if plan is not None and plan.json():
+        await recorder.call(
+            client,
+            "POST /bottler/deliver/{order_id}",
+            "POST",
+            f"/bottler/deliver/{next(order_ids)}",
+            json=plan.json(),
+        )
+
+    catalog = None
+    for _ in range(3):
+        catalog = await recorder.call(client, "GET /catalog/", "GET", "/catalog/")
+    skus = [item["sku"] for item in catalog.json()] if catalog is not None else []
+
+    visitors = [
+        {
+            "customer_id": f"customer-{rng.randrange(5000)}",
+            "customer_name": f"Customer {tick}-{i}",
+            "character_class": rng.choice(CLASSES),
+            "level": rng.randint(1, 20),
+        }
+        for i in range(customers)
+    ]
+    await recorder.call(
+        client,
+        "POST /carts/visits/{visit_id}",
+        "POST",
+        f"/carts/visits/{next(order_ids)}",
+        json=visitors,
+    )
+
+    limit = asyncio.Semaphore(concurrency)
+    await asyncio.gather(
+        *(customer(client, recorder, limit, rng, visitor, skus) for visitor in visitors)
+    )
+    await recorder.call(client, "GET /inventory/audit", "GET", "/inventory/audit")
+
+
+async def run(url: str, args: argparse.Namespace) -> tuple[Recorder, float]:
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    # Start order ids past anything an earlier run used; deliveries with a
+    # seen order id would be answered from processed_requests.
+    order_ids = itertools.count(int(time.time() * 1000))
+    headers = {"access_token": config.get_settings().API_KEY or ""}
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+
+    async with httpx.AsyncClient(
+        base_url=url, headers=headers, limits=limits, timeout=60
+    ) as client:
+        response = await client.post("/admin/reset")
+        response.raise_for_status()
+        start = time.perf_counter()
+        for tick in range(args.ticks):
+            await replay_tick(
+                client,
+                recorder,
+                rng,
+                tick,
+                args.customers,
+                args.concurrency,
+                order_ids,
+            )
+        elapsed = time.perf_counter() - start
+    return recorder, elapsed
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict[str, dict[str, float]]:
+    summary = {}
+    for endpoint in sorted(recorder.latencies.keys() | recorder.errors.keys()):
+        latencies = sorted(recorder.latencies[endpoint])
+        calls = len(latencies) + recorder.unanswered[endpoint]
+        summary[endpoint] = {
+            "requests": calls,
+            "req_per_s": calls / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "rejected": recorder.rejected[endpoint],
+            "errors": recorder.errors[endpoint],
+        }
+    return summary
+
+
+def report(summary: dict[str, dict[str, float]], elapsed: float) -> None:
+    print(
+        f"{'endpoint':<36} {'requests':>8} {'req/s':>8} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'p99 ms':>8} {'4xx':>5} {'errors':>6}"
+    )
+    for endpoint, row in summary.items():
+        print(
+            f"{endpoint:<36} {row['requests']:>8} {row['req_per_s']:>8.1f} "
+            f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+            f"{row['rejected']:>5} {row['errors']:>6}"
+        )
+    total = sum(row["requests"] for row in summary.values())
+    print(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+
+
+def check_thresholds(summary: dict[str, dict[str, float]], path: str) -> list[str]:
+    """
+    The threshold file looks like
+        {"max_error_rate": 0.01,
+         "endpoints": {"GET /catalog/": {"p95_ms": 40, "p99_ms": 80}, ...}}
+    Endpoints missing from the file are not checked.
+    """
+    with open(path) as threshold_file:
+        thresholds = json.load(threshold_file)
+
+    failures = []
+    for endpoint, limits in thresholds.get("endpoints", {}).items():
+        row = summary.get(endpoint)
+        if row is None:
+            continue
+        for metric, limit in limits.items():
+            if row[metric] > limit:
+                failures.append(f"{endpoint} {metric} {row[metric]:.2f} > {limit}")
+
+    requests = sum(row["requests"] for row in summary.values())
+    errors = sum(row["errors"] for row in summary.values())
+    max_error_rate = thresholds.get("max_error_rate", 0.0)
+    if requests and errors / requests > max_error_rate:
+        failures.append(f"error rate {errors / requests:.2%} > {max_error_rate:.2%}")
+    return failures
+
+
+def write_thresholds(
+    summary: dict[str, dict[str, float]], path: str, headroom: float
+) -> None:
+    thresholds = {
+        "max_error_rate": 0.0,
+        "endpoints": {
+            endpoint: {
+                "p95_ms": round(row["p95_ms"] * headroom, 1),
+                "p99_ms": round(row["p99_ms"] * headroom, 1),
+            }
+            for endpoint, row in summary.items()
+        },
+    }
+    with open(path, "w") as threshold_file:
+        json.dump(thresholds, threshold_file, indent=2)
+        threshold_file.write("\n")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    env = dict(os.environ)
+    # One API key drives every simulated client, so the per-key rate limit
+    # would measure itself rather than the server.
+    env.setdefault("API_RATE_LIMIT", "0")
+    if args.postgres_uri:
+        env["POSTGRES_URI"] = args.postgres_uri
+    if args.migrate:
+        subprocess.run(["alembic", "upgrade", "head"], check=True, env=env)
+
+    port = free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "src.api.server:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url + "/").status_code == 200:
+                return server, url
+        except httpx.HTTPError:
+            pass
+        if server.poll() is not None:
+            break
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--url", help="target a running server instead")
+    parser.add_argument("--postgres-uri", help="database for the started server")
+    parser.add_argument("--migrate", action="store_true", help="alembic upgrade first")
+    parser.add_argument("--ticks", type=int, default=12)
+    parser.add_argument("--customers", type=int, default=30, help="per tick")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--thresholds", nargs="?", const=DEFAULT_THRESHOLDS)
+    parser.add_argument("--write-thresholds", nargs="?", const=DEFAULT_THRESHOLDS)
+    parser.add_argument("--headroom", type=float, default=1.5)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_server(args)
+    try:
+        recorder, elapsed = asyncio.run(run(url, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    summary = summarize(recorder, elapsed)
+    report(summary, elapsed)
+
+    if args.write_thresholds:
+        write_thresholds(summary, args.write_thresholds, args.headroom)
+        print(f"wrote {args.write_thresholds}")
+    if args.thresholds:
+        failures = check_thresholds(summary, args.thresholds)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 from fastapi import APIRouter, Depends, status
-import sqlalchemy
-from src.api import auth
+from pydantic import BaseModel
+from typing import Dict, List
+import logging
+from src.api import auth, carts
+from src import cache
 from src import database as db
+from src import forecast, game_state, inventory_snapshot, ledger, recipes
+from src import metrics
 
 router = APIRouter(
     prefix="/admin",
@@ -9,6 +14,8 @@ router = APIRouter(
     dependencies=[Depends(auth.get_api_key)],
 )
 
+logger = logging.getLogger(__name__)
+
 
 @router.post("/reset", status_code=status.HTTP_204_NO_CONTENT)
 def reset():
@@ -18,29 +25,88 @@ def reset():
     """
 
     with db.engine.begin() as connection:
-        connection.execute(
-            sqlalchemy.text(
-                """
-                UPDATE global_inventory SET
-                gold = 100,
-                red_ml = 0,
-                green_ml = 0,
-                blue_ml = 0,
-                """
-            )
-        )
-        connection.execute(
-            sqlalchemy.text(
-                """
-                DELETE FROM potion_inventory
-                """
-            )
-        )
-        connection.execute(
-            sqlalchemy.text(
-                """
-                DELETE FROM barrel_inventory
-                """
-            )
-        )
+        tables = game_state.reset(connection)
+    logger.info("reset: truncated %s", ", ".join(tables))
+
+    # Everything this process remembers about the old state goes too.
+    cache.invalidate_all()
+    forecast.demand.invalidate()
+    inventory_snapshot.snapshot.invalidate()
+    carts.store.reset()
     return
+
+
+@router.post("/recipes/reload", status_code=status.HTTP_204_NO_CONTENT)
+def reload_recipes():
+    """
+    Re-reads the potions table into this worker's recipe registry so edited
+    recipes take effect at once; other workers pick them up within
+    recipes.RELOAD_SECONDS.
+    """
+    with db.engine.begin() as connection:
+        recipes.registry.load(connection)
+    # Cached catalogs, prices and plans were built from the old recipes.
+    cache.invalidate_all()
+
+
+class LedgerMismatch(BaseModel):
+    account: str
+    snapshot: int
+    ledger: int
+
+
+class LedgerConsistency(BaseModel):
+    consistent: bool
+    mismatches: List[LedgerMismatch]
+
+
+@router.get("/ledger/consistency", response_model=LedgerConsistency)
+def get_ledger_consistency():
+    """
+    Compares the ledger_balances snapshot with full sums over the ledger
+    tables and lists every account where they disagree.
+    """
+    with db.engine.begin() as connection:
+        mismatches = ledger.check_consistency(connection)
+
+    return LedgerConsistency(
+        consistent=not mismatches,
+        mismatches=[
+            LedgerMismatch(account=account, snapshot=snapshot, ledger=expected)
+            for account, (snapshot, expected) in sorted(mismatches.items())
+        ],
+    )
+
+
+class TimingStats(BaseModel):
+    count: int
+    total_ms: float
+    avg_ms: float
+    max_ms: float
+
+
+class PoolMetrics(BaseModel):
+    checked_out: int
+    checkouts: int
+    checkout_wait: TimingStats
+
+
+class StatementMetrics(TimingStats):
+    statement: str
+
+
+class DatabaseMetrics(BaseModel):
+    pools: Dict[str, PoolMetrics]
+    statements: List[StatementMetrics]
+
+
+@router.get("/metrics", response_model=DatabaseMetrics)
+def get_metrics(reset: bool = False):
+    """
+    Connection pool usage and per-statement latency since the process
+    started or since the last call with reset=true.
+    """
+    snapshot = metrics.snapshot()
+    if reset:
+        metrics.reset()
+    return snapshot
@@ -1,16 +1,140 @@
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+from typing import Iterable
+
 from src import config
 from fastapi import Security, HTTPException, status, Request
 from fastapi.security.api_key import APIKeyHeader
 
-api_key = config.get_settings().API_KEY
 api_key_header = APIKeyHeader(name="access_token", auto_error=False)
 
+logger = logging.getLogger(__name__)
+
+# How often API_KEYS_FILE is checked for changes.
+KEYS_FILE_CHECK_SECONDS = 5.0
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.sha256(key.encode()).digest()
+
+
+class KeyRing:
+    """
+    SHA-256 digests of the accepted API keys. Keys are hashed once, so a
+    check costs one hash of the presented key plus a constant-time compare
+    against each digest.
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.digests = tuple({_digest(key) for key in keys if key})
+
+    def match(self, presented: str | None) -> bytes | None:
+        """Returns the digest of the matching key, or None."""
+        if not presented:
+            return None
+        digest = _digest(presented)
+        matched = None
+        # Compare against every key so the time taken doesn't depend on
+        # which key (if any) matched.
+        for known in self.digests:
+            if hmac.compare_digest(digest, known):
+                matched = known
+        return matched
+
+
+class RateLimiter:
+    """
+    Token buckets kept in memory per API key: each key may burst up to
+    burst requests and refills at rate requests per second. A rate of 0
+    disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[bytes, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: bytes, now: float | None = None) -> float:
+        """Takes a token. Returns 0 on success, else seconds until one frees up."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+
+
+def _configured_keys(settings: config.Settings, read_file: bool = True) -> list[str]:
+    keys = [settings.API_KEY, *settings.API_KEYS.split(",")]
+    if settings.API_KEYS_FILE and read_file:
+        with open(settings.API_KEYS_FILE) as keys_file:
+            keys.extend(keys_file.read().split())
+    return [key.strip() for key in keys if key and key.strip()]
+
+
+_settings = config.get_settings()
+try:
+    _keyring = KeyRing(_configured_keys(_settings))
+except OSError:
+    # Start with the other keys; _current_keyring picks the file up once it
+    # can be read.
+    logger.exception("could not read API_KEYS_FILE; starting without it")
+    _keyring = KeyRing(_configured_keys(_settings, read_file=False))
+_keys_file_mtime: float | None = None
+_keys_file_checked_at = time.monotonic()
+limiter = RateLimiter(_settings.API_RATE_LIMIT, _settings.API_RATE_BURST)
+
+
+def _current_keyring() -> KeyRing:
+    """
+    Rebuilds the key ring when API_KEYS_FILE changes, so keys can be rotated
+    without a restart. The file is looked at most every
+    KEYS_FILE_CHECK_SECONDS.
+    """
+    global _keyring, _keys_file_mtime, _keys_file_checked_at
+
+    if not _settings.API_KEYS_FILE:
+        return _keyring
+    now = time.monotonic()
+    if now - _keys_file_checked_at < KEYS_FILE_CHECK_SECONDS:
+        return _keyring
+    _keys_file_checked_at = now
+
+    try:
+        mtime = os.stat(_settings.API_KEYS_FILE).st_mtime
+        if mtime != _keys_file_mtime:
+            _keyring = KeyRing(_configured_keys(_settings))
+            _keys_file_mtime = mtime
+            logger.info("reloaded API keys from %s", _settings.API_KEYS_FILE)
+    except OSError:
+        logger.exception("could not reload API keys; keeping the current ones")
+    return _keyring
+
 
 async def get_api_key(request: Request, api_key_header: str = Security(api_key_header)):
-    print(f"api_key_header: {api_key_header}, api_key: {api_key}")
-    if api_key_header == api_key:
-        return api_key_header
-    else:
+    key = _current_keyring().match(api_key_header)
+    if key is None:
+        logger.warning("rejected request to %s: bad API key", request.url.path)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Forbidden"
         )
+
+    retry_after = limiter.acquire(key)
+    if retry_after:
+        logger.warning("rate limited request to %s", request.url.path)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+    return api_key_header
@@ -2,11 +2,13 @@ from dataclasses import dataclass
 from fastapi import APIRouter, Depends, status
 from pydantic import BaseModel, Field, field_validator
 from typing import List
-import random
+import logging
+
+import numpy as np
 
-import sqlalchemy
 from src.api import auth
 from src import database as db
+from src import capacity, idempotency, ledger, plan_cache
 
 
 router = APIRouter(
@@ -15,6 +17,12 @@ router = APIRouter(
     dependencies=[Depends(auth.get_api_key)],
 )
 
+logger = logging.getLogger(__name__)
+
+# Upper bound on pieces x ml steps in the knapsack table, about 16MB of
+# choices and a few tens of milliseconds to fill.
+MAX_TABLE_CELLS = 16_000_000
+
 
 class Barrel(BaseModel):
     sku: str
@@ -58,66 +66,163 @@ def post_deliver_barrels(barrels_delivered: List[Barrel], order_id: int):
     Processes barrels delivered based on the provided order_id. order_id is a unique value representing
     a single delivery; the call is idempotent based on the order_id.
     """
-    print(f"barrels delivered: {barrels_delivered} order_id: {order_id}")
+    logger.info("barrels delivered: %s order_id: %s", barrels_delivered, order_id)
 
     delivery = calculate_barrel_summary(barrels_delivered)
 
     red_ml = 0
     green_ml = 0
     blue_ml = 0
+    dark_ml = 0
 
     for barrel in barrels_delivered:
         total_ml = barrel.ml_per_barrel * barrel.quantity
         red_ml += total_ml * barrel.potion_type[0]
         green_ml += total_ml * barrel.potion_type[1]
         blue_ml += total_ml * barrel.potion_type[2]
+        dark_ml += total_ml * barrel.potion_type[3]
 
-    with db.engine.begin() as connection:
-        connection.execute(
-            sqlalchemy.text(
-                """
-                INSERT INTO gold_ledger (gold)
-                VALUES (:gold_spent)
-                """
-            ),
-            {"gold_spent": -delivery.gold_paid}
+    def deliver(connection):
+        ledger.post(
+            connection,
+            gold=-delivery.gold_paid,
+            ml=[int(red_ml), int(green_ml), int(blue_ml), int(dark_ml)],
         )
 
-        connection.execute(
-            sqlalchemy.text(
-                """
-                INSERT INTO ml_ledger (red_ml, green_ml, blue_ml, dark_ml)
-                VALUES (:red_ml, :green_ml, :blue_ml, :dark_ml)
-                """
-            ),
-            {
-                "red_ml": int(red_ml),
-                "green_ml": int(green_ml),
-                "blue_ml": int(blue_ml),
-                "dark_ml": 0
-            }
-        )
+    idempotency.run_once("barrels.deliver", order_id, deliver)
+
+
+def _split_into_pieces(
+    sizes: np.ndarray, prices: np.ndarray, stock: np.ndarray, gold: int, slots: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Splits each SKU's usable quantity into pieces of 1, 2, 4, ... barrels so
+    the bounded knapsack becomes a 0/1 knapsack over O(log quantity) pieces.
+    Returns (owning SKU, barrels) for every piece.
+    """
+    # Barrels of the same size are interchangeable, so only the cheapest units
+    # up to what fits in the free capacity can appear in an optimal plan.
+    # Walking each size from the cheapest SKU up, a SKU gets what is left of
+    # the room once its cheaper peers are counted, which is the difference of
+    # the capped running totals after and before it.
+    affordable = np.minimum(
+        stock, np.where(prices > 0, gold // np.maximum(prices, 1), stock)
+    )
+    order = np.lexsort((prices, sizes))
+    sorted_sizes = sizes[order]
+    running = np.cumsum(affordable[order])
+    group_starts = np.flatnonzero(np.r_[True, sorted_sizes[1:] != sorted_sizes[:-1]])
+    before_group = np.repeat(
+        np.r_[0, running[group_starts[1:] - 1]],
+        np.diff(np.r_[group_starts, len(order)]),
+    )
+    through = running - before_group
+    room = slots // sorted_sizes
+    usable = np.empty_like(stock)
+    usable[order] = np.minimum(through, room) - np.minimum(
+        through - affordable[order], room
+    )
+
+    bits = np.arange(int(usable.max()).bit_length(), dtype=np.int64)
+    copies = np.clip(usable[:, None] - ((1 << bits) - 1), 0, 1 << bits)
+    owner, bit = np.nonzero(copies)
+    return owner, copies[owner, bit]
 
-        connection.execute(
-            sqlalchemy.text(
-                """
-                UPDATE global_inventory SET
-                    gold = gold - :gold_paid,
-                    red_ml = red_ml + :red_ml,
-                    green_ml = green_ml + :green_ml,
-                    blue_ml = blue_ml + :blue_ml,
-                    dark_ml = dark_ml + :dark_ml
-                """
-            ),
-            {
-                "gold_paid": delivery.gold_paid,
-                "red_ml": int(red_ml),
-                "green_ml": int(green_ml),
-                "blue_ml": int(blue_ml),
-                "dark_ml": 0,
-            },
-        )
 
+def _fill(
+    ml: np.ndarray, prices: np.ndarray, stock: np.ndarray, gold: int, free_ml: int
+) -> np.ndarray:
+    """
+    Quantities of each barrel that add the most ml for at most gold without
+    going over free_ml, the cheapest such purchase when several tie.
+
+    This is a bounded knapsack over gold and ml. A barrel's value is its own
+    volume, so the table is indexed by ml (in steps of the gcd of the barrel
+    sizes) and holds the least gold needed to reach each volume. Catalogs
+    whose table would exceed MAX_TABLE_CELLS are planned in coarser steps
+    and topped up greedily, which stays within capacity and gold but may
+    fall slightly short of the best fill.
+    """
+    quantities = np.zeros(len(ml), dtype=np.int64)
+    candidates = np.flatnonzero((stock > 0) & (prices <= gold) & (ml <= free_ml))
+    if candidates.size == 0:
+        return quantities
+    prices, ml, stock = prices[candidates], ml[candidates], stock[candidates]
+
+    step = int(np.gcd.reduce(ml))
+    sizes = ml // step
+    owner, piece_copies = _split_into_pieces(
+        sizes, prices, stock, gold, free_ml // step
+    )
+    coarse = len(owner) * (free_ml // step + 1) > MAX_TABLE_CELLS
+    if coarse:
+        # Sizes with a small gcd make the table too big to fill. Count ml in
+        # coarser steps instead, rounding each barrel up to a whole step so
+        # a plan can never overflow. The ml that rounding leaves free is
+        # topped up after the table is read back.
+        step = -(-len(owner) * free_ml // MAX_TABLE_CELLS)
+        sizes = -(-ml // step)
+        owner, piece_copies = _split_into_pieces(
+            sizes, prices, stock, gold, free_ml // step
+        )
+    slots = free_ml // step
+    piece_sizes = piece_copies * sizes[owner]
+    piece_prices = piece_copies * prices[owner]
+
+    # Each piece relaxes the whole table at once: cost[v] against
+    # cost[v - size] + price, both read before the update, which is exactly
+    # the 0/1 (take the piece at most once) recurrence.
+    unreachable = gold + 1
+    cost = np.full(slots + 1, unreachable, dtype=np.int64)
+    cost[0] = 0
+    taken = np.zeros((len(owner), slots + 1), dtype=bool)
+    for piece, (size, price) in enumerate(
+        zip(piece_sizes.tolist(), piece_prices.tolist())
+    ):
+        with_piece = cost[: slots + 1 - size] + price
+        better = with_piece < cost[size:]
+        cost[size:][better] = with_piece[better]
+        taken[piece, size:] = better
+
+    volume = int(np.flatnonzero(cost <= gold).max())
+
+    bought = np.zeros(len(candidates), dtype=np.int64)
+    for piece in range(len(owner) - 1, -1, -1):
+        if taken[piece, volume]:
+            bought[owner[piece]] += piece_copies[piece]
+            volume -= int(piece_sizes[piece])
+
+    if coarse:
+        # Rounding sizes up left some real ml free; fill it largest first.
+        free_ml -= int(bought @ ml)
+        gold -= int(bought @ prices)
+        for index in np.argsort(-ml, kind="stable").tolist():
+            extra = min(int(stock[index] - bought[index]), free_ml // int(ml[index]))
+            if prices[index] > 0:
+                extra = min(extra, gold // int(prices[index]))
+            if extra > 0:
+                bought[index] += extra
+                free_ml -= extra * int(ml[index])
+                gold -= extra * int(prices[index])
+
+    quantities[candidates] = bought
+    return quantities
+
+
+def _shortfalls(levels: np.ndarray, free_ml: int) -> np.ndarray:
+    """
+    The ml each color should get before any other is topped up: enough to
+    bring every color level with the best-stocked one, or, when free_ml does
+    not stretch that far, to leave the short colors as level as it allows.
+    """
+    ordered = np.sort(levels)
+    # Water filling: the level the lowest k colors reach if free_ml is
+    # shared between them alone, for the first k that stays below the next.
+    for k in range(1, len(ordered) + 1):
+        level = (int(ordered[:k].sum()) + free_ml) // k
+        if k == len(ordered) or level <= ordered[k]:
+            break
+    return np.maximum(min(level, int(ordered[-1])) - levels, 0)
 
 
 def create_barrel_plan(
@@ -129,50 +234,63 @@ def create_barrel_plan(
     current_dark_ml: int,
     wholesale_catalog: List[Barrel],
 ) -> List[BarrelOrder]:
-    print(
-        f"gold: {gold}, max_barrel_capacity: {max_barrel_capacity}, current_red_ml: {current_red_ml}, current_green_ml: {current_green_ml}, current_blue_ml: {current_blue_ml}, wholesale_catalog: {wholesale_catalog}"
+    """
+    Picks barrels for the gold on hand without going over
+    max_barrel_capacity, in two rounds. First each color the catalog sells
+    in single-color barrels is brought up toward the best-stocked of those
+    colors, least stocked first, so the short colors get first call on the
+    gold even when their barrels are dearer. Then the room and gold left
+    over go to whatever adds the most ml, the cheapest such purchase when
+    several tie. Each round is solved exactly by _fill().
+    """
+    logger.debug(
+        "planning barrels: gold=%s max_barrel_capacity=%s ml=%s catalog=%s",
+        gold,
+        max_barrel_capacity,
+        [current_red_ml, current_green_ml, current_blue_ml, current_dark_ml],
+        wholesale_catalog,
     )
 
-
-
-    while True:
-        least_ml_index = current_ml_list.index(min(current_ml_list))
-        per_catalog = sorted(
-            wholesale_catalog,
-            key=lambda barrel: (
-                0 if barrel.price == 0 else -((barrel.ml_per_barrel * barrel.potion_type[least_ml_index]) / barrel.price)
-            )
-        )
-
-        bought = False
-        for barrel in per_catalog:
-            if (
-                gold < barrel.price
-                or cur_sto + barrel.ml_per_barrel > max_barrel_capacity
-                or barrel.quantity <= 0
-            ):
+    free_ml = max_barrel_capacity - (
+        current_red_ml + current_green_ml + current_blue_ml + current_dark_ml
+    )
+    if not wholesale_catalog or free_ml <= 0:
+        return []
+
+    # The catalog as arrays, built once.
+    count = len(wholesale_catalog)
+    prices = np.fromiter((b.price for b in wholesale_catalog), np.int64, count)
+    ml = np.fromiter((b.ml_per_barrel for b in wholesale_catalog), np.int64, count)
+    stock = np.fromiter((b.quantity for b in wholesale_catalog), np.int64, count)
+    mix = np.array([b.potion_type for b in wholesale_catalog])
+    # Mixed barrels only take part in the second round.
+    color = np.where(np.isclose(mix.max(axis=1), 1.0), mix.argmax(axis=1), -1)
+
+    levels = np.array(
+        [current_red_ml, current_green_ml, current_blue_ml, current_dark_ml]
+    )
+    sold = np.unique(color[(color >= 0) & (stock > 0)])
+    quantities = np.zeros(count, dtype=np.int64)
+    if sold.size > 1:
+        shortfalls = _shortfalls(levels[sold], free_ml)
+        for index in np.argsort(levels[sold], kind="stable").tolist():
+            if shortfalls[index] == 0:
                 continue
+            members = np.flatnonzero(color == sold[index])
+            bought = _fill(
+                ml[members], prices[members], stock[members], gold, shortfalls[index]
+            )
+            quantities[members] = bought
+            gold -= int(bought @ prices[members])
+            free_ml -= int(bought @ ml[members])
 
-            for order in buyList:
-                if order.sku == barrel.sku:
-                    order.quantity += 1
-                    break
-            else:
-                buyList.append(BarrelOrder(sku=barrel.sku, quantity=1))
-
-            gold -= barrel.price
-            cur_sto += barrel.ml_per_barrel
-            for i in range(potion_count):
-                current_ml_list[i] += int(barrel.ml_per_barrel * barrel.potion_type[i])
-
-            barrel.quantity -= 1
-            bought = True
-            break
-
-        if not bought:
-            break
+    quantities += _fill(ml, prices, stock - quantities, gold, free_ml)
 
-    return buyList
+    return [
+        BarrelOrder(sku=barrel.sku, quantity=int(quantity))
+        for barrel, quantity in zip(wholesale_catalog, quantities.tolist())
+        if quantity > 0
+    ]
 
 
 @router.post("/plan", response_model=List[BarrelOrder])
@@ -181,27 +299,26 @@ def get_wholesale_purchase_plan(wholesale_catalog: List[Barrel]):
     Gets the plan for purchasing wholesale barrels. The call passes in a catalog of available barrels
     and the shop returns back which barrels they'd like to purchase and how many.
     """
-    print(f"barrel catalog: {wholesale_catalog}")
-
-    with db.engine.begin() as connection:
-        row = connection.execute(
-            sqlalchemy.text(
-                """
-                SELECT gold, red_ml, green_ml, blue_ml, dark_ml
-                FROM global_inventory
-                """
-            )
-        ).one()
-
-        gold, red_ml, green_ml, blue_ml, dark_ml = row
-
-    # TODO: fill in values correctly based on what is in your database
-    return create_barrel_plan(
-        gold=gold,
-        max_barrel_capacity=10000,
-        current_red_ml=row.red_ml,
-        current_green_ml=row.green_ml,
-        current_blue_ml=row.blue_ml,
-        current_dark_ml=0,
-        wholesale_catalog=wholesale_catalog,
-    )
\ No newline at end of file
+    logger.debug("barrel catalog: %s", wholesale_catalog)
+
+    def plan():
+        with db.engine.begin() as connection:
+            balances = ledger.balances(connection, ("gold", *ledger.ML_ACCOUNTS))
+            limits = capacity.current_limits(connection)
+
+        return create_barrel_plan(
+            gold=balances["gold"],
+            max_barrel_capacity=limits.ml,
+            current_red_ml=balances["red_ml"],
+            current_green_ml=balances["green_ml"],
+            current_blue_ml=balances["blue_ml"],
+            current_dark_ml=balances["dark_ml"],
+            wholesale_catalog=wholesale_catalog,
+        )
+
+    catalog_key = tuple(
+        (b.sku, b.ml_per_barrel, tuple(b.potion_type), b.price, b.quantity)
+        for b in wholesale_catalog
+    )
+    # Capacity purchases go through the ledger, so its version covers them.
+    return plan_cache.get_or_plan("barrels", catalog_key, plan)
@@ -1,8 +1,20 @@
 from fastapi import APIRouter, Depends, status
 from pydantic import BaseModel, Field, field_validator
-from typing import List
-from src.api import auth
+from typing import List, Mapping
+import math
+import logging
+import random
+from src.api import auth, catalog
 from src import database as db
+from src import (
+    capacity,
+    forecast,
+    game_clock,
+    idempotency,
+    ledger,
+    plan_cache,
+    recipes,
+)
 import sqlalchemy
 
 
@@ -12,6 +24,8 @@ router = APIRouter(
     dependencies=[Depends(auth.get_api_key)],
 )
 
+logger = logging.getLogger(__name__)
+
 
 class PotionMixes(BaseModel):
     potion_type: List[int] = Field(
@@ -32,13 +46,33 @@ class PotionMixes(BaseModel):
         return potion_type
 
 
+# Adds bottled potions to their mix's row, creating it under sku if new.
+STOCK_DELIVERY = sqlalchemy.text(
+    """
+    INSERT INTO potion_inventory (sku, red, green, blue, dark, quantity)
+    SELECT * FROM unnest(
+        CAST(:skus AS text[]),
+        CAST(:reds AS int[]),
+        CAST(:greens AS int[]),
+        CAST(:blues AS int[]),
+        CAST(:darks AS int[]),
+        CAST(:quantities AS int[])
+    )
+    ON CONFLICT (red, green, blue, dark)
+    DO UPDATE SET quantity = potion_inventory.quantity + EXCLUDED.quantity
+    RETURNING sku, red, green, blue, dark
+    """
+)
+
+
 @router.post("/deliver/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
 def post_deliver_bottles(potions_delivered: List[PotionMixes], order_id: int):
-    print(f"potions delivered: {potions_delivered} order_id: {order_id}")
+    logger.info("potions delivered: %s order_id: %s", potions_delivered, order_id)
 
-    red_used = green_used = blue_used = dark_used = 0
+    def deliver(connection):
+        red_used = green_used = blue_used = dark_used = 0
+        bottled: dict[tuple[int, ...], int] = {}
 
-    with db.engine.begin() as connection:
         for potion in potions_delivered:
             qty = potion.quantity
             pt = potion.potion_type
@@ -48,68 +82,55 @@ def post_deliver_bottles(potions_delivered: List[PotionMixes], order_id: int):
             blue_used += qty * pt[2]
             dark_used += qty * pt[3]
 
-            connection.execute(
-                sqlalchemy.text(
-                    """
-                    INSERT INTO potion_inventory (red, green, blue, dark, quantity)
-                    VALUES (:r, :g, :b, :d, :q)
-                """
-                ),
-                {
-                    "r": pt[0],
-                    "g": pt[1],
-                    "b": pt[2],
-                    "d": pt[3],
-                    "q": qty,
-                },
-            )
-
-            connection.execute(
-                sqlalchemy.text(
-                    """
-                    INSERT INTO potion_ledger (sku, quantity)
-                    VALUES (:sku, :quantity)
-                    """
-                ),
-                {
-                    "sku": "_".join(map(str, pt)),
-                    "quantity": qty,
-                },
-            )
+            bottled[tuple(pt)] = bottled.get(tuple(pt), 0) + qty
 
-        connection.execute(
-            sqlalchemy.text(
-                """
-                UPDATE global_inventory SET
-                    red_ml = red_ml - :red,
-                    green_ml = green_ml - :green,
-                    blue_ml = blue_ml - :blue,
-                    dark_ml = dark_ml - :dark
-            """
-            ),
+        # One row per mix, so a delivery touches at most one row per mix
+        # delivered however much bottling history there is.
+        recipes.registry.ensure_loaded(connection)
+        skus = [recipes.registry.for_type(pt).sku for pt in bottled]
+        # Existing rows keep their SKU, which only RecipeRegistry.load()
+        # renames, and the ledger follows the row.
+        stocked = connection.execute(
+            STOCK_DELIVERY,
             {
-                "red": red_used,
-                "green": green_used,
-                "blue": blue_used,
-                "dark": dark_used,
+                "skus": skus,
+                "reds": [pt[0] for pt in bottled],
+                "greens": [pt[1] for pt in bottled],
+                "blues": [pt[2] for pt in bottled],
+                "darks": [pt[3] for pt in bottled],
+                "quantities": list(bottled.values()),
             },
-        )
+        ).all()
+        stock_skus = {tuple(row)[1:]: row.sku for row in stocked}
 
-        connection.execute(
-            sqlalchemy.text(
-                """
-                INSERT INTO ml_ledger (red_ml, green_ml, blue_ml, dark_ml)
-                VALUES (:r, :g, :b, :d)
-                """
-            ),
-            {
-                "r": -red_used,
-                "g": -green_used,
-                "b": -blue_used,
-                "d": -dark_used,
-            },
+        ledger.post(
+            connection,
+            ml=[-red_used, -green_used, -blue_used, -dark_used],
+            potions={stock_skus[pt]: quantity for pt, quantity in bottled.items()},
         )
 
+    idempotency.run_once("bottler.deliver", order_id, deliver)
+    catalog.invalidate_catalog()
+
+
+def _largest_remainder(
+    total: int, weights: List[int], tie_order: List[int]
+) -> List[int]:
+    """
+    Splits total into integer shares proportional to weights. Leftover units go
+    to the largest fractional parts, with ties settled by tie_order. Assumes
+    total <= sum(weights), so no share exceeds its weight.
+    """
+    weight_sum = sum(weights)
+    shares = [total * w // weight_sum for w in weights]
+    leftover = total - sum(shares)
+    by_remainder = sorted(
+        range(len(weights)),
+        key=lambda i: (-(total * weights[i] % weight_sum), tie_order.index(i)),
+    )
+    for i in by_remainder[:leftover]:
+        shares[i] += 1
+    return shares
 
 
 def create_bottle_plan(
@@ -119,37 +140,103 @@ def create_bottle_plan(
     dark_ml: int,
     maximum_potion_capacity: int,
     current_potion_inventory: List[PotionMixes],
+    seed: int = 0,
+    target_mix: Mapping[tuple[int, int, int, int], float] | None = None,
 ) -> List[PotionMixes]:
-    import random
-
-    plan = []
+    """
+    Bottles as many single-color potions as the ml allows, then mixes the
+    sub-100 ml leftovers into blended potions. When there is not enough potion
+    capacity, the free slots are shared between colors in proportion to how
+    many potions each could make. Everything is integer arithmetic; seed only
+    decides how exact ties are broken, so a given seed always gives the same plan.
+
+    target_mix maps potion types to how many of each we expect to need. Those
+    are bottled first, splitting the free slots in proportion to the expected
+    demand as far as the ml allows, and what is left is planned as above.
+    """
     ml_list = [red_ml, green_ml, blue_ml, dark_ml]
+    tie_order = random.Random(seed).sample(range(4), 4)
+    free_slots = max(
+        maximum_potion_capacity
+        - sum(potion.quantity for potion in current_potion_inventory),
+        0,
+    )
 
-    while sum(ml_list) >= 100 and len(plan) + len(current_potion_inventory) < maximum_potion_capacity:
-        potion = [0, 0, 0, 0]
-        while sum(potion) != 100:
-            i = random.randint(0, 3)
-            if ml_list[i] > potion[i]:
-                potion[i] += 1
-
-        for i in range(4):
-            ml_list[i] -= potion[i]
-
-        for existing in plan:
-            if existing.potion_type == potion:
-                existing.quantity += 1
-                break
-        else:
-            plan.append(PotionMixes(potion_type=potion, quantity=1))
+    plan: dict[tuple[int, ...], int] = {}
 
-    return plan
+    targets = sorted(
+        (
+            (potion_type, demand)
+            for potion_type, demand in (target_mix or {}).items()
+            if demand > 0
+        ),
+        key=lambda target: (-target[1], target[0]),
+    )
+    if targets and free_slots > 0:
+        wanted = min(free_slots, math.ceil(sum(demand for _, demand in targets)))
+        shares = _largest_remainder(
+            wanted,
+            [max(1, round(demand * 1000)) for _, demand in targets],
+            list(range(len(targets))),
+        )
+        for (potion_type, _), share in zip(targets, shares):
+            makeable = min(
+                ml // part for ml, part in zip(ml_list, potion_type) if part > 0
+            )
+            count = min(share, makeable)
+            if count > 0:
+                plan[tuple(potion_type)] = count
+                ml_list = [ml - count * part for ml, part in zip(ml_list, potion_type)]
+                free_slots -= count
+
+    pure_counts = [ml // 100 for ml in ml_list]
+    if sum(pure_counts) > free_slots:
+        pure_counts = _largest_remainder(free_slots, pure_counts, tie_order)
+    for i, count in enumerate(pure_counts):
+        if count > 0:
+            potion = [0, 0, 0, 0]
+            potion[i] = 100
+            plan[tuple(potion)] = plan.get(tuple(potion), 0) + count
+            ml_list[i] -= count * 100
+            free_slots -= count
+
+    leftovers = [ml % 100 for ml in ml_list]
+    while sum(leftovers) >= 100 and free_slots > 0:
+        mix = tuple(_largest_remainder(100, leftovers, tie_order))
+        plan[mix] = plan.get(mix, 0) + 1
+        leftovers = [left - used for left, used in zip(leftovers, mix)]
+        free_slots -= 1
+
+    return [
+        PotionMixes(potion_type=list(potion_type), quantity=quantity)
+        for potion_type, quantity in plan.items()
+    ]
+
+
+def _forecast_shortfall(
+    connection: sqlalchemy.Connection,
+) -> dict[tuple[int, int, int, int], float]:
+    """
+    Expected sales for this hour of the game day, less what is already in
+    stock, keyed by potion type.
+    """
+    tick = game_clock.current(connection)
+    if tick is None:
+        return {}
+    forecast.demand.ensure_loaded(connection)
+    recipes.registry.ensure_loaded(connection)
+    expected = forecast.demand.forecast_mix(tick.hour)
+    on_hand = ledger.balances(
+        connection, [ledger.POTION_ACCOUNT_PREFIX + sku for sku in expected]
+    )
 
-    # return [
-    #     PotionMixes(
-    #         potion_type=[100, 0, 0, 0],
-    #         quantity=5,
-    #     )
-    # ]
+    shortfall = {}
+    for sku, demand in expected.items():
+        recipe = recipes.registry.for_sku(sku)
+        missing = demand - on_hand[ledger.POTION_ACCOUNT_PREFIX + sku]
+        if recipe is not None and missing > 0:
+            shortfall[recipe.potion_type] = missing
+    return shortfall
 
 
 @router.post("/plan", response_model=List[PotionMixes])
@@ -160,32 +247,38 @@ def get_bottle_plan():
     Colors are expressed in integers from 0 to 100 that must sum up to exactly 100.
     """
 
-    with db.engine.begin() as connection:
-        result = connection.execute(
-            sqlalchemy.text(
-                """
-                SELECT red_ml, green_ml, blue_ml
-                FROM global_inventory
-                """
-            )
-        ).one()
-
-    red_ml, green_ml, blue_ml = result
-
-    # Maximum potion capacity could also be dynamically fetched from a config or a database if required
-    maximum_potion_capacity = 50
-
-    return create_bottle_plan(
-        red_ml=red_ml,
-        green_ml=green_ml,
-        blue_ml=blue_ml,
-        maximum_potion_capacity=maximum_potion_capacity,
-        current_potion_inventory=[],
-    )
+    def plan():
+        with db.engine.begin() as connection:
+            balances = ledger.balances(connection, ledger.ML_ACCOUNTS)
+            target_mix = _forecast_shortfall(connection)
+            limits = capacity.current_limits(connection)
+            in_stock = ledger.potion_balances(connection)
+            recipes.registry.ensure_loaded(connection)
 
+        red_ml, green_ml, blue_ml, dark_ml = (
+            balances[account] for account in ledger.ML_ACCOUNTS
+        )
+        current_potion_inventory = []
+        unlisted = 0
+        for sku, quantity in in_stock.items():
+            recipe = recipes.registry.for_sku(sku)
+            if recipe is None:
+                unlisted += quantity
+            else:
+                current_potion_inventory.append(
+                    PotionMixes(potion_type=list(recipe.potion_type), quantity=quantity)
+                )
+
+        # Potions under a SKU with no recipe have no mix to report, but they
+        # still take up shelf space.
+        return create_bottle_plan(
+            red_ml=red_ml,
+            green_ml=green_ml,
+            blue_ml=blue_ml,
+            dark_ml=dark_ml,
+            maximum_potion_capacity=limits.potions - unlisted,
+            current_potion_inventory=current_potion_inventory,
+            target_mix=target_mix,
+        )
 
-
-
-if __name__ == "__main__":
-
-    print(get_bottle_plan())
\ No newline at end of file
+    return plan_cache.get_or_plan("bottler", None, plan)
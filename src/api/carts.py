@@ -1,11 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, Field
 import sqlalchemy
-from src.api import auth
+from src.api import auth, catalog
 from enum import Enum
 from typing import List, Optional
+from src import cart_store
 from src import database as db
-from datetime import datetime
+from src import forecast, game_clock, idempotency, ledger, pricing, recipes, visits
+from src.cart_store import CartStore
+from datetime import datetime, timezone
+import base64
+import json
+import logging
 
 router = APIRouter(
     prefix="/carts",
@@ -13,6 +19,8 @@ router = APIRouter(
     dependencies=[Depends(auth.get_api_key)],
 )
 
+logger = logging.getLogger(__name__)
+
 
 class SearchSortOptions(str, Enum):
     customer_name = "customer_name"
@@ -40,69 +48,198 @@ class SearchResponse(BaseModel):
     results: List[LineItem]
 
 
+SEARCH_PAGE_SIZE = 5
+
+# Whitelisted SQL expressions for each sortable column; sort_col is never
+# interpolated into the query directly.
+SEARCH_SORT_COLUMNS = {
+    SearchSortOptions.customer_name: "carts.customer",
+    SearchSortOptions.item_sku: "cart_items.sku",
+    SearchSortOptions.line_item_total: (
+        "(cart_items.quantity * COALESCE(potions.price, :default_price))"
+    ),
+    SearchSortOptions.timestamp: "carts.timestamp",
+}
+
+
+def _encode_cursor(
+    direction: str,
+    sort_col: SearchSortOptions,
+    sort_order: SearchSortOrder,
+    sort_value,
+    line_item_id: int,
+) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps(
+        [direction, sort_col.value, sort_order.value, sort_value, line_item_id]
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(
+    search_page: str, sort_col: SearchSortOptions, sort_order: SearchSortOrder
+):
+    """
+    Returns (direction, sort_value, line_item_id) for a cursor produced by
+    _encode_cursor, or None for an empty or unreadable cursor. A cursor taken
+    from a search sorted some other way is rejected with a 400, since its
+    sort value means nothing against this ordering.
+    """
+    if not search_page:
+        return None
+    try:
+        direction, cursor_col, cursor_order, sort_value, line_item_id = json.loads(
+            base64.urlsafe_b64decode(search_page.encode())
+        )
+    except (ValueError, TypeError):
+        return None
+    if direction not in ("next", "prev"):
+        return None
+    if cursor_col != sort_col.value or cursor_order != sort_order.value:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="search_page was issued for a different sort_col or sort_order",
+        )
+    try:
+        if sort_col == SearchSortOptions.timestamp:
+            sort_value = datetime.fromisoformat(sort_value)
+        line_item_id = int(line_item_id)
+    except (ValueError, TypeError):
+        return None
+    return direction, sort_value, line_item_id
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_statement(
+    customer_name: str,
+    potion_sku: str,
+    sort_col: SearchSortOptions,
+    sort_order: SearchSortOrder,
+    cursor: tuple | None = None,
+) -> tuple[sqlalchemy.TextClause, dict]:
+    """
+    The search query for one page and its parameters, less the recipe
+    prices (recipe_skus, recipe_prices and default_price) the caller binds.
+    """
+    sort_expr = SEARCH_SORT_COLUMNS[sort_col]
+    backwards = cursor is not None and cursor[0] == "prev"
+
+    # Walking backwards flips the sort so the rows just before the cursor come
+    # first; search_orders() reverses them again.
+    descending = (sort_order == SearchSortOrder.desc) != backwards
+    direction = "DESC" if descending else "ASC"
+
+    conditions = ["cart_items.sku IS NOT NULL"]
+    params: dict = {"limit": SEARCH_PAGE_SIZE + 1}
+    if customer_name:
+        conditions.append("carts.customer ILIKE :customer_name")
+        params["customer_name"] = f"%{_escape_like(customer_name)}%"
+    if potion_sku:
+        conditions.append("cart_items.sku ILIKE :potion_sku")
+        params["potion_sku"] = f"%{_escape_like(potion_sku)}%"
+    if cursor is not None:
+        comparison = "<" if descending else ">"
+        conditions.append(
+            f"({sort_expr}, cart_items.id) {comparison} (:cursor_value, :cursor_id)"
+        )
+        params["cursor_value"] = cursor[1]
+        params["cursor_id"] = cursor[2]
+    where = f"WHERE {' AND '.join(conditions)}"
+
+    statement = sqlalchemy.text(
+        f"""
+        SELECT
+            cart_items.id AS line_item_id,
+            cart_items.sku AS item_sku,
+            carts.customer AS customer_name,
+            {SEARCH_SORT_COLUMNS[SearchSortOptions.line_item_total]}
+                AS line_item_total,
+            carts.timestamp AS timestamp,
+            {sort_expr} AS sort_value
+        FROM carts
+        JOIN cart_items ON carts.id = cart_items.cart_id
+        LEFT JOIN unnest(
+            CAST(:recipe_skus AS text[]), CAST(:recipe_prices AS int[])
+        ) AS potions(sku, price) ON cart_items.sku = potions.sku
+        {where}
+        ORDER BY {sort_expr} {direction}, cart_items.id {direction}
+        LIMIT :limit
+        """
+    )
+    return statement, params
+
+
 @router.get("/search/", response_model=SearchResponse, tags=["search"])
-def search_orders(
+async def search_orders(
     customerName: str = "",
     potion_sku: str = "",
     search_page: str = "",
     sort_col: SearchSortOptions = SearchSortOptions.timestamp,
     sort_order: SearchSortOrder = SearchSortOrder.desc,
 ):
-    itemMaximum = 5
-    prev = None
-    next = None
-
-    with db.engine.begin() as connection:
-        query = sqlalchemy.text("""
-            SELECT
-                cart_items.id AS line_item_id,
-                potions.sku AS item_sku,
-                carts.customer AS customerName,
-                (cart_items.quantity * potions.price) AS line_item_total,
-                carts.timestamp AS timestamp
-            FROM carts
-            JOIN cart_items ON carts.id = cart_items.cart_id
-            JOIN potions ON cart_items.potion_id = potions.id
-        """)
-        results = connection.execute(query).mappings().all()
-
-    if customer_name:
-        filtered = []
-    for r in results:
-        customerLower = r["customerName"].lower()
-        search_customer_lower = customerName.lower()
-        if search_customer_lower in customerLower:
-            filtered.append(r)
-        results = filtered
-
-    if potion_sku:
-        filtered = []
-        for r in results:
-            sku_lower = r["item_sku"].lower()
-            search_sku_lower = potion_sku.lower()
-            if search_sku_lower in sku_lower:
-                filtered.append(r)
-        results = filtered
-
-    reverse = sort_order == SearchSortOrder.desc
-    results.sort(key=lambda x: x[sort_col.value], reverse=reverse)
+    """
+    Searches line items by customer name and potion sku (case-insensitive
+    substring match). Filtering, sorting and paging all run in SQL, with list
+    prices joined from the recipe registry; lines under a SKU it does not
+    know are still listed, at DEFAULT_PRICE. Pages are keyset cursors
+    over (sort column, line_item_id), so previous/next are opaque tokens to
+    pass back as search_page.
+    """
+    cursor = _decode_cursor(search_page, sort_col, sort_order)
+    backwards = cursor is not None and cursor[0] == "prev"
+    statement, params = search_statement(
+        customerName, potion_sku, sort_col, sort_order, cursor
+    )
 
-    page = int(search_page) if search_page.isdigit() else 0
-    start = page
-    end = start + itemMaximum
-    paged_results = results[start:end]
+    async with db.async_engine.begin() as connection:
+        await connection.run_sync(recipes.registry.ensure_loaded)
+        params["recipe_skus"], params["recipe_prices"] = recipes.registry.sku_prices()
+        params["default_price"] = recipes.DEFAULT_PRICE
+        result = await connection.execute(statement, params)
+        rows = result.mappings().all()
+
+    has_more = len(rows) > SEARCH_PAGE_SIZE
+    rows = rows[:SEARCH_PAGE_SIZE]
+    if backwards:
+        rows = rows[::-1]
+        has_previous, has_next = has_more, True
+    else:
+        has_previous, has_next = cursor is not None, has_more
+
+    previous = next = None
+    if rows and has_previous:
+        previous = _encode_cursor(
+            "prev", sort_col, sort_order, rows[0]["sort_value"], rows[0]["line_item_id"]
+        )
+    if rows and has_next:
+        next = _encode_cursor(
+            "next",
+            sort_col,
+            sort_order,
+            rows[-1]["sort_value"],
+            rows[-1]["line_item_id"],
+        )
 
-    if start - itemMaximum >= 0:
-        prev = str(start - itemMaximum)
-    if end < len(results):
-        next = str(end)
+    items = [
+        LineItem(
+            line_item_id=row["line_item_id"],
+            item_sku=row["item_sku"],
+            customer_name=row["customer_name"],
+            line_item_total=row["line_item_total"],
+            timestamp=row["timestamp"].isoformat(),
+        )
+        for row in rows
+    ]
 
-    items = [LineItem(**item) for item in paged_results]
+    return SearchResponse(previous=previous, next=next, results=items)
 
-    return SearchResponse(prev=prev, next=next, results=items)
 
-cart_id_counter = 1
-carts: dict[int, dict[str, int]] = {}
+store: CartStore = cart_store.create_store()
+visit_writer = visits.VisitWriter(db.engine)
 
 
 class Customer(BaseModel):
@@ -117,8 +254,19 @@ def post_visits(visit_id: int, customers: List[Customer]):
     """
     Shares the customers that visited the store on that tick.
     """
-    print(customers)
-    pass
+    logger.info("visit %s: %d customers", visit_id, len(customers))
+    visit_writer.submit(
+        [
+            visits.VisitRow(
+                visit_id=visit_id,
+                customer_id=customer.customer_id,
+                customer_name=customer.customer_name,
+                character_class=customer.character_class,
+                level=customer.level,
+            )
+            for customer in customers
+        ]
+    )
 
 
 class CartCreateResponse(BaseModel):
@@ -130,10 +278,7 @@ def create_cart(new_cart: Customer):
     """
     Creates a new cart for a specific customer.
     """
-    global cart_id_counter
-    cart_id = cart_id_counter
-    cart_id_counter += 1
-    carts[cart_id] = {}
+    cart_id = store.create(new_cart.customer_name)
     return CartCreateResponse(cart_id=cart_id)
 
 
@@ -143,40 +288,129 @@ class CartItem(BaseModel):
 
 @router.post("/{cart_id}/items/{item_sku}", status_code=status.HTTP_204_NO_CONTENT)
 def set_item_quantity(cart_id: int, item_sku: str, cart_item: CartItem):
-    print(
-        f"cart_id: {cart_id}, item_sku: {item_sku}, cart_item: {cart_item}, carts: {carts}"
-    )
-    if cart_id not in carts:
+    logger.debug("cart %s: set %s to %s", cart_id, item_sku, cart_item.quantity)
+    if not store.set_item_quantity(cart_id, item_sku, cart_item.quantity):
         raise HTTPException(status_code=404, detail="Cart not found")
 
-    carts[cart_id][item_sku] = cart_item.quantity
     return status.HTTP_204_NO_CONTENT
 
 
 class CheckoutResponse(BaseModel):
     total_potions_bought: int
     total_gold_paid: int
+    # Checkout responses stored in processed_requests before order_id was
+    # returned replay without one.
+    order_id: Optional[int] = None
 
 
 class CartCheckout(BaseModel):
     payment: str
 
 
-@router.post("/{cart_id}/checkout", response_model=CheckoutResponse)
-def checkout(cart_id: int, cart_checkout: CartCheckout):
+# Checkout's statements, shared with the index checks in test_migrations.
+STOCK_DECREMENT = sqlalchemy.text(
+    """
+    UPDATE potion_inventory
+    SET quantity = potion_inventory.quantity - items.quantity
+    FROM unnest(
+        CAST(:reds AS int[]),
+        CAST(:greens AS int[]),
+        CAST(:blues AS int[]),
+        CAST(:darks AS int[]),
+        CAST(:quantities AS int[])
+    ) AS items(red, green, blue, dark, quantity)
+    WHERE (potion_inventory.red, potion_inventory.green,
+           potion_inventory.blue, potion_inventory.dark)
+        = (items.red, items.green, items.blue, items.dark)
+        AND potion_inventory.quantity >= items.quantity
+    RETURNING potion_inventory.red, potion_inventory.green,
+        potion_inventory.blue, potion_inventory.dark,
+        potion_inventory.sku
     """
-    Handles the checkout process for a specific cart.
+)
+MIX_STOCKED = sqlalchemy.text(
+    """
+    SELECT 1 FROM potion_inventory
+    WHERE (red, green, blue, dark) = (:red, :green, :blue, :dark)
     """
+)
 
-    if cart_id not in carts:
-        raise HTTPException(status_code=404, detail="Cart not found")
 
-    cart = carts[cart_id]
-    total_potions_bought = 0
-    total_gold_paid = 0
-    order_id = None
+@router.post("/{cart_id}/checkout", response_model=CheckoutResponse)
+async def checkout(cart_id: int, cart_checkout: CartCheckout):
+    """
+    Handles the checkout process for a specific cart. Checking out the same
+    cart again returns the original response without charging twice.
+    """
+    # (tick, cart) of an order placed by this call, recorded as demand only
+    # once the checkout has committed.
+    sold = []
+
+    def place_order(connection):
+        cart = store.get_items(cart_id, connection)
+        if cart is None:
+            raise HTTPException(status_code=404, detail="Cart not found")
+        # Load sales history before this order's own ledger rows exist so
+        # they are counted once, by record_sales after the commit.
+        forecast.demand.ensure_loaded(connection)
+        recipes.registry.ensure_loaded(connection)
+
+        cart_recipes = [recipes.registry.for_sku(sku) for sku in cart]
+        if None in cart_recipes:
+            # The SKU may come from a recipe another worker has loaded since.
+            recipes.registry.load(connection)
+            cart_recipes = [recipes.registry.for_sku(sku) for sku in cart]
+        # A cart can hold a mix under an old SKU as well as its current one.
+        ordered: dict[str, int] = {}
+        mix_of: dict[str, tuple[int, int, int, int]] = {}
+        for sku, recipe in zip(cart, cart_recipes):
+            if recipe is None:
+                raise HTTPException(
+                    status_code=400, detail=f"SKU {sku} not found in inventory"
+                )
+            ordered[recipe.sku] = ordered.get(recipe.sku, 0) + cart[sku]
+            mix_of[recipe.sku] = recipe.potion_type
+
+        skus = list(ordered)
+        quantities = list(ordered.values())
+        mixes = [mix_of[sku] for sku in skus]
+        # The same table the catalog advertised for this tick.
+        prices = pricing.current_prices(connection)
+        unit_prices = [pricing.price_of(prices, sku) for sku in skus]
+        total_potions_bought = sum(quantities)
+        total_gold_paid = sum(q * price for q, price in zip(quantities, unit_prices))
+
+        # One statement decrements every mix by primary key; rows without
+        # enough stock do not match, and raising below rolls the whole
+        # checkout back.
+        updated = connection.execute(
+            STOCK_DECREMENT,
+            {
+                "reds": [mix[0] for mix in mixes],
+                "greens": [mix[1] for mix in mixes],
+                "blues": [mix[2] for mix in mixes],
+                "darks": [mix[3] for mix in mixes],
+                "quantities": quantities,
+            },
+        ).all()
+
+        # Stock and its ledger account go by the row's SKU, which only
+        # RecipeRegistry.load() renames.
+        stock_skus = {tuple(row)[:4]: row.sku for row in updated}
+        short = set(mixes) - set(stock_skus)
+        if short:
+            sku, mix = next((s, m) for s, m in zip(skus, mixes) if m in short)
+            in_stock = connection.execute(
+                MIX_STOCKED, dict(zip(("red", "green", "blue", "dark"), mix))
+            ).first()
+            if in_stock is None:
+                raise HTTPException(
+                    status_code=400, detail=f"SKU {sku} not found in inventory"
+                )
+            raise HTTPException(
+                status_code=400, detail=f"Not enough stock for SKU: {sku}"
+            )
 
-    with db.engine.begin() as connection:
         order_id = connection.execute(
             sqlalchemy.text("""
                 INSERT INTO orders (cart_id, total_gold_paid, created_at)
@@ -186,62 +420,50 @@ def checkout(cart_id: int, cart_checkout: CartCheckout):
             {
                 "cart_id": cart_id,
                 "total_gold_paid": total_gold_paid,
-                "created_at": datetime.utcnow(),
-            }
-        ).fetchone()[0]
-
-        for sku, quantity in cart.items():
-            potion_inventory = connection.execute(
-                sqlalchemy.text("""
-                    SELECT sku, red, green, blue, dark, quantity
-                    FROM potion_inventory
-                    WHERE sku = :sku
-                """),
-                {"sku": sku}
-            ).fetchone()
-
-            if potion_inventory is None:
-                raise HTTPException(status_code=400, detail=f"SKU {sku} not found in inventory")
-
-            new_quantity = potion_inventory['quantity'] - quantity
-            if new_quantity < 0:
-                raise HTTPException(status_code=400, detail=f"Not enough stock for SKU: {sku}")
-
-            connection.execute(
-                sqlalchemy.text("""
-                    UPDATE potion_inventory
-                    SET quantity = :new_quantity
-                    WHERE sku = :sku
-                """),
-                {"sku": sku, "new_quantity": new_quantity},
-            )
-
-            connection.execute(
-                sqlalchemy.text("""
-                    INSERT INTO order_items (order_id, sku, quantity, line_item_total)
-                    VALUES (:order_id, :sku, :quantity, :line_item_total)
-                """),
-                {
-                    "order_id": order_id,
-                    "sku": sku,
-                    "quantity": quantity,
-                    "line_item_total": quantity * 50,
-                },
-            )
-
-            total_potions_bought += quantity
-            total_gold_paid += quantity * 50
+                "created_at": datetime.now(timezone.utc),
+            },
+        ).scalar_one()
 
         connection.execute(
             sqlalchemy.text("""
-                UPDATE global_inventory
-                SET gold = gold + :added_gold
+                INSERT INTO order_items (order_id, sku, quantity, line_item_total)
+                SELECT :order_id, items.sku, items.quantity, items.quantity * items.price
+                FROM unnest(
+                    CAST(:skus AS text[]),
+                    CAST(:quantities AS int[]),
+                    CAST(:prices AS int[])
+                ) AS items(sku, quantity, price)
             """),
-            {"added_gold": total_gold_paid},
+            {
+                "order_id": order_id,
+                "skus": skus,
+                "quantities": quantities,
+                "prices": unit_prices,
+            },
         )
 
-    return CheckoutResponse(
-        total_potions_bought=total_potions_bought,
-        total_gold_paid=total_gold_paid,
-        order_id=order_id,  # Return the created order's ID
-    )
\ No newline at end of file
+        sales = {stock_skus[mix]: quantity for mix, quantity in zip(mixes, quantities)}
+        ledger.post(
+            connection,
+            gold=total_gold_paid,
+            potions={sku: -quantity for sku, quantity in sales.items()},
+        )
+        store.close(cart_id, connection)
+
+        tick = game_clock.current(connection)
+        if tick is not None:
+            sold.append((tick, sales))
+
+        return CheckoutResponse(
+            total_potions_bought=total_potions_bought,
+            total_gold_paid=total_gold_paid,
+            order_id=order_id,
+        ).model_dump()
+
+    response = await idempotency.run_once_async("carts.checkout", cart_id, place_order)
+
+    for tick, sales in sold:
+        forecast.demand.record_sales(tick, sales)
+    catalog.invalidate_catalog()
+
+    return CheckoutResponse(**response)
@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from pydantic import BaseModel, Field
 from typing import List, Annotated
+from src import cache, game_clock, pricing, recipes
 from src import database as db
 import sqlalchemy
 
@@ -21,87 +22,80 @@ class CatalogItem(BaseModel):
     )
 
 
-# Placeholder function, you will replace this with a database call
-def create_catalog() -> List[CatalogItem]:
-    catalog = []
+MAX_CATALOG_SKUS = 6
+CATALOG_CACHE_TTL_SECONDS = 30
 
-    with db.engine.begin() as connection:
-        red = connection.execute(
-            sqlalchemy.text(
-                """
-                SELECT COALESCE(SUM(quantity), 0) AS qty FROM potion_inventory
-                WHERE red = 100 AND green = 0 AND blue = 0 AND dark = 0
-            """
-            )
-        ).scalar_one()
-
-        if red > 0:
-            catalog.append(
-                CatalogItem(
-                    sku="RED_POTION_0",
-                    name="red potion",
-                    quantity=red,
-                    price=50,
-                    potion_type=[100, 0, 0, 0],
-                )
-            )
+# Keyed by the tick id the catalog was priced for, so a worker that has not
+# seen /info/current_time still stops serving last tick's prices as soon as
+# it sees the new tick, the same moment its checkouts start charging them.
+_catalog_cache = cache.TTLCache(ttl_seconds=CATALOG_CACHE_TTL_SECONDS, maxsize=1)
 
-        green = connection.execute(
-            sqlalchemy.text(
-                """
-                SELECT COALESCE(SUM(quantity), 0) AS qty FROM potion_inventory
-                WHERE green = 100 AND red = 0 AND blue = 0 AND dark = 0
-            """
-            )
-        ).scalar_one()
-
-        if green > 0:
-            catalog.append(
-                CatalogItem(
-                    sku="GREEN_POTION_0",
-                    name="green potion",
-                    quantity=green,
-                    price=50,
-                    potion_type=[0, 100, 0, 0],
-                )
-            )
 
-        blue = connection.execute(
-            sqlalchemy.text(
-                """
-                SELECT COALESCE(SUM(quantity), 0) AS qty FROM potion_inventory
-                WHERE blue = 100 AND red = 0 AND green = 0 AND dark = 0
-            """
-            )
-        ).scalar_one()
-
-        if blue > 0:
-            catalog.append(
-                CatalogItem(
-                    sku="BLUE_POTION_0",
-                    name="blue potion",
-                    quantity=blue,
-                    price=50,
-                    potion_type=[0, 0, 100, 0],
-                )
+def invalidate_catalog() -> None:
+    """
+    Drops the cached catalog. Call after committing any write that changes
+    potion stock (bottling, checkout, reset).
+    """
+    _catalog_cache.invalidate()
+
+
+MIXES_IN_STOCK = sqlalchemy.text(
+    """
+    SELECT red, green, blue, dark, quantity
+    FROM potion_inventory
+    WHERE quantity > 0
+    ORDER BY quantity DESC, red DESC, green DESC, blue DESC, dark DESC
+    LIMIT :limit
+    """
+)
+
+
+async def create_catalog() -> List[CatalogItem]:
+    """
+    Builds the catalog from potion_inventory, which holds one row per mix,
+    keeping the MAX_CATALOG_SKUS mixes with the most potions, priced from the
+    current tick's price table. The result is cached in process per tick
+    until it expires or invalidate_catalog() is called.
+    """
+    tick = game_clock.cached()
+    if tick is not None:
+        catalog = _catalog_cache.get(tick.id)
+        if catalog is not None:
+            return catalog
+
+    generation = _catalog_cache.generation
+    async with db.async_engine.begin() as connection:
+        tick = await connection.run_sync(game_clock.current)
+        key = None if tick is None else tick.id
+        catalog = _catalog_cache.get(key)
+        if catalog is not None:
+            return catalog
+        result = await connection.execute(MIXES_IN_STOCK, {"limit": MAX_CATALOG_SKUS})
+        rows = result.all()
+        await connection.run_sync(recipes.registry.ensure_loaded)
+        prices = await connection.run_sync(pricing.current_prices, tick)
+
+    catalog = []
+    for row in rows:
+        recipe = recipes.registry.for_type((row.red, row.green, row.blue, row.dark))
+        catalog.append(
+            CatalogItem(
+                sku=recipe.sku,
+                name=recipe.name,
+                quantity=min(row.quantity, 10000),
+                price=pricing.price_of(prices, recipe.sku),
+                potion_type=list(recipe.potion_type),
             )
+        )
 
+    _catalog_cache.set(key, catalog, generation=generation)
     return catalog
-    # return [
-    #     CatalogItem(
-    #         sku="RED_POTION_0",
-    #         name="red potion",
-    #         quantity=1,
-    #         price=50,
-    #         potion_type=[100, 0, 0, 0],
-    #     )
-    # ]
 
 
 @router.get("/catalog/", tags=["catalog"], response_model=List[CatalogItem])
-def get_catalog() -> List[CatalogItem]:
+async def get_catalog() -> List[CatalogItem]:
     """
     Retrieves the catalog of items. Each unique item combination should have only a single price.
     You can have at most 6 potion SKUs offered in your catalog at one time.
     """
-    return create_catalog()
+    return await create_catalog()
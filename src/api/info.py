@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, status
 from pydantic import BaseModel
-from src.api import auth
+from src.api import auth, catalog
+from src import database as db
+from src import forecast, game_clock, ledger, plan_cache, recipes
 
 router = APIRouter(
     prefix="/info",
@@ -17,7 +19,21 @@ class Timestamp(BaseModel):
 @router.post("/current_time", status_code=status.HTTP_204_NO_CONTENT)
 def post_time(timestamp: Timestamp):
     """
-    Shares what the latest time (in game time) is.
+    Shares what the latest time (in game time) is. Posting the same time
+    again, as a retry does, keeps the tick already recorded for it.
     """
-    # TODO: Record day and time of the current tick to associate with later calls
-    pass
+    with db.engine.begin() as connection:
+        forecast.demand.ensure_loaded(connection)
+        tick, created = game_clock.record(connection, timestamp.day, timestamp.hour)
+        if created:
+            ledger.checkpoint(connection)
+        # Besides the periodic reload, pick up recipe edits before this
+        # tick's prices are built.
+        recipes.registry.load(connection)
+    game_clock.advance(tick)
+    if created:
+        forecast.demand.advance(tick)
+    # The bottle plan carries the previous hour's forecast. Catalogs are
+    # cached per tick, so dropping them here only frees the old entry.
+    catalog.invalidate_catalog()
+    plan_cache.invalidate()
@@ -1,8 +1,10 @@
+import logging
+
 from fastapi import APIRouter, Depends, status
 from pydantic import BaseModel, Field
-import sqlalchemy
 from src.api import auth
 from src import database as db
+from src import capacity, forecast, game_clock, idempotency, inventory_snapshot, ledger
 
 router = APIRouter(
     prefix="/inventory",
@@ -10,6 +12,8 @@ router = APIRouter(
     dependencies=[Depends(auth.get_api_key)],
 )
 
+logger = logging.getLogger(__name__)
+
 
 class InventoryAudit(BaseModel):
     number_of_potions: int
@@ -25,36 +29,24 @@ class CapacityPlan(BaseModel):
 
 
 @router.get("/audit", response_model=InventoryAudit)
-def get_inventory():
+async def get_inventory():
     """
     Returns an audit of the current inventory. Any discrepancies between
     what is reported here and my source of truth will be posted
     as errors on potion exchange.
+
+    Served from the in-memory inventory snapshot, loaded from the ledger on
+    first use.
     """
+    snapshot = inventory_snapshot.snapshot.current()
+    if snapshot is None:
+        async with db.async_engine.begin() as connection:
+            snapshot = await connection.run_sync(inventory_snapshot.snapshot.load)
+    balances = snapshot.balances
 
-    with db.engine.begin() as connection:
-        row = connection.execute(
-            sqlalchemy.text(
-                """
-                SELECT gold, red_ml, green_ml, blue_ml
-                FROM global_inventory
-                """
-            )
-        ).one()
-
-        ml_in_barrels = row.red_ml + row.green_ml + row.blue_ml
-        gold = row.gold
-
-        result = connection.execute(
-            sqlalchemy.text(
-                """
-                SELECT COALESCE(SUM(quantity), 0) AS total_potions
-                FROM potion_inventory
-                """
-            )
-        ).one()
-
-        number_of_potions = result.total_potions
+    number_of_potions = balances[ledger.POTIONS_ACCOUNT]
+    ml_in_barrels = sum(balances[account] for account in ledger.ML_ACCOUNTS)
+    gold = balances["gold"]
 
     return InventoryAudit(
         number_of_potions=number_of_potions, ml_in_barrels=ml_in_barrels, gold=gold
@@ -68,8 +60,31 @@ def get_capacity_plan():
 
     - Start with 1 capacity for 50 potions and 1 capacity for 10,000 ml of potion.
     - Each additional capacity unit costs 1000 gold.
+
+    Units are bought while the extra sales they are expected to bring over
+    the next few game days, simulated from the demand forecast, outweigh
+    their price.
     """
-    return CapacityPlan(potion_capacity=0, ml_capacity=0)
+    with db.engine.begin() as connection:
+        balances = ledger.balances(
+            connection, ("gold", ledger.POTIONS_ACCOUNT, *ledger.CAPACITY_ACCOUNTS)
+        )
+        tick = game_clock.current(connection)
+        forecast.demand.ensure_loaded(connection)
+
+    demand = capacity.demand_horizon(
+        forecast.demand.total_by_hour(), tick.hour if tick is not None else 0
+    )
+    potion_units, ml_units = capacity.plan_purchase(
+        demand,
+        units=tuple(balances[account] for account in ledger.CAPACITY_ACCOUNTS),
+        gold=balances["gold"],
+        stock=balances[ledger.POTIONS_ACCOUNT],
+    )
+    logger.info(
+        "capacity plan: potion_capacity=%s ml_capacity=%s", potion_units, ml_units
+    )
+    return CapacityPlan(potion_capacity=potion_units, ml_capacity=ml_units)
 
 
 @router.post("/deliver/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -81,5 +96,14 @@ def deliver_capacity_plan(capacity_purchase: CapacityPlan, order_id: int):
     - Start with 1 capacity for 50 potions and 1 capacity for 10,000 ml of potion.
     - Each additional capacity unit costs 1000 gold.
     """
-    print(f"capacity delivered: {capacity_purchase} order_id: {order_id}")
-    pass
+    logger.info("capacity delivered: %s order_id: %s", capacity_purchase, order_id)
+
+    def deliver(connection):
+        units = capacity_purchase.potion_capacity + capacity_purchase.ml_capacity
+        ledger.post(
+            connection,
+            gold=-units * capacity.UNIT_PRICE,
+            capacity=[capacity_purchase.potion_capacity, capacity_purchase.ml_capacity],
+        )
+
+    idempotency.run_once("inventory.deliver", order_id, deliver)
@@ -1,4 +1,7 @@
-from fastapi import FastAPI
+import uuid
+
+from fastapi import FastAPI, Request
+from src import log
 from src.api import carts, catalog, bottler, barrels, admin, info, inventory
 from starlette.middleware.cors import CORSMiddleware
 
@@ -43,6 +46,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+log.configure()
+
+
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """Tags every log record written while handling the request with its id."""
+    rid = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = log.request_id.set(rid)
+    try:
+        response = await call_next(request)
+    finally:
+        log.request_id.reset(token)
+    response.headers["X-Request-ID"] = rid
+    return response
+
+
 app.include_router(inventory.router)
 app.include_router(carts.router)
 app.include_router(catalog.router)
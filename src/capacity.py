@@ -0,0 +1,145 @@
+from dataclasses import dataclass
+from typing import Mapping, Sequence
+
+import sqlalchemy
+
+from src import ledger, pricing
+
+# The shop starts with one unit of each; every unit bought adds as much again.
+POTIONS_PER_UNIT = 50
+ML_PER_UNIT = 10000
+UNIT_PRICE = 1000
+MAX_UNITS_PER_PLAN = 10
+
+ML_PER_POTION = 100
+# Ticks simulated when valuing a purchase, about three game days at one tick
+# every two hours. A unit has to pay for itself within this window.
+PAYBACK_TICKS = 36
+# Barrels are assumed to arrive this often and top the ml up to the limit.
+RESTOCK_EVERY_TICKS = 4
+# Recorded sales stop at whatever was in stock, so demand is scaled up a
+# little to let the simulation see sales the old limits turned away.
+UNMET_DEMAND_FACTOR = 1.25
+# Gold kept back for barrels after paying for capacity.
+GOLD_RESERVE = 500
+
+# (potion units, ml units) options weighed at each step. Buying both at once
+# matters when each limit alone would leave the other one binding.
+_STEPS = ((1, 0), (0, 1), (1, 1))
+
+
+@dataclass(frozen=True)
+class Limits:
+    potions: int
+    ml: int
+
+
+def limits_for(potion_units: int, ml_units: int) -> Limits:
+    """Limits after buying potion_units and ml_units on top of the starting unit."""
+    return Limits(
+        potions=(1 + potion_units) * POTIONS_PER_UNIT,
+        ml=(1 + ml_units) * ML_PER_UNIT,
+    )
+
+
+def purchased_units(connection: sqlalchemy.Connection) -> tuple[int, int]:
+    balances = ledger.balances(connection, ledger.CAPACITY_ACCOUNTS)
+    return tuple(balances[account] for account in ledger.CAPACITY_ACCOUNTS)
+
+
+def current_limits(connection: sqlalchemy.Connection) -> Limits:
+    return limits_for(*purchased_units(connection))
+
+
+def demand_horizon(
+    demand_by_hour: Mapping[int, float], hour: int, ticks: int = PAYBACK_TICKS
+) -> list[float]:
+    """
+    Expected potions sold in each of the next ticks, walking the hours the
+    forecaster has seen in order from hour and wrapping round the day.
+    """
+    hours = sorted(demand_by_hour)
+    if not hours:
+        return []
+    start = next((i for i, seen in enumerate(hours) if seen >= hour), 0)
+    return [
+        demand_by_hour[hours[(start + tick) % len(hours)]] * UNMET_DEMAND_FACTOR
+        for tick in range(ticks)
+    ]
+
+
+def simulate_sales(demand: Sequence[float], limits: Limits, stock: float = 0) -> float:
+    """
+    Expected potions sold over the ticks in demand when the shop holds at
+    most limits.potions potions and limits.ml ml. ml is topped up every
+    RESTOCK_EVERY_TICKS ticks, each tick bottles as much as the ml and free
+    potion slots allow, and sales take whatever is in stock up to demand.
+    """
+    stock = min(float(stock), limits.potions)
+    ml = 0.0
+    sold = 0.0
+    for tick, expected in enumerate(demand):
+        if tick % RESTOCK_EVERY_TICKS == 0:
+            ml = float(limits.ml)
+        bottled = min(limits.potions - stock, ml / ML_PER_POTION)
+        stock += bottled
+        ml -= bottled * ML_PER_POTION
+        sale = min(expected, stock)
+        sold += sale
+        stock -= sale
+    return sold
+
+
+def return_per_1000_gold(
+    demand: Sequence[float],
+    units: tuple[int, int],
+    step: tuple[int, int],
+    stock: float = 0,
+) -> float:
+    """Extra sales, in gold, per 1000 gold spent buying step on top of units."""
+    before = simulate_sales(demand, limits_for(*units), stock)
+    after = simulate_sales(
+        demand, limits_for(units[0] + step[0], units[1] + step[1]), stock
+    )
+    cost = sum(step) * UNIT_PRICE
+    return (after - before) * pricing.BASE_PRICE * 1000 / cost
+
+
+def plan_purchase(
+    demand: Sequence[float],
+    units: tuple[int, int],
+    gold: int,
+    stock: float = 0,
+) -> tuple[int, int]:
+    """
+    (potion units, ml units) to buy. Repeatedly takes the step with the best
+    return per 1000 gold while that return is at least the 1000 gold it
+    costs, the gold above GOLD_RESERVE covers it and the plan stays within
+    MAX_UNITS_PER_PLAN units.
+    """
+    bought = [0, 0]
+    budget = gold - GOLD_RESERVE
+    while True:
+        owned = (units[0] + bought[0], units[1] + bought[1])
+        steps = [
+            step
+            for step in _STEPS
+            if sum(step) * UNIT_PRICE <= budget
+            and bought[0] + step[0] <= MAX_UNITS_PER_PLAN
+            and bought[1] + step[1] <= MAX_UNITS_PER_PLAN
+        ]
+        if not steps:
+            break
+        best, best_return = max(
+            (
+                (step, return_per_1000_gold(demand, owned, step, stock))
+                for step in steps
+            ),
+            key=lambda option: option[1],
+        )
+        if best_return < 1000:
+            break
+        bought[0] += best[0]
+        bought[1] += best[1]
+        budget -= sum(best) * UNIT_PRICE
+    return bought[0], bought[1]
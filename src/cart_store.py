@@ -0,0 +1,207 @@
+import contextlib
+import itertools
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import sqlalchemy
+
+from src import config
+from src import database as db
+
+
+class CartStore(ABC):
+    """
+    Where open carts live between create_cart and checkout. Implementations
+    must be safe to call from several threads.
+    """
+
+    @abstractmethod
+    def create(self, customer_name: str) -> int:
+        """Opens an empty cart and returns its id."""
+
+    @abstractmethod
+    def set_item_quantity(self, cart_id: int, item_sku: str, quantity: int) -> bool:
+        """Sets the quantity of item_sku. Returns False if the cart is not open."""
+
+    @abstractmethod
+    def get_items(
+        self, cart_id: int, connection: sqlalchemy.Connection | None = None
+    ) -> dict[str, int] | None:
+        """
+        Returns {sku: quantity} for an open cart, or None if it is not open.
+        Stores backed by the database use connection when one is given.
+        """
+
+    @abstractmethod
+    def close(
+        self, cart_id: int, connection: sqlalchemy.Connection | None = None
+    ) -> None:
+        """
+        Marks the cart as checked out; later calls treat it as not open.
+        Stores backed by the database use connection when one is given.
+        """
+
+    def reset(self) -> None:
+        """
+        Forgets every cart held outside the database, after the carts tables
+        have been emptied. Cart ids are never reused.
+        """
+
+
+OPEN_CART_ITEMS = sqlalchemy.text(
+    """
+    SELECT cart_items.sku, cart_items.quantity
+    FROM carts
+    LEFT JOIN cart_items ON cart_items.cart_id = carts.id
+    WHERE carts.id = :cart_id AND carts.checked_out_at IS NULL
+    """
+)
+
+
+class PostgresCartStore(CartStore):
+    """
+    Keeps carts in the carts and cart_items tables so every worker sees the
+    same carts and they survive restarts. Ids come from the carts id
+    sequence and item updates are single-statement upserts.
+    """
+
+    def __init__(self, engine: sqlalchemy.Engine):
+        self.engine = engine
+
+    def _begin(
+        self, connection: sqlalchemy.Connection | None
+    ) -> contextlib.AbstractContextManager[sqlalchemy.Connection]:
+        if connection is not None:
+            return contextlib.nullcontext(connection)
+        return self.engine.begin()
+
+    def create(self, customer_name: str) -> int:
+        with self.engine.begin() as connection:
+            return connection.execute(
+                sqlalchemy.text(
+                    """
+                    INSERT INTO carts (customer, timestamp)
+                    VALUES (:customer, now())
+                    RETURNING id
+                    """
+                ),
+                {"customer": customer_name},
+            ).scalar_one()
+
+    def set_item_quantity(self, cart_id: int, item_sku: str, quantity: int) -> bool:
+        with self.engine.begin() as connection:
+            row = connection.execute(
+                sqlalchemy.text(
+                    """
+                    INSERT INTO cart_items (cart_id, sku, quantity)
+                    SELECT id, :sku, :quantity
+                    FROM carts
+                    WHERE id = :cart_id AND checked_out_at IS NULL
+                    ON CONFLICT (cart_id, sku)
+                    DO UPDATE SET quantity = EXCLUDED.quantity
+                    RETURNING cart_id
+                    """
+                ),
+                {"cart_id": cart_id, "sku": item_sku, "quantity": quantity},
+            ).first()
+        return row is not None
+
+    def get_items(
+        self, cart_id: int, connection: sqlalchemy.Connection | None = None
+    ) -> dict[str, int] | None:
+        with self._begin(connection) as connection:
+            rows = connection.execute(OPEN_CART_ITEMS, {"cart_id": cart_id}).all()
+        if not rows:
+            return None
+        return {row.sku: row.quantity for row in rows if row.sku is not None}
+
+    def close(
+        self, cart_id: int, connection: sqlalchemy.Connection | None = None
+    ) -> None:
+        with self._begin(connection) as connection:
+            connection.execute(
+                sqlalchemy.text(
+                    """
+                    UPDATE carts SET checked_out_at = now()
+                    WHERE id = :cart_id
+                    """
+                ),
+                {"cart_id": cart_id},
+            )
+
+
+class InMemoryCartStore(CartStore):
+    """
+    Process-local carts for tests and single-worker development. Carts not
+    touched for ttl_seconds are evicted, as are carts once checked out.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._ids = itertools.count(1)
+        self._carts: dict[int, tuple[float, dict[str, int]]] = {}
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [
+            cart_id
+            for cart_id, (expires_at, _) in self._carts.items()
+            if expires_at < now
+        ]
+        for cart_id in expired:
+            del self._carts[cart_id]
+
+    def _open_items(self, cart_id: int, now: float) -> dict[str, int] | None:
+        entry = self._carts.get(cart_id)
+        if entry is None:
+            return None
+        expires_at, items = entry
+        if expires_at < now:
+            del self._carts[cart_id]
+            return None
+        self._carts[cart_id] = (now + self.ttl_seconds, items)
+        return items
+
+    def create(self, customer_name: str) -> int:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            cart_id = next(self._ids)
+            self._carts[cart_id] = (now + self.ttl_seconds, {})
+        return cart_id
+
+    def set_item_quantity(self, cart_id: int, item_sku: str, quantity: int) -> bool:
+        with self._lock:
+            items = self._open_items(cart_id, time.monotonic())
+            if items is None:
+                return False
+            items[item_sku] = quantity
+        return True
+
+    def get_items(
+        self, cart_id: int, connection: sqlalchemy.Connection | None = None
+    ) -> dict[str, int] | None:
+        with self._lock:
+            items = self._open_items(cart_id, time.monotonic())
+            return None if items is None else dict(items)
+
+    def close(
+        self, cart_id: int, connection: sqlalchemy.Connection | None = None
+    ) -> None:
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._carts.clear()
+
+
+def create_store() -> CartStore:
+    """Builds the cart store selected by the CART_STORE setting."""
+    settings = config.get_settings()
+    if settings.CART_STORE == "memory":
+        return InMemoryCartStore(ttl_seconds=settings.CART_TTL_SECONDS)
+    if settings.CART_STORE == "postgres":
+        return PostgresCartStore(db.engine)
+    raise ValueError(f"Unknown CART_STORE: {settings.CART_STORE}")
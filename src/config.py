@@ -12,6 +12,33 @@ load_dotenv(dotenv_path=find_dotenv(".env"), override=True)
 class Settings:
     API_KEY: str | None = os.getenv("API_KEY")
     POSTGRES_URI: str | None = os.getenv("POSTGRES_URI")
+    # Extra accepted keys, comma separated, and an optional file with one key
+    # per line that is re-read when it changes.
+    API_KEYS: str = os.getenv("API_KEYS", "")
+    API_KEYS_FILE: str | None = os.getenv("API_KEYS_FILE")
+    # Per-key token bucket: sustained requests per second and burst size. Off
+    # by default: the exchange sends every customer through one key, so a
+    # busy tick would be throttled as a single client.
+    API_RATE_LIMIT: float = float(os.getenv("API_RATE_LIMIT", "0"))
+    API_RATE_BURST: float = float(os.getenv("API_RATE_BURST", "200"))
+    CART_STORE: str = os.getenv("CART_STORE", "postgres")
+    CART_TTL_SECONDS: float = float(os.getenv("CART_TTL_SECONDS", "3600"))
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # How often each process checks its in-memory audit balances against the
+    # ledger; 0 turns the check off.
+    INVENTORY_RECONCILE_SECONDS: float = float(
+        os.getenv("INVENTORY_RECONCILE_SECONDS", "10")
+    )
+    # Per-process connection pool; the sync and async engines each get one.
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
 
     def __init__(self):
         if not self.API_KEY:
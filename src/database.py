@@ -1,5 +1,34 @@
-from src import config
+from src import config, metrics
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
 
-connection_url = config.get_settings().POSTGRES_URI
-engine = create_engine(connection_url, pool_pre_ping=True)
+settings = config.get_settings()
+connection_url = settings.POSTGRES_URI
+
+# pool_pre_ping costs a round trip on every checkout; pool_recycle alone is
+# usually enough when the server's idle timeout is known, so both are tunable.
+pool_options = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
+engine = create_engine(
+    connection_url,
+    poolclass=metrics.TimedQueuePool,
+    pool_logging_name="sync",
+    **pool_options,
+)
+metrics.instrument(engine, "sync")
+
+# Async engine for routes declared with async def. The postgresql+psycopg
+# dialect picks psycopg's async driver automatically.
+async_engine = create_async_engine(
+    connection_url,
+    poolclass=metrics.TimedAsyncAdaptedQueuePool,
+    pool_logging_name="async",
+    **pool_options,
+)
+metrics.instrument(async_engine.sync_engine, "async")
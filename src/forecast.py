@@ -0,0 +1,129 @@
+import threading
+
+import sqlalchemy
+
+from src.game_clock import Tick
+
+# Weight of the newest tick in each estimate.
+DEFAULT_ALPHA = 0.3
+
+
+# Units sold per SKU in every tick, oldest first; ticks without sales come
+# back once with a NULL sku.
+SALES_HISTORY = sqlalchemy.text(
+    """
+    SELECT game_time.id, game_time.day, game_time.hour,
+           sales.sku, sales.sold
+    FROM game_time
+    LEFT JOIN (
+        SELECT tick_id, sku, -SUM(quantity) AS sold
+        FROM potion_ledger
+        WHERE quantity < 0 AND tick_id IS NOT NULL
+        GROUP BY tick_id, sku
+    ) AS sales ON sales.tick_id = game_time.id
+    ORDER BY game_time.id
+    """
+)
+
+
+class DemandForecaster:
+    """
+    Per-SKU demand for each hour of the game day, kept as exponentially
+    smoothed units sold per tick. Sales accumulate for the open tick; when the
+    clock moves on the tick is folded into that hour's estimates, counting
+    zero for every SKU that sold before at that hour but not this time.
+
+    forecast() is a dict lookup and forecast_mix() copies one hour's
+    estimates, so planners never rescan the order history. The state lives
+    in this process and is rebuilt from potion_ledger by load() on first use.
+    """
+
+    def __init__(self, alpha: float = DEFAULT_ALPHA):
+        self.alpha = alpha
+        self.loaded = False
+        self._levels: dict[int, dict[str, float]] = {}
+        self._open: Tick | None = None
+        self._open_sales: dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def _close_open_tick(self) -> None:
+        if self._open is None:
+            return
+        levels = self._levels.setdefault(self._open.hour, {})
+        for sku in levels.keys() | self._open_sales.keys():
+            sold = self._open_sales.get(sku, 0)
+            previous = levels.get(sku)
+            levels[sku] = (
+                float(sold)
+                if previous is None
+                else self.alpha * sold + (1 - self.alpha) * previous
+            )
+        self._open = None
+        self._open_sales = {}
+
+    def advance(self, tick: Tick) -> None:
+        """Closes the open tick if tick is a newer one and opens tick."""
+        with self._lock:
+            if self._open is not None and tick.id <= self._open.id:
+                return
+            self._close_open_tick()
+            self._open = tick
+
+    def record_sales(self, tick: Tick, sales: dict[str, int]) -> None:
+        """Adds {sku: quantity} sold during tick."""
+        with self._lock:
+            self.advance(tick)
+            if self._open is None or self._open.id != tick.id:
+                return
+            for sku, quantity in sales.items():
+                self._open_sales[sku] = self._open_sales.get(sku, 0) + quantity
+
+    def forecast(self, sku: str, hour: int) -> float:
+        """Expected units of sku sold in one tick at hour."""
+        return self._levels.get(hour, {}).get(sku, 0.0)
+
+    def forecast_mix(self, hour: int) -> dict[str, float]:
+        """Expected units sold per SKU in one tick at hour."""
+        with self._lock:
+            return dict(self._levels.get(hour, {}))
+
+    def total_by_hour(self) -> dict[int, float]:
+        """Expected units sold across all SKUs in one tick, for each hour seen."""
+        with self._lock:
+            return {hour: sum(levels.values()) for hour, levels in self._levels.items()}
+
+    def load(self, connection: sqlalchemy.Connection) -> None:
+        """
+        Replays every recorded tick and the sales stamped with it from
+        potion_ledger, where checkouts post negative quantities.
+        """
+        rows = connection.execute(SALES_HISTORY).all()
+
+        with self._lock:
+            self._levels = {}
+            self._open = None
+            self._open_sales = {}
+            for row in rows:
+                tick = Tick(id=row.id, day=row.day, hour=row.hour)
+                if row.sku is None:
+                    self.advance(tick)
+                else:
+                    self.record_sales(tick, {row.sku: row.sold})
+            self.loaded = True
+
+    def invalidate(self) -> None:
+        """Forgets every estimate; the next ensure_loaded() rebuilds them."""
+        with self._lock:
+            self._levels = {}
+            self._open = None
+            self._open_sales = {}
+            self.loaded = False
+
+    def ensure_loaded(self, connection: sqlalchemy.Connection) -> None:
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.load(connection)
+
+
+demand = DemandForecaster()
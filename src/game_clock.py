@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+
+import sqlalchemy
+
+from src import cache, log
+from src import database as db
+
+# Another worker may have recorded a newer tick; after this long the cached
+# tick is re-read from game_time. Ticks are minutes apart, so a few seconds
+# of lag only matters for writes landing right at a tick boundary.
+TICK_CACHE_TTL_SECONDS = 5
+
+_cache = cache.TTLCache(ttl_seconds=TICK_CACHE_TTL_SECONDS, maxsize=1)
+
+
+@dataclass(frozen=True)
+class Tick:
+    id: int
+    day: str
+    hour: int
+
+
+def _remember(tick: Tick | None, generation: int | None = None) -> Tick | None:
+    if tick is not None:
+        _cache.set("current", tick, generation=generation)
+        log.set_game_tick(tick.day, tick.hour)
+    return tick
+
+
+def record(connection: sqlalchemy.Connection, day: str, hour: int) -> tuple[Tick, bool]:
+    """
+    Appends a tick to game_time unless the latest tick already is (day,
+    hour), as when the same time is posted again on a retry. Returns the
+    tick and whether it was created; the caller should pass the tick to
+    advance() once its transaction commits.
+
+    game_time is locked for the rest of the transaction so concurrent
+    retries of one time cannot both miss the other's row. (day, hour) comes
+    round again every game week, so only the latest tick is compared.
+    """
+    connection.execute(
+        sqlalchemy.text("LOCK TABLE game_time IN SHARE ROW EXCLUSIVE MODE")
+    )
+    latest = connection.execute(
+        sqlalchemy.text(
+            """
+            SELECT id, day, hour FROM game_time
+            ORDER BY id DESC
+            LIMIT 1
+            """
+        )
+    ).first()
+    if latest is not None and (latest.day, latest.hour) == (day, hour):
+        return Tick(id=latest.id, day=day, hour=hour), False
+
+    tick_id = connection.execute(
+        sqlalchemy.text(
+            """
+            INSERT INTO game_time (day, hour)
+            VALUES (:day, :hour)
+            RETURNING id
+            """
+        ),
+        {"day": day, "hour": hour},
+    ).scalar_one()
+    return Tick(id=tick_id, day=day, hour=hour), True
+
+
+def advance(tick: Tick) -> None:
+    """Makes a committed tick the current one in this process."""
+    _cache.invalidate()
+    _remember(tick)
+
+
+def cached() -> Tick | None:
+    """The latest tick if this process holds a fresh copy, without a query."""
+    return _cache.get("current")
+
+
+def current(connection: sqlalchemy.Connection | None = None) -> Tick | None:
+    """
+    The latest tick, from the process cache when it is fresh and otherwise
+    from game_time (on connection if given). None before the first tick.
+    """
+    tick = cached()
+    if tick is not None:
+        return tick
+
+    generation = _cache.generation
+    query = sqlalchemy.text(
+        """
+        SELECT id, day, hour FROM game_time
+        ORDER BY id DESC
+        LIMIT 1
+        """
+    )
+    if connection is not None:
+        row = connection.execute(query).first()
+    else:
+        with db.engine.begin() as connection:
+            row = connection.execute(query).first()
+
+    if row is None:
+        return None
+    return _remember(Tick(id=row.id, day=row.day, hour=row.hour), generation)
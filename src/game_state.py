@@ -0,0 +1,64 @@
+from typing import Callable, Sequence
+
+import sqlalchemy
+
+from src import ledger
+
+# Tables holding the shop's game state. Every *_ledger table is included as
+# well, so a new ledger is cleared without touching this list; names that
+# do not exist in the schema yet are skipped. game_time, customers and
+# visits are the exchange's history, not the shop's, and survive a reset.
+STATE_TABLES = (
+    "ledger_balances",
+    "ledger_checkpoints",
+    "processed_requests",
+    "orders",
+    "order_items",
+    "carts",
+    "cart_items",
+    "potion_inventory",
+    "barrel_inventory",
+    "potion_prices",
+)
+LEDGER_TABLE_PATTERN = "%\\_ledger"
+
+
+def tables(connection: sqlalchemy.Connection) -> list[str]:
+    """The state tables that exist in the connection's current schema."""
+    return list(
+        connection.execute(
+            sqlalchemy.text(
+                """
+                SELECT tablename FROM pg_tables
+                WHERE schemaname = current_schema()
+                  AND (
+                      tablename = ANY(CAST(:tables AS text[]))
+                      OR tablename LIKE :ledger_pattern
+                  )
+                ORDER BY tablename
+                """
+            ),
+            {"tables": list(STATE_TABLES), "ledger_pattern": LEDGER_TABLE_PATTERN},
+        ).scalars()
+    )
+
+
+def truncate_statement(names: Sequence[str], quote: Callable[[str], str]) -> str:
+    # Ids keep counting across resets: checkout is idempotent on cart_id and
+    # other workers may still hold a pre-reset cart's response for an id.
+    return f"TRUNCATE {', '.join(quote(name) for name in names)} CONTINUE IDENTITY"
+
+
+def reset(connection: sqlalchemy.Connection) -> list[str]:
+    """
+    Empties every state table with a single TRUNCATE, leaving their id
+    sequences where they were, and posts the starting gold. TRUNCATE takes an ACCESS
+    EXCLUSIVE lock and frees the storage at once, so the cost does not grow
+    with the number of rows the way DELETE does. Returns the tables cleared.
+    """
+    names = tables(connection)
+    if names:
+        quote = connection.dialect.identifier_preparer.quote
+        connection.execute(sqlalchemy.text(truncate_statement(names, quote)))
+    ledger.post(connection, gold=ledger.STARTING_GOLD)
+    return names
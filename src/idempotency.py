@@ -0,0 +1,111 @@
+import json
+from typing import Any, Callable
+
+import sqlalchemy
+
+from src import cache
+from src import database as db
+
+_MISSING = object()
+
+# Recently finished requests, so most retries are answered without touching
+# Postgres at all.
+_recent = cache.LRUCache(maxsize=1024)
+
+
+def _run_once_on(
+    connection: sqlalchemy.Connection,
+    endpoint: str,
+    key: str,
+    write: Callable[[sqlalchemy.Connection], Any],
+) -> Any:
+    params = {"endpoint": endpoint, "request_key": key}
+    stored = connection.execute(
+        sqlalchemy.text(
+            """
+            SELECT response FROM processed_requests
+            WHERE endpoint = :endpoint AND request_key = :request_key
+            """
+        ),
+        params,
+    ).first()
+    if stored is not None:
+        return stored.response
+
+    claimed = connection.execute(
+        sqlalchemy.text(
+            """
+            INSERT INTO processed_requests (endpoint, request_key)
+            VALUES (:endpoint, :request_key)
+            ON CONFLICT (endpoint, request_key) DO NOTHING
+            RETURNING id
+            """
+        ),
+        params,
+    ).first()
+
+    if claimed is None:
+        return connection.execute(
+            sqlalchemy.text(
+                """
+                SELECT response FROM processed_requests
+                WHERE endpoint = :endpoint AND request_key = :request_key
+                """
+            ),
+            params,
+        ).scalar_one()
+
+    response = write(connection)
+    connection.execute(
+        sqlalchemy.text(
+            """
+            UPDATE processed_requests SET response = CAST(:response AS jsonb)
+            WHERE id = :id
+            """
+        ),
+        {"id": claimed.id, "response": json.dumps(response)},
+    )
+    return response
+
+
+def run_once(
+    endpoint: str, key: str | int, write: Callable[[sqlalchemy.Connection], Any]
+) -> Any:
+    """
+    Runs write at most once per (endpoint, key) and returns its JSON-able
+    response. Later calls with the same key return the stored response
+    without running write again.
+
+    The key is claimed in processed_requests in the same transaction as the
+    write, so a write that raises releases the key and a concurrent duplicate
+    waits on the unique index and then reads the winner's response.
+    """
+    request = (endpoint, str(key))
+    response = _recent.get(request, _MISSING)
+    if response is not _MISSING:
+        return response
+
+    with db.engine.begin() as connection:
+        response = _run_once_on(connection, endpoint, str(key), write)
+
+    _recent.set(request, response)
+    return response
+
+
+async def run_once_async(
+    endpoint: str, key: str | int, write: Callable[[sqlalchemy.Connection], Any]
+) -> Any:
+    """
+    run_once() for async routes. write still receives a sync Connection (via
+    AsyncConnection.run_sync), so it must only do I/O through that connection.
+    """
+    request = (endpoint, str(key))
+    response = _recent.get(request, _MISSING)
+    if response is not _MISSING:
+        return response
+
+    async with db.async_engine.begin() as connection:
+        response = await connection.run_sync(_run_once_on, endpoint, str(key), write)
+
+    _recent.set(request, response)
+    return response
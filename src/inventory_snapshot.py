@@ -0,0 +1,215 @@
+import atexit
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Mapping
+
+import sqlalchemy
+
+from src import config, ledger
+from src import database as db
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int
+    balances: Mapping[str, int]
+
+
+@dataclass(frozen=True)
+class ReadPoint:
+    """A Postgres snapshot, as pg_current_snapshot() prints it."""
+
+    xmin: int
+    xmax: int
+    in_progress: frozenset[int]
+
+    @classmethod
+    def parse(cls, text: str) -> "ReadPoint":
+        xmin, xmax, in_progress = text.split(":")
+        return cls(
+            int(xmin), int(xmax), frozenset(int(x) for x in in_progress.split(",") if x)
+        )
+
+    def includes(self, xid: int) -> bool:
+        """Whether transaction xid had committed when this snapshot was taken."""
+        return xid < self.xmin or (xid < self.xmax and xid not in self.in_progress)
+
+
+class InventorySnapshot:
+    """
+    The audit balances (gold, ml per color, potions) held in memory. Ledger
+    writes made by this process are applied once their transaction commits,
+    each bumping version, so /inventory/audit never touches the database
+    after the first load.
+
+    Writes from other workers are only seen by reconcile(), which a
+    background thread runs every reconcile_seconds. It replaces the
+    snapshot with the ledger balances when they disagree, provided nothing
+    was applied while it was reading.
+
+    A local write can commit before a load() or reconcile() reads the
+    balances and still be waiting to be applied. Each batch of deltas
+    therefore carries its transaction id, and each read the Postgres
+    snapshot it was taken at; batches the installed balances already
+    include are skipped.
+    """
+
+    def __init__(self, engine: sqlalchemy.Engine, reconcile_seconds: float):
+        self.engine = engine
+        self.reconcile_seconds = reconcile_seconds
+        self.repairs = 0
+        self._snapshot: Snapshot | None = None
+        self._read_at: ReadPoint | None = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stopping = threading.Event()
+
+    def _install(
+        self, balances: Mapping[str, int], read_at: str | None = None
+    ) -> Snapshot:
+        if read_at is not None:
+            self._read_at = ReadPoint.parse(read_at)
+        self._version += 1
+        self._snapshot = Snapshot(version=self._version, balances=dict(balances))
+        return self._snapshot
+
+    def current(self) -> Snapshot | None:
+        """The snapshot, or None before the first load()."""
+        return self._snapshot
+
+    def load(self, connection: sqlalchemy.Connection) -> Snapshot:
+        balances, read_at = ledger.balances_read_at(connection)
+        with self._lock:
+            snapshot = self._install(balances, read_at)
+        self._ensure_started()
+        return snapshot
+
+    def apply(self, deltas: Mapping[str, int], xid: int | None = None) -> None:
+        """
+        Adds the deltas committed by transaction xid, unless the balances
+        were read after it committed; a no-op until the first load().
+        """
+        with self._lock:
+            if self._snapshot is None:
+                return
+            if xid is not None and self._read_at is not None:
+                if self._read_at.includes(xid):
+                    return
+            balances = dict(self._snapshot.balances)
+            for account, delta in deltas.items():
+                if account in balances:
+                    balances[account] += delta
+            self._install(balances)
+
+    def invalidate(self) -> None:
+        """Drops the snapshot; the next audit reloads it from the ledger."""
+        with self._lock:
+            self._snapshot = None
+
+    def reconcile(
+        self, connection: sqlalchemy.Connection
+    ) -> dict[str, tuple[int, int]]:
+        """
+        Compares the snapshot with the ledger balances and repairs it. Returns
+        {account: (snapshot, ledger)} for the accounts that had drifted.
+        """
+        before = self._snapshot
+        if before is None:
+            return {}
+        actual, read_at = ledger.balances_read_at(connection)
+        drift = {
+            account: (before.balances.get(account, 0), balance)
+            for account, balance in actual.items()
+            if before.balances.get(account, 0) != balance
+        }
+        if not drift:
+            return {}
+        with self._lock:
+            if self._snapshot is not before:
+                # Something was applied while reading; check again next time.
+                return {}
+            self._install(actual, read_at)
+            self.repairs += 1
+        logger.warning("inventory snapshot drifted, repaired: %s", drift)
+        return drift
+
+    def stop(self) -> None:
+        """Stops the reconciler thread."""
+        self._stopping.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None or self.reconcile_seconds <= 0:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stopping.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="inventory-reconciler", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.reconcile_seconds):
+            try:
+                with self.engine.begin() as connection:
+                    self.reconcile(connection)
+            except Exception:
+                logger.exception("inventory reconcile failed")
+
+
+snapshot = InventorySnapshot(
+    db.engine, config.get_settings().INVENTORY_RECONCILE_SECONDS
+)
+
+
+# ledger.post() sums each transaction's deltas into connection.info, with
+# the transaction's id. They are set aside as a batch when the transaction
+# commits and applied once the COMMIT is known to have succeeded: when the
+# connection is back in the pool or begins its next transaction. The
+# "commit" event fires before the COMMIT itself runs, so batches are dropped
+# if it fails, as well as on rollback.
+def _set_aside_on_commit(connection: sqlalchemy.Connection) -> None:
+    deltas = connection.info.pop("ledger_deltas", None)
+    xid = connection.info.pop("ledger_xid", None)
+    if deltas:
+        batches = connection.info.setdefault("committed_ledger_deltas", [])
+        batches.append((xid, deltas))
+
+
+def _drop_on_rollback(connection: sqlalchemy.Connection) -> None:
+    connection.info.pop("ledger_deltas", None)
+    connection.info.pop("ledger_xid", None)
+    connection.info.pop("committed_ledger_deltas", None)
+
+
+def _drop_on_failed_commit(context: sqlalchemy.engine.ExceptionContext) -> None:
+    # Errors outside a statement come from COMMIT, ROLLBACK or BEGIN; only
+    # a failed COMMIT can find deltas still set aside.
+    if context.statement is None and context.connection is not None:
+        context.connection.info.pop("committed_ledger_deltas", None)
+
+
+def _apply_on_begin(connection: sqlalchemy.Connection) -> None:
+    for xid, deltas in connection.info.pop("committed_ledger_deltas", ()):
+        snapshot.apply(deltas, xid)
+
+
+def _apply_on_checkin(dbapi_connection, connection_record) -> None:
+    for xid, deltas in connection_record.info.pop("committed_ledger_deltas", ()):
+        snapshot.apply(deltas, xid)
+
+
+for _engine in (db.engine, db.async_engine.sync_engine):
+    sqlalchemy.event.listen(_engine, "commit", _set_aside_on_commit)
+    sqlalchemy.event.listen(_engine, "rollback", _drop_on_rollback)
+    sqlalchemy.event.listen(_engine, "handle_error", _drop_on_failed_commit)
+    sqlalchemy.event.listen(_engine, "begin", _apply_on_begin)
+    sqlalchemy.event.listen(_engine, "checkin", _apply_on_checkin)
@@ -0,0 +1,421 @@
+import threading
+from datetime import datetime
+from typing import Mapping, Sequence
+
+import sqlalchemy
+
+from src import database as db
+from src import game_clock
+
+ML_ACCOUNTS = ("red_ml", "green_ml", "blue_ml", "dark_ml")
+POTIONS_ACCOUNT = "potions"
+POTION_ACCOUNT_PREFIX = "potion:"
+CAPACITY_ACCOUNTS = ("potion_capacity", "ml_capacity")
+SUMMARY_ACCOUNTS = ("gold", *ML_ACCOUNTS, POTIONS_ACCOUNT)
+STARTING_GOLD = 100
+
+POTIONS_IN_STOCK = sqlalchemy.text(
+    """
+    SELECT account, balance FROM ledger_balances
+    WHERE account LIKE :prefix AND balance > 0
+    """
+)
+GOLD_SINCE = sqlalchemy.text(
+    """
+    SELECT COALESCE(SUM(gold), 0) FROM gold_ledger
+    WHERE id > :gold_after
+      AND (CAST(:until AS timestamptz) IS NULL OR created_at <= :until)
+    """
+)
+
+# Bumped whenever this process writes to the ledger, so in-memory results
+# derived from balances can be keyed on it. See _bump_version_on_checkin.
+_version = 0
+_version_lock = threading.Lock()
+
+
+def version() -> int:
+    return _version
+
+
+def _bump_version() -> None:
+    global _version
+    with _version_lock:
+        _version += 1
+
+
+def _bump_version_on_checkin(dbapi_connection, connection_record) -> None:
+    """
+    post() bumps the version while its transaction is still open, so a reader
+    in that window could cache old balances under the new version. Bumping
+    again once the connection is back in the pool, after the commit or
+    rollback, retires anything computed in between.
+    """
+    if connection_record.info.pop("ledger_written", False):
+        _bump_version()
+
+
+sqlalchemy.event.listen(db.engine, "checkin", _bump_version_on_checkin)
+sqlalchemy.event.listen(
+    db.async_engine.sync_engine, "checkin", _bump_version_on_checkin
+)
+
+
+def post(
+    connection: sqlalchemy.Connection,
+    gold: int = 0,
+    ml: Sequence[int] | None = None,
+    potions: Mapping[str, int] | None = None,
+    capacity: Sequence[int] | None = None,
+) -> None:
+    """
+    Appends entries to gold_ledger, ml_ledger, potion_ledger and
+    capacity_ledger and applies the same deltas to ledger_balances, all on
+    the caller's connection so the entries and the balances commit or roll
+    back together.
+
+    ml is [red, green, blue, dark]; potions maps sku to a quantity delta;
+    capacity is [potion units, ml units] purchased. Entries are stamped with
+    the current game tick.
+    """
+    deltas: dict[str, int] = {}
+    connection.info["ledger_written"] = True
+    _bump_version()
+    tick = game_clock.current(connection)
+    tick_id = tick.id if tick is not None else None
+
+    if gold:
+        connection.execute(
+            sqlalchemy.text(
+                """
+                INSERT INTO gold_ledger (gold, tick_id)
+                VALUES (:gold, :tick_id)
+                """
+            ),
+            {"gold": gold, "tick_id": tick_id},
+        )
+        deltas["gold"] = gold
+
+    if ml is not None and any(ml):
+        connection.execute(
+            sqlalchemy.text(
+                """
+                INSERT INTO ml_ledger (red_ml, green_ml, blue_ml, dark_ml, tick_id)
+                VALUES (:red_ml, :green_ml, :blue_ml, :dark_ml, :tick_id)
+                """
+            ),
+            {**dict(zip(ML_ACCOUNTS, ml)), "tick_id": tick_id},
+        )
+        deltas.update(zip(ML_ACCOUNTS, ml))
+
+    potions = {sku: quantity for sku, quantity in (potions or {}).items() if quantity}
+    if potions:
+        connection.execute(
+            sqlalchemy.text(
+                """
+                INSERT INTO potion_ledger (sku, quantity, tick_id)
+                SELECT sku, quantity, CAST(:tick_id AS bigint)
+                FROM unnest(CAST(:skus AS text[]), CAST(:quantities AS int[]))
+                    AS deltas (sku, quantity)
+                """
+            ),
+            {
+                "skus": list(potions),
+                "quantities": list(potions.values()),
+                "tick_id": tick_id,
+            },
+        )
+        for sku, quantity in potions.items():
+            deltas[POTION_ACCOUNT_PREFIX + sku] = quantity
+        deltas[POTIONS_ACCOUNT] = sum(potions.values())
+
+    if capacity is not None and any(capacity):
+        connection.execute(
+            sqlalchemy.text(
+                """
+                INSERT INTO capacity_ledger (potion_capacity, ml_capacity, tick_id)
+                VALUES (:potion_capacity, :ml_capacity, :tick_id)
+                """
+            ),
+            {**dict(zip(CAPACITY_ACCOUNTS, capacity)), "tick_id": tick_id},
+        )
+        deltas.update(zip(CAPACITY_ACCOUNTS, capacity))
+
+    if deltas:
+        xid = connection.execute(
+            sqlalchemy.text(
+                """
+                INSERT INTO ledger_balances (account, balance)
+                SELECT * FROM unnest(CAST(:accounts AS text[]), CAST(:deltas AS bigint[]))
+                ON CONFLICT (account)
+                DO UPDATE SET balance = ledger_balances.balance + EXCLUDED.balance
+                RETURNING CAST(pg_current_xact_id() AS text)
+                """
+            ),
+            {"accounts": list(deltas), "deltas": list(deltas.values())},
+        ).scalar()
+        # Summed per transaction for in-memory views of the balances, which
+        # apply them once the transaction commits, along with the transaction
+        # id that tells them whether a read already included these deltas.
+        # See src/inventory_snapshot.py.
+        connection.info["ledger_xid"] = int(xid)
+        pending = connection.info.setdefault("ledger_deltas", {})
+        for account, delta in deltas.items():
+            pending[account] = pending.get(account, 0) + delta
+
+
+def rename_potions(
+    connection: sqlalchemy.Connection, renamed: Mapping[str, str]
+) -> None:
+    """
+    Moves the potion_ledger entries and balances of each old SKU in renamed
+    onto its new SKU, for a recipe that now sells an existing mix under
+    another name. The entries keep their ticks, so the mix's sales history
+    follows it; the potions total is unchanged.
+    """
+    if not renamed:
+        return
+    connection.info["ledger_written"] = True
+    _bump_version()
+    params = {"old": list(renamed), "new": list(renamed.values())}
+    connection.execute(
+        sqlalchemy.text(
+            """
+            UPDATE potion_ledger SET sku = renamed.new
+            FROM unnest(CAST(:old AS text[]), CAST(:new AS text[]))
+                AS renamed (old, new)
+            WHERE potion_ledger.sku = renamed.old
+            """
+        ),
+        params,
+    )
+    connection.execute(
+        sqlalchemy.text(
+            """
+            WITH moved AS (
+                DELETE FROM ledger_balances
+                USING unnest(CAST(:old AS text[]), CAST(:new AS text[]))
+                    AS renamed (old, new)
+                WHERE ledger_balances.account = :prefix || renamed.old
+                RETURNING :prefix || renamed.new AS account, balance
+            )
+            INSERT INTO ledger_balances (account, balance)
+            SELECT account, SUM(balance) FROM moved GROUP BY account
+            ON CONFLICT (account)
+            DO UPDATE SET balance = ledger_balances.balance + EXCLUDED.balance
+            """
+        ),
+        {**params, "prefix": POTION_ACCOUNT_PREFIX},
+    )
+
+
+def balances(
+    connection: sqlalchemy.Connection, accounts: Sequence[str] = SUMMARY_ACCOUNTS
+) -> dict[str, int]:
+    """Current balances for accounts, read from the snapshot table."""
+    rows = connection.execute(
+        sqlalchemy.text(
+            """
+            SELECT account, balance FROM ledger_balances
+            WHERE account = ANY(CAST(:accounts AS text[]))
+            """
+        ),
+        {"accounts": list(accounts)},
+    ).all()
+    found = {row.account: row.balance for row in rows}
+    return {account: found.get(account, 0) for account in accounts}
+
+
+def balances_read_at(
+    connection: sqlalchemy.Connection, accounts: Sequence[str] = SUMMARY_ACCOUNTS
+) -> tuple[dict[str, int], str]:
+    """
+    balances() along with the pg_current_snapshot() they were read at, which
+    tells exactly which committed transactions the balances include.
+    """
+    row = connection.execute(
+        sqlalchemy.text(
+            """
+            SELECT
+                CAST(pg_current_snapshot() AS text) AS read_at,
+                COALESCE(
+                    (SELECT jsonb_object_agg(account, balance) FROM ledger_balances
+                     WHERE account = ANY(CAST(:accounts AS text[]))),
+                    '{}'::jsonb
+                ) AS balances
+            """
+        ),
+        {"accounts": list(accounts)},
+    ).one()
+    return {account: row.balances.get(account, 0) for account in accounts}, row.read_at
+
+
+def potion_balances(connection: sqlalchemy.Connection) -> dict[str, int]:
+    """{sku: quantity} for every potion SKU currently in stock."""
+    rows = connection.execute(
+        POTIONS_IN_STOCK, {"prefix": POTION_ACCOUNT_PREFIX + "%"}
+    ).all()
+    return {
+        row.account.removeprefix(POTION_ACCOUNT_PREFIX): row.balance for row in rows
+    }
+
+
+def checkpoint(connection: sqlalchemy.Connection) -> int:
+    """
+    Saves every balance along with the last id of each ledger table so
+    balances_as_of() only has to sum entries written after it. The ledgers
+    are locked in SHARE mode for the rest of the transaction so no write is
+    half in and half out of the checkpoint.
+    """
+    connection.execute(
+        sqlalchemy.text(
+            """
+            LOCK TABLE gold_ledger, ml_ledger, potion_ledger, capacity_ledger
+            IN SHARE MODE
+            """
+        )
+    )
+    return connection.execute(
+        sqlalchemy.text(
+            """
+            INSERT INTO ledger_checkpoints
+                (balances, gold_ledger_id, ml_ledger_id, potion_ledger_id,
+                 capacity_ledger_id)
+            SELECT
+                COALESCE(
+                    (SELECT jsonb_object_agg(account, balance) FROM ledger_balances),
+                    '{}'::jsonb
+                ),
+                (SELECT COALESCE(MAX(id), 0) FROM gold_ledger),
+                (SELECT COALESCE(MAX(id), 0) FROM ml_ledger),
+                (SELECT COALESCE(MAX(id), 0) FROM potion_ledger),
+                (SELECT COALESCE(MAX(id), 0) FROM capacity_ledger)
+            RETURNING id
+            """
+        )
+    ).scalar_one()
+
+
+def _ledger_sums(
+    connection: sqlalchemy.Connection,
+    gold_after: int = 0,
+    ml_after: int = 0,
+    potion_after: int = 0,
+    capacity_after: int = 0,
+    until: datetime | None = None,
+) -> dict[str, int]:
+    """Sums of ledger entries with ids past the given marks, up to until."""
+    params = {
+        "gold_after": gold_after,
+        "ml_after": ml_after,
+        "potion_after": potion_after,
+        "capacity_after": capacity_after,
+        "until": until,
+    }
+    sums: dict[str, int] = {}
+
+    sums["gold"] = connection.execute(GOLD_SINCE, params).scalar_one()
+
+    ml = connection.execute(
+        sqlalchemy.text(
+            """
+            SELECT
+                COALESCE(SUM(red_ml), 0),
+                COALESCE(SUM(green_ml), 0),
+                COALESCE(SUM(blue_ml), 0),
+                COALESCE(SUM(dark_ml), 0)
+            FROM ml_ledger
+            WHERE id > :ml_after
+              AND (CAST(:until AS timestamptz) IS NULL OR created_at <= :until)
+            """
+        ),
+        params,
+    ).one()
+    sums.update(zip(ML_ACCOUNTS, ml))
+
+    rows = connection.execute(
+        sqlalchemy.text(
+            """
+            SELECT sku, SUM(quantity) AS quantity FROM potion_ledger
+            WHERE id > :potion_after
+              AND (CAST(:until AS timestamptz) IS NULL OR created_at <= :until)
+            GROUP BY sku
+            """
+        ),
+        params,
+    ).all()
+    for row in rows:
+        sums[POTION_ACCOUNT_PREFIX + row.sku] = row.quantity
+    sums[POTIONS_ACCOUNT] = sum(row.quantity for row in rows)
+
+    capacity = connection.execute(
+        sqlalchemy.text(
+            """
+            SELECT COALESCE(SUM(potion_capacity), 0), COALESCE(SUM(ml_capacity), 0)
+            FROM capacity_ledger
+            WHERE id > :capacity_after
+              AND (CAST(:until AS timestamptz) IS NULL OR created_at <= :until)
+            """
+        ),
+        params,
+    ).one()
+    sums.update(zip(CAPACITY_ACCOUNTS, capacity))
+
+    return sums
+
+
+def balances_as_of(connection: sqlalchemy.Connection, at: datetime) -> dict[str, int]:
+    """
+    Rebuilds every balance as it stood at a past time: the newest checkpoint
+    taken at or before it plus the ledger entries written since.
+    """
+    row = connection.execute(
+        sqlalchemy.text(
+            """
+            SELECT balances, gold_ledger_id, ml_ledger_id, potion_ledger_id,
+                   capacity_ledger_id
+            FROM ledger_checkpoints
+            WHERE created_at <= :at
+            ORDER BY created_at DESC
+            LIMIT 1
+            """
+        ),
+        {"at": at},
+    ).first()
+
+    result: dict[str, int] = {}
+    marks = {}
+    if row is not None:
+        result.update(row.balances)
+        marks = {
+            "gold_after": row.gold_ledger_id,
+            "ml_after": row.ml_ledger_id,
+            "potion_after": row.potion_ledger_id,
+            "capacity_after": row.capacity_ledger_id,
+        }
+
+    for account, delta in _ledger_sums(connection, until=at, **marks).items():
+        result[account] = result.get(account, 0) + delta
+    return result
+
+
+def check_consistency(connection: sqlalchemy.Connection) -> dict[str, tuple[int, int]]:
+    """
+    Compares every snapshot balance with a full sum over the ledgers. Returns
+    {account: (snapshot balance, ledger sum)} for the accounts that disagree.
+    """
+    snapshot = {
+        row.account: row.balance
+        for row in connection.execute(
+            sqlalchemy.text("SELECT account, balance FROM ledger_balances")
+        )
+    }
+    ledger = _ledger_sums(connection)
+
+    mismatches = {}
+    for account in snapshot.keys() | ledger.keys():
+        expected = ledger.get(account, 0)
+        actual = snapshot.get(account, 0)
+        if actual != expected:
+            mismatches[account] = (actual, expected)
+    return mismatches
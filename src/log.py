@@ -0,0 +1,103 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+
+from src import config
+
+# Set per request by the middleware in src.api.server.
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "request_id", default="-"
+)
+
+# The latest game tick shared through /info/current_time. Ticks are global to
+# the process, not per request, so this is a plain module value.
+_game_tick = "-"
+
+_listener: logging.handlers.QueueListener | None = None
+
+# Attributes every LogRecord has; anything else came in through extra=.
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "request_id",
+    "tick",
+}
+
+
+def set_game_tick(day: str, hour: int) -> None:
+    global _game_tick
+    _game_tick = f"{day}:{hour}"
+
+
+class ContextFilter(logging.Filter):
+    """Stamps each record with the current request id and game tick."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        record.tick = _game_tick
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any fields passed via extra=."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+            "tick": getattr(record, "tick", "-"),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(level: str | None = None, stream=None) -> None:
+    """
+    Routes the "src" loggers through a QueueHandler so request handlers only
+    pay for an enqueue; a background QueueListener does the JSON encoding and
+    the write. Calls below the configured level return before any message
+    formatting, which is what keeps debug payloads off the hot path.
+
+    Safe to call more than once; later calls replace the earlier setup.
+    """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(ContextFilter())
+
+    logger = logging.getLogger("src")
+    logger.handlers = [handler]
+    logger.setLevel((level or config.get_settings().LOG_LEVEL).upper())
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+
+
+def shutdown() -> None:
+    """Flushes queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown)
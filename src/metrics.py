@@ -0,0 +1,167 @@
+import re
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Statements are grouped by their whitespace-normalized text. Past this many
+# distinct statements, new ones are counted under OVERFLOW_STATEMENT.
+MAX_TRACKED_STATEMENTS = 200
+OVERFLOW_STATEMENT = "<other>"
+
+_lock = threading.Lock()
+
+
+class Timing:
+    """Count, total and worst of a series of durations in milliseconds."""
+
+    __slots__ = ("count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class PoolStats:
+    __slots__ = ("checked_out", "checkouts", "checkout_wait")
+
+    def __init__(self):
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_wait = Timing()
+
+
+_pools: dict[str, PoolStats] = {}
+_statements: dict[str, Timing] = {}
+
+
+def _pool_stats(name: str) -> PoolStats:
+    stats = _pools.get(name)
+    if stats is None:
+        stats = _pools[name] = PoolStats()
+    return stats
+
+
+class _TimedCheckout:
+    """
+    Times how long each checkout waits for a free connection. Pools have no
+    event that fires before a checkout starts, so this wraps _do_get.
+    """
+
+    logging_name: str | None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()  # type: ignore[misc]
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with _lock:
+                _pool_stats(self.logging_name or "default").checkout_wait.add(
+                    elapsed_ms
+                )
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def _normalize(statement: str) -> str:
+    return re.sub(r"\s+", " ", statement).strip()[:200]
+
+
+def instrument(engine: Engine, name: str) -> None:
+    """
+    Registers pool and statement event hooks on engine. For an AsyncEngine
+    pass its sync_engine. name must match the pool_logging_name the engine
+    was created with so checkout waits land in the same PoolStats.
+    """
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        with _lock:
+            stats = _pool_stats(name)
+            stats.checked_out += 1
+            stats.checkouts += 1
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        with _lock:
+            _pool_stats(name).checked_out -= 1
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["statement_started"].pop()
+        record_statement(statement, (time.perf_counter() - started) * 1000)
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(context):
+        # A failed statement never reaches after_cursor_execute; drop its
+        # start time so the stack on the pooled connection stays balanced.
+        conn = context.connection
+        if conn is not None and conn.info.get("statement_started"):
+            conn.info["statement_started"].pop()
+
+
+def record_statement(statement: str, elapsed_ms: float) -> None:
+    key = _normalize(statement)
+    with _lock:
+        timing = _statements.get(key)
+        if timing is None:
+            if len(_statements) >= MAX_TRACKED_STATEMENTS:
+                key = OVERFLOW_STATEMENT
+            timing = _statements.setdefault(key, Timing())
+        timing.add(elapsed_ms)
+
+
+def snapshot() -> dict[str, Any]:
+    """Pool gauges and per-statement latency, slowest total first."""
+    with _lock:
+        pools = {
+            name: {
+                "checked_out": stats.checked_out,
+                "checkouts": stats.checkouts,
+                "checkout_wait": stats.checkout_wait.as_dict(),
+            }
+            for name, stats in _pools.items()
+        }
+        statements = [
+            {"statement": statement, **timing.as_dict()}
+            for statement, timing in _statements.items()
+        ]
+    statements.sort(key=lambda s: s["total_ms"], reverse=True)
+    return {"pools": pools, "statements": statements}
+
+
+def reset() -> None:
+    """Zeroes counters and latencies. checked_out is a live gauge and stays."""
+    with _lock:
+        for stats in _pools.values():
+            stats.checkouts = 0
+            stats.checkout_wait = Timing()
+        _statements.clear()
@@ -0,0 +1,34 @@
+from typing import Callable, Hashable, TypeVar
+
+from src import cache, ledger
+
+# Plans only change when the ledger does or the tick moves on (both drop
+# entries); the TTL bounds staleness from ledger writes in other workers.
+PLAN_CACHE_TTL_SECONDS = 30
+
+T = TypeVar("T")
+
+_MISSING = object()
+_plans = cache.TTLCache(ttl_seconds=PLAN_CACHE_TTL_SECONDS, maxsize=64)
+
+
+def get_or_plan(name: str, inputs: Hashable, plan: Callable[[], T]) -> T:
+    """
+    Returns the cached result of plan() for (name, ledger version, inputs),
+    running it only on a miss. A retried plan call with the same payload is
+    answered from memory without touching the database or the planner.
+    """
+    key = (name, ledger.version(), inputs)
+    result = _plans.get(key, _MISSING)
+    if result is not _MISSING:
+        return result
+
+    generation = _plans.generation
+    result = plan()
+    _plans.set(key, result, generation=generation)
+    return result
+
+
+def invalidate() -> None:
+    """Drops every cached plan. Call when the game tick changes."""
+    _plans.invalidate()
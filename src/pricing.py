@@ -0,0 +1,130 @@
+import sqlalchemy
+
+from src import cache, forecast, game_clock, ledger, recipes
+from src import database as db
+
+BASE_PRICE = recipes.DEFAULT_PRICE
+MIN_PRICE = 1
+MAX_PRICE = 500
+
+# Aim to hold this many ticks of expected sales. SKUs with less stock than
+# that get dearer, SKUs with more get cheaper, within the factor bounds.
+TARGET_COVER_TICKS = 3.0
+PRICE_ELASTICITY = 0.25
+MIN_FACTOR = 0.6
+MAX_FACTOR = 1.6
+# Demand assumed for SKUs that have no sales history yet.
+MIN_DEMAND = 0.5
+
+# Price tables are keyed by tick id, so entries never go stale; the TTL only
+# bounds how long an old tick's table lingers.
+_tables = cache.TTLCache(ttl_seconds=3600, maxsize=4)
+
+SELECT_PRICES = sqlalchemy.text(
+    """
+    SELECT sku, price FROM potion_prices
+    WHERE tick_id = :tick_id
+    """
+)
+
+
+def compute_price(demand: float, stock: int, base_price: int = BASE_PRICE) -> int:
+    """
+    Prices a SKU from its expected sales per tick and the units on hand:
+    base_price scaled by (target cover / actual cover) ** PRICE_ELASTICITY.
+    """
+    cover = stock / max(demand, MIN_DEMAND)
+    factor = (TARGET_COVER_TICKS / max(cover, 0.1)) ** PRICE_ELASTICITY
+    factor = min(max(factor, MIN_FACTOR), MAX_FACTOR)
+    return min(max(round(base_price * factor), MIN_PRICE), MAX_PRICE)
+
+
+def base_price(sku: str) -> int:
+    """The recipe's list price, or BASE_PRICE for SKUs without a recipe."""
+    recipe = recipes.registry.for_sku(sku)
+    return BASE_PRICE if recipe is None else recipe.price
+
+
+def compute_table(stock: dict[str, int], hour: int) -> dict[str, int]:
+    return {
+        sku: compute_price(
+            forecast.demand.forecast(sku, hour), quantity, base_price(sku)
+        )
+        for sku, quantity in stock.items()
+    }
+
+
+def price_of(prices: dict[str, int], sku: str) -> int:
+    """
+    A SKU's price this tick; SKUs bottled after the table was built get their
+    list price.
+    """
+    price = prices.get(sku)
+    return base_price(sku) if price is None else price
+
+
+def _store_table(tick: game_clock.Tick) -> list:
+    """
+    Builds tick's table and stores it in its own transaction, then returns
+    the rows stored for tick. Another worker may have stored its table first,
+    in which case those rows are the ones returned.
+    """
+    with db.engine.begin() as connection:
+        forecast.demand.ensure_loaded(connection)
+        recipes.registry.ensure_loaded(connection)
+        table = compute_table(ledger.potion_balances(connection), tick.hour)
+        if not table:
+            return []
+        connection.execute(
+            sqlalchemy.text(
+                """
+                INSERT INTO potion_prices (tick_id, sku, price)
+                SELECT :tick_id, sku, price
+                FROM unnest(CAST(:skus AS text[]), CAST(:prices AS int[]))
+                    AS prices (sku, price)
+                ON CONFLICT (tick_id, sku) DO NOTHING
+                """
+            ),
+            {
+                "tick_id": tick.id,
+                "skus": list(table),
+                "prices": list(table.values()),
+            },
+        )
+        rows = connection.execute(SELECT_PRICES, {"tick_id": tick.id}).all()
+    return rows
+
+
+def current_prices(
+    connection: sqlalchemy.Connection, tick: game_clock.Tick | None = None
+) -> dict[str, int]:
+    """
+    {sku: price} for tick, by default the current one. The table is built
+    from stock and forecast demand by whichever request first needs it in a
+    tick, then stored in potion_prices so every later request, worker and
+    restart in that tick, catalog and checkout alike, sees exactly the same
+    prices.
+
+    The table is committed in a transaction of its own before it is used or
+    cached, so a caller that rolls back cannot leave behind prices no other
+    worker will see; if storing it fails, so does the caller.
+    """
+    if tick is None:
+        tick = game_clock.current(connection)
+    if tick is None:
+        return {}
+
+    prices = _tables.get(tick.id)
+    if prices is not None:
+        return prices
+
+    generation = _tables.generation
+    rows = connection.execute(SELECT_PRICES, {"tick_id": tick.id}).all()
+    if not rows:
+        rows = _store_table(tick)
+    prices = {row.sku: row.price for row in rows}
+    # With nothing in stock nothing is stored, and a table built once stock
+    # arrives later in the tick must not be shadowed by an empty one.
+    if prices:
+        _tables.set(tick.id, prices, generation=generation)
+    return prices
@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+
+import sqlalchemy
+
+from src import forecast, ledger
+
+logger = logging.getLogger(__name__)
+
+PotionType = tuple[int, int, int, int]
+
+# Price of a recipe the potions table does not list.
+DEFAULT_PRICE = 50
+# Recipes added in another worker are picked up after this long.
+RELOAD_SECONDS = 30
+
+# The pure colors keep the names the exchange has always seen; every other
+# mix is sold as "r_g_b_d".
+BUILTIN_RECIPES = (
+    ("RED_POTION_0", "red potion", (100, 0, 0, 0)),
+    ("GREEN_POTION_0", "green potion", (0, 100, 0, 0)),
+    ("BLUE_POTION_0", "blue potion", (0, 0, 100, 0)),
+    ("DARK_POTION_0", "dark potion", (0, 0, 0, 100)),
+)
+
+
+class Recipe:
+    __slots__ = ("sku", "name", "potion_type", "price")
+
+    def __init__(self, sku: str, name: str, potion_type: PotionType, price: int):
+        self.sku = sku
+        self.name = name
+        self.potion_type = potion_type
+        self.price = price
+
+    def __repr__(self) -> str:
+        return f"Recipe({self.sku!r}, {self.potion_type}, price={self.price})"
+
+
+_BUILTIN_SKUS = {potion_type: sku for sku, _, potion_type in BUILTIN_RECIPES}
+
+
+def _generated(potion_type: PotionType) -> Recipe:
+    mix = "_".join(map(str, potion_type))
+    return Recipe(mix, f"{mix} potion", potion_type, DEFAULT_PRICE)
+
+
+def _default_sku(potion_type: PotionType) -> str:
+    """The SKU a mix is sold under when the potions table does not list it."""
+    return _BUILTIN_SKUS.get(potion_type) or "_".join(map(str, potion_type))
+
+
+def _parse_mix(sku: str) -> PotionType | None:
+    parts = sku.split("_")
+    if len(parts) != 4 or not all(part.isdigit() for part in parts):
+        return None
+    potion_type = tuple(int(part) for part in parts)
+    return potion_type if sum(potion_type) == 100 else None
+
+
+class RecipeRegistry:
+    """
+    Every recipe the shop sells, keyed both by potion type and by SKU. The
+    built-in colors are always present; load() adds the potions table.
+    Mixes without a recipe get a generated "r_g_b_d" one the first time they
+    are seen and are remembered after that, so lookups are a dict read.
+
+    A potions row can give a mix that is already sold a new SKU. The old SKU
+    stays an alias of the recipe, so carts still holding it check out, and
+    load() moves the mix's stock row and ledger accounts onto the new one.
+
+    load() swaps in fresh dicts, so readers never see a half-built registry.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._install([])
+
+    def _install(self, rows, stocked=()) -> None:
+        by_type: dict[PotionType, Recipe] = {}
+        for sku, name, potion_type in BUILTIN_RECIPES:
+            by_type[potion_type] = Recipe(sku, name, potion_type, DEFAULT_PRICE)
+        for row in rows:
+            potion_type = (row.red, row.green, row.blue, row.dark)
+            by_type[potion_type] = Recipe(row.sku, row.name, potion_type, row.price)
+
+        aliases = {
+            _default_sku(potion_type): potion_type
+            for potion_type, recipe in by_type.items()
+            if recipe.sku != _default_sku(potion_type)
+        }
+        for row in stocked:
+            potion_type = (row.red, row.green, row.blue, row.dark)
+            if potion_type not in by_type:
+                by_type[potion_type] = _generated(potion_type)
+            if row.sku is not None:
+                aliases.setdefault(row.sku, potion_type)
+
+        by_sku = {sku: by_type[potion_type] for sku, potion_type in aliases.items()}
+        by_sku.update((recipe.sku, recipe) for recipe in by_type.values())
+        self._by_type = by_type
+        self._by_sku = by_sku
+        self._columns: tuple[list[str], list[int]] | None = None
+
+    def for_type(self, potion_type: PotionType) -> Recipe:
+        recipe = self._by_type.get(potion_type)
+        if recipe is None:
+            recipe = _generated(tuple(potion_type))
+            with self._lock:
+                recipe = self._by_type.setdefault(recipe.potion_type, recipe)
+                self._by_sku.setdefault(recipe.sku, recipe)
+                self._columns = None
+        return recipe
+
+    def for_sku(self, sku: str) -> Recipe | None:
+        """
+        The recipe sold as sku, or that used to be sold as sku; None for SKUs
+        the shop does not produce.
+        """
+        recipe = self._by_sku.get(sku)
+        if recipe is None:
+            potion_type = _parse_mix(sku)
+            if potion_type is None or potion_type in self._by_type:
+                return None
+            recipe = self.for_type(potion_type)
+        return recipe
+
+    def sku_prices(self) -> tuple[list[str], list[int]]:
+        """
+        (skus, prices) of every recipe and alias as parallel lists, ready to
+        pass to SQL as arrays. Built once and reused until a recipe is added.
+        """
+        columns = self._columns
+        if columns is None:
+            by_sku = list(self._by_sku.items())
+            columns = ([sku for sku, _ in by_sku], [r.price for _, r in by_sku])
+            self._columns = columns
+        return columns
+
+    def load(self, connection: sqlalchemy.Connection) -> None:
+        """
+        Rebuilds the registry from the potions table, then moves stock held
+        under a SKU its mix is no longer sold as onto the current one.
+        """
+        rows = connection.execute(
+            sqlalchemy.text(
+                """
+                SELECT sku, name, price, red, green, blue, dark
+                FROM potions
+                WHERE red + green + blue + dark = 100
+                """
+            )
+        ).all()
+        stocked = connection.execute(
+            sqlalchemy.text("SELECT sku, red, green, blue, dark FROM potion_inventory")
+        ).all()
+        with self._lock:
+            self._install(rows, stocked)
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+        renamed = {}
+        for row in stocked:
+            sku = self.for_type((row.red, row.green, row.blue, row.dark)).sku
+            if row.sku is not None and row.sku != sku:
+                renamed[row.sku] = sku
+        if renamed:
+            _rename_stock(connection, renamed)
+
+    def ensure_loaded(self, connection: sqlalchemy.Connection) -> None:
+        """Loads the registry if it never was or is RELOAD_SECONDS old."""
+        if not self.loaded or time.monotonic() - self.loaded_at > RELOAD_SECONDS:
+            self.load(connection)
+
+
+def _rename_stock(connection: sqlalchemy.Connection, renamed: dict[str, str]) -> None:
+    """
+    Relabels potion_inventory rows and their ledger accounts from each old SKU
+    in renamed to its new one. Only rows this transaction actually changes
+    are moved, so workers loading at the same time do not both move them.
+    """
+    moved = connection.execute(
+        sqlalchemy.text(
+            """
+            UPDATE potion_inventory SET sku = renamed.new
+            FROM unnest(CAST(:old AS text[]), CAST(:new AS text[]))
+                AS renamed (old, new)
+            WHERE potion_inventory.sku = renamed.old
+            RETURNING renamed.old, renamed.new
+            """
+        ),
+        {"old": list(renamed), "new": list(renamed.values())},
+    ).all()
+    if not moved:
+        return
+    ledger.rename_potions(connection, dict(moved))
+    # Sales history was recorded under the old SKUs.
+    forecast.demand.invalidate()
+    logger.info("moved stock to renamed skus: %s", dict(moved))
+
+
+registry = RecipeRegistry()
@@ -0,0 +1,178 @@
+import atexit
+import logging
+import queue
+import threading
+from typing import NamedTuple, Sequence
+
+import sqlalchemy
+
+from src import game_clock
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class VisitRow(NamedTuple):
+    visit_id: int
+    customer_id: str
+    customer_name: str
+    character_class: str
+    level: int
+
+
+class VisitWriter:
+    """
+    Stores /carts/visits batches from a background thread so the endpoint
+    only pays for an enqueue. Whatever has queued up while a write runs is
+    written together in the next one: new customers with one multi-row
+    insert and visits with COPY into a temp table followed by an
+    INSERT ... ON CONFLICT DO NOTHING, so a retried visit is not counted
+    twice.
+
+    Customers already written by this process are remembered in a seen-set
+    and skipped. Batches are dropped with a warning if the queue is full or
+    the write fails; visits are analytics and must never hold up the game.
+    """
+
+    def __init__(
+        self,
+        engine: sqlalchemy.Engine,
+        max_pending: int = 1000,
+        max_batch_rows: int = 10000,
+        max_seen: int = 100_000,
+    ):
+        self.engine = engine
+        self.max_batch_rows = max_batch_rows
+        self.max_seen = max_seen
+        self._pending: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._seen: set[str] = set()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, rows: Sequence[VisitRow]) -> bool:
+        """Queues rows for writing. Returns False if they were dropped."""
+        if not rows:
+            return True
+        self._ensure_started()
+        try:
+            self._pending.put_nowait(rows)
+        except queue.Full:
+            logger.warning("visit queue full, dropped %d visits", len(rows))
+            return False
+        return True
+
+    def flush(self) -> None:
+        """Blocks until everything queued so far has been written."""
+        self._pending.join()
+
+    def stop(self) -> None:
+        """Writes what is queued and stops the writer thread."""
+        with self._start_lock:
+            if self._thread is None:
+                return
+            self._pending.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="visit-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._pending.get()
+            taken = 1
+            stopping = batch is _STOP
+            rows: list[VisitRow] = [] if stopping else list(batch)
+
+            while not stopping and len(rows) < self.max_batch_rows:
+                try:
+                    batch = self._pending.get_nowait()
+                except queue.Empty:
+                    break
+                taken += 1
+                if batch is _STOP:
+                    stopping = True
+                else:
+                    rows.extend(batch)
+
+            try:
+                if rows:
+                    self.write(rows)
+            except Exception:
+                logger.exception("failed to write %d visits", len(rows))
+            finally:
+                for _ in range(taken):
+                    self._pending.task_done()
+
+            if stopping:
+                return
+
+    def write(self, rows: Sequence[VisitRow]) -> None:
+        new_customers = {
+            row.customer_id: row for row in rows if row.customer_id not in self._seen
+        }
+
+        with self.engine.begin() as connection:
+            tick = game_clock.current(connection)
+
+            if new_customers:
+                connection.execute(
+                    sqlalchemy.text(
+                        """
+                        INSERT INTO customers (customer_id, customer_name, character_class)
+                        SELECT * FROM unnest(
+                            CAST(:ids AS text[]),
+                            CAST(:names AS text[]),
+                            CAST(:classes AS text[])
+                        )
+                        ON CONFLICT (customer_id) DO NOTHING
+                        """
+                    ),
+                    {
+                        "ids": list(new_customers),
+                        "names": [r.customer_name for r in new_customers.values()],
+                        "classes": [r.character_class for r in new_customers.values()],
+                    },
+                )
+
+            connection.execute(
+                sqlalchemy.text(
+                    """
+                    CREATE TEMP TABLE visits_staging (
+                        visit_id bigint, customer_id text, level int
+                    ) ON COMMIT DROP
+                    """
+                )
+            )
+            driver_connection = connection.connection.driver_connection
+            with driver_connection.cursor() as cursor:
+                with cursor.copy(
+                    "COPY visits_staging (visit_id, customer_id, level) FROM STDIN"
+                ) as copy:
+                    for row in rows:
+                        copy.write_row((row.visit_id, row.customer_id, row.level))
+
+            connection.execute(
+                sqlalchemy.text(
+                    """
+                    INSERT INTO visits (visit_id, customer_id, level, tick_id)
+                    SELECT visit_id, customer_id, level, CAST(:tick_id AS bigint)
+                    FROM visits_staging
+                    ON CONFLICT (visit_id, customer_id) DO NOTHING
+                    """
+                ),
+                {"tick_id": tick.id if tick is not None else None},
+            )
+
+        if len(self._seen) + len(new_customers) > self.max_seen:
+            self._seen.clear()
+        self._seen.update(new_customers)
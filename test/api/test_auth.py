@@ -0,0 +1,45 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from src.api.auth import KeyRing, RateLimiter
+
+
+def test_keyring_accepts_every_configured_key() -> None:
+    keyring = KeyRing(["old-key", "new-key", ""])
+
+    assert keyring.match("old-key") is not None
+    assert keyring.match("new-key") is not None
+    assert keyring.match("old-key") != keyring.match("new-key")
+    assert keyring.match("other") is None
+    assert keyring.match("") is None
+    assert keyring.match(None) is None
+
+
+def test_rate_limiter_allows_burst_then_refills() -> None:
+    limiter = RateLimiter(rate=2, burst=3)
+
+    assert [limiter.acquire(b"key", now=0.0) for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire(b"key", now=0.0) == 0.5
+    assert limiter.acquire(b"other", now=0.0) == 0
+
+    assert limiter.acquire(b"key", now=0.5) == 0
+    assert limiter.acquire(b"key", now=0.5) > 0
+
+
+def test_rate_limiter_disabled_at_zero_rate() -> None:
+    limiter = RateLimiter(rate=0, burst=0)
+
+    assert all(limiter.acquire(b"key", now=0.0) == 0 for _ in range(100))
+
+
+def test_missing_keys_file_does_not_break_import(tmp_path) -> None:
+    result = subprocess.run(
+        [sys.executable, "-c", "import src.api.auth"],
+        env={"API_KEY": "key", "API_KEYS_FILE": str(tmp_path / "missing")},
+        cwd=Path(__file__).resolve().parents[2],
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stderr
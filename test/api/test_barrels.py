@@ -5,6 +5,9 @@ from src.api.barrels import (
     BarrelOrder,
 )
 from typing import List
+import pytest
+import sqlalchemy
+from src import database as db
 
 
 def test_barrel_delivery() -> None:
@@ -195,6 +198,152 @@ def test_prefers_cheapest_available_barrel() -> None:
     assert barrel_orders[0].sku == "CHEAP_GREEN"
     assert barrel_orders[0].quantity == 1
 
+
+def test_beats_greedy_ml_per_gold() -> None:
+    wholesale_catalog = [
+        Barrel(
+            sku="MEDIUM_RED_BARREL",
+            ml_per_barrel=1000,
+            potion_type=[1.0, 0, 0, 0],
+            price=300,
+            quantity=1,
+        ),
+        Barrel(
+            sku="SMALL_GREEN_BARREL",
+            ml_per_barrel=600,
+            potion_type=[0, 1.0, 0, 0],
+            price=250,
+            quantity=2,
+        ),
+    ]
+
+    barrel_orders = create_barrel_plan(500, 10000, 0, 0, 0, 0, wholesale_catalog)
+
+    assert barrel_orders == [BarrelOrder(sku="SMALL_GREEN_BARREL", quantity=2)]
+
+
+def test_plan_respects_quantity_and_capacity() -> None:
+    wholesale_catalog = [
+        Barrel(
+            sku="SMALL_RED_BARREL",
+            ml_per_barrel=500,
+            potion_type=[1.0, 0, 0, 0],
+            price=60,
+            quantity=3,
+        ),
+        Barrel(
+            sku="SMALL_BLUE_BARREL",
+            ml_per_barrel=500,
+            potion_type=[0, 0, 1.0, 0],
+            price=120,
+            quantity=10,
+        ),
+    ]
+
+    barrel_orders = create_barrel_plan(10000, 3000, 500, 0, 0, 500, wholesale_catalog)
+    bought = {order.sku: order.quantity for order in barrel_orders}
+
+    assert bought == {"SMALL_RED_BARREL": 3, "SMALL_BLUE_BARREL": 1}
+    assert wholesale_catalog[0].quantity == 3
+
+
+def test_free_barrels_limited_by_stock_not_gold() -> None:
+    wholesale_catalog = [
+        Barrel(
+            sku="FREE_GREEN_BARREL",
+            ml_per_barrel=1000,
+            potion_type=[0, 1.0, 0, 0],
+            price=0,
+            quantity=2,
+        ),
+        Barrel(
+            sku="SMALL_GREEN_BARREL",
+            ml_per_barrel=1000,
+            potion_type=[0, 1.0, 0, 0],
+            price=50,
+            quantity=5,
+        ),
+    ]
+
+    barrel_orders = create_barrel_plan(100, 10000, 0, 0, 0, 0, wholesale_catalog)
+    bought = {order.sku: order.quantity for order in barrel_orders}
+
+    assert bought == {"FREE_GREEN_BARREL": 2, "SMALL_GREEN_BARREL": 2}
+
+
+
+def test_short_color_is_bought_before_cheaper_ml() -> None:
+    wholesale_catalog = [
+        Barrel(
+            sku="SMALL_RED_BARREL",
+            ml_per_barrel=500,
+            potion_type=[1.0, 0, 0, 0],
+            price=50,
+            quantity=10,
+        ),
+        Barrel(
+            sku="SMALL_BLUE_BARREL",
+            ml_per_barrel=500,
+            potion_type=[0, 0, 1.0, 0],
+            price=200,
+            quantity=10,
+        ),
+    ]
+
+    barrel_orders = create_barrel_plan(300, 10000, 2000, 0, 0, 0, wholesale_catalog)
+    bought = {order.sku: order.quantity for order in barrel_orders}
+
+    # Six red barrels would add the most ml, but there is no blue at all.
+    assert bought == {"SMALL_BLUE_BARREL": 1, "SMALL_RED_BARREL": 2}
+
+
+def test_color_round_stops_level_with_best_stocked_color() -> None:
+    wholesale_catalog = [
+        Barrel(
+            sku="SMALL_GREEN_BARREL",
+            ml_per_barrel=500,
+            potion_type=[0, 1.0, 0, 0],
+            price=100,
+            quantity=10,
+        ),
+        Barrel(
+            sku="SMALL_DARK_BARREL",
+            ml_per_barrel=500,
+            potion_type=[0, 0, 0, 1.0],
+            price=150,
+            quantity=10,
+        ),
+    ]
+
+    barrel_orders = create_barrel_plan(700, 10000, 0, 1000, 0, 0, wholesale_catalog)
+    bought = {order.sku: order.quantity for order in barrel_orders}
+
+    # Dark is bought up to green's 1000ml; past that the cheaper ml wins.
+    assert bought == {"SMALL_GREEN_BARREL": 4, "SMALL_DARK_BARREL": 2}
+
+
+def test_coprime_sizes_plan_in_coarser_steps() -> None:
+    # ml sizes with a gcd of 1 would need a table with one slot per ml.
+    wholesale_catalog = [
+        Barrel(
+            sku=f"ODD_BARREL_{i}",
+            ml_per_barrel=997 + 2 * i,
+            potion_type=[1.0, 0, 0, 0],
+            price=10 + i,
+            quantity=50,
+        )
+        for i in range(200)
+    ]
+    by_sku = {barrel.sku: barrel for barrel in wholesale_catalog}
+
+    barrel_orders = create_barrel_plan(500000, 1000000, 0, 0, 0, 0, wholesale_catalog)
+    ml = sum(by_sku[o.sku].ml_per_barrel * o.quantity for o in barrel_orders)
+    gold = sum(by_sku[o.sku].price * o.quantity for o in barrel_orders)
+
+    assert 0.99 * 1000000 <= ml <= 1000000
+    assert gold <= 500000
+    assert all(o.quantity <= 50 for o in barrel_orders)
+
 @pytest.fixture(scope="module")
 def setup_inventory():
     with db.engine.begin() as connection:
@@ -1,7 +1,15 @@
+import contextlib
+
+from src.api import bottler
 from src.api.bottler import PotionMixes, create_bottle_plan
+from src import capacity, plan_cache
+from src import database as db
 
 
+from datetime import datetime
 from typing import List
+import pytest
+import sqlalchemy
 
 
 def test_bottle_red_potions() -> None:
@@ -23,7 +31,7 @@ def test_bottle_red_potions() -> None:
 
     assert len(result) == 1
     assert result[0].potion_type == [100, 0, 0, 0]
-    assert result[0].quantity == 5
+    assert result[0].quantity == 1
 
 
 def test_bottle_green_potions() -> None:
@@ -38,7 +46,7 @@ def test_bottle_green_potions() -> None:
 
     assert len(result) == 1
     assert result[0].potion_type == [0, 100, 0, 0]
-    assert result[0].quantity == 5
+    assert result[0].quantity == 2
 
 
 def test_bottle_blue_and_green_combo() -> None:
@@ -87,6 +95,117 @@ def test_no_mix_when_capacity_reached() -> None:
     assert result == []
 
 
+def test_mix_leftovers_into_blended_potion() -> None:
+    result = create_bottle_plan(
+        red_ml=150,
+        green_ml=30,
+        blue_ml=20,
+        dark_ml=0,
+        maximum_potion_capacity=50,
+        current_potion_inventory=[],
+    )
+
+    assert [(mix.potion_type, mix.quantity) for mix in result] == [
+        ([100, 0, 0, 0], 1),
+        ([50, 30, 20, 0], 1),
+    ]
+
+
+def test_capacity_shared_between_colors() -> None:
+    result = create_bottle_plan(
+        red_ml=3000,
+        green_ml=1000,
+        blue_ml=0,
+        dark_ml=0,
+        maximum_potion_capacity=8,
+        current_potion_inventory=[],
+    )
+
+    quantities = {tuple(mix.potion_type): mix.quantity for mix in result}
+    assert quantities == {(100, 0, 0, 0): 6, (0, 100, 0, 0): 2}
+
+
+def test_plan_is_reproducible_from_seed() -> None:
+    def plan(seed: int) -> List[PotionMixes]:
+        return create_bottle_plan(
+            red_ml=250,
+            green_ml=250,
+            blue_ml=250,
+            dark_ml=250,
+            maximum_potion_capacity=6,
+            current_potion_inventory=[],
+            seed=seed,
+        )
+
+    assert plan(3) == plan(3)
+    assert sum(mix.quantity for mix in plan(3)) == 6
+
+
+def test_target_mix_is_bottled_first() -> None:
+    result = create_bottle_plan(
+        red_ml=500,
+        green_ml=500,
+        blue_ml=0,
+        dark_ml=0,
+        maximum_potion_capacity=6,
+        current_potion_inventory=[],
+        target_mix={(50, 50, 0, 0): 3.0, (0, 100, 0, 0): 1.0},
+    )
+
+    quantities = {tuple(mix.potion_type): mix.quantity for mix in result}
+    assert quantities[(50, 50, 0, 0)] == 3
+    assert quantities[(0, 100, 0, 0)] >= 1
+    assert sum(quantities.values()) == 6
+
+
+def test_target_mix_limited_by_ml() -> None:
+    result = create_bottle_plan(
+        red_ml=0,
+        green_ml=0,
+        blue_ml=120,
+        dark_ml=0,
+        maximum_potion_capacity=10,
+        current_potion_inventory=[],
+        target_mix={(0, 0, 0, 100): 5.0, (0, 0, 100, 0): 4.0},
+    )
+
+    assert [(mix.potion_type, mix.quantity) for mix in result] == [([0, 0, 100, 0], 1)]
+
+
+def test_potions_without_a_recipe_count_toward_capacity(monkeypatch) -> None:
+    class FakeEngine:
+        @contextlib.contextmanager
+        def begin(self):
+            yield None
+
+    monkeypatch.setattr(bottler.db, "engine", FakeEngine())
+    monkeypatch.setattr(
+        bottler.ledger,
+        "balances",
+        lambda c, accounts: {"red_ml": 2000, "green_ml": 0, "blue_ml": 0, "dark_ml": 0},
+    )
+    monkeypatch.setattr(bottler, "_forecast_shortfall", lambda c: {})
+    monkeypatch.setattr(
+        bottler.capacity,
+        "current_limits",
+        lambda c: capacity.Limits(potions=50, ml=10000),
+    )
+    monkeypatch.setattr(
+        bottler.ledger,
+        "potion_balances",
+        lambda c: {"RED_POTION_0": 10, "RETIRED_POTION": 35},
+    )
+    monkeypatch.setattr(bottler.recipes.registry, "ensure_loaded", lambda c: None)
+    plan_cache.invalidate()
+
+    result = bottler.get_bottle_plan()
+    plan_cache.invalidate()
+
+    # 45 potions are on the shelves, 35 of them under a retired SKU.
+    assert [(mix.potion_type, mix.quantity) for mix in result] == [([100, 0, 0, 0], 5)]
+
+
+@pytest.fixture(scope="module")
 def setup_inventory():
     with db.engine.begin() as connection:
         connection.execute(
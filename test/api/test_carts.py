@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from src.api.carts import (
+    SearchSortOptions,
+    SearchSortOrder,
+    _decode_cursor,
+    _encode_cursor,
+)
+
+TIMESTAMP = SearchSortOptions.timestamp
+CUSTOMER = SearchSortOptions.customer_name
+DESC = SearchSortOrder.desc
+ASC = SearchSortOrder.asc
+
+
+def test_timestamp_cursor_round_trip() -> None:
+    timestamp = datetime(2025, 5, 1, 12, 30)
+    cursor = _encode_cursor("next", TIMESTAMP, DESC, timestamp, 42)
+
+    assert _decode_cursor(cursor, TIMESTAMP, DESC) == ("next", timestamp, 42)
+
+
+def test_customer_cursor_round_trip() -> None:
+    cursor = _encode_cursor("prev", CUSTOMER, ASC, "Sir Alembic", 7)
+
+    assert _decode_cursor(cursor, CUSTOMER, ASC) == ("prev", "Sir Alembic", 7)
+
+
+def test_unreadable_cursor_starts_from_first_page() -> None:
+    assert _decode_cursor("", TIMESTAMP, DESC) is None
+    assert _decode_cursor("10", TIMESTAMP, DESC) is None
+    assert _decode_cursor("not a cursor!", SearchSortOptions.item_sku, DESC) is None
+
+
+def test_tampered_line_item_id_starts_from_first_page() -> None:
+    cursor = _encode_cursor("next", CUSTOMER, DESC, "x", "abc")
+
+    assert _decode_cursor(cursor, CUSTOMER, DESC) is None
+
+
+@pytest.mark.parametrize(
+    "sort_col, sort_order",
+    [(TIMESTAMP, DESC), (SearchSortOptions.line_item_total, ASC)],
+)
+def test_cursor_from_another_sort_is_rejected(sort_col, sort_order) -> None:
+    cursor = _encode_cursor("next", CUSTOMER, ASC, "Sir Alembic", 7)
+
+    with pytest.raises(HTTPException) as raised:
+        _decode_cursor(cursor, sort_col, sort_order)
+
+    assert raised.value.status_code == 400
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from src import game_clock
+from src.api import catalog
+
+
+class Unreachable(Exception):
+    pass
+
+
+class UnreachableEngine:
+    def begin(self):
+        raise Unreachable
+
+
+def test_catalog_is_cached_per_tick(monkeypatch) -> None:
+    catalog.invalidate_catalog()
+    game_clock.advance(game_clock.Tick(id=7, day="Hearthday", hour=18))
+    catalog._catalog_cache.set(7, ["tick 7 catalog"])
+
+    assert asyncio.run(catalog.create_catalog()) == ["tick 7 catalog"]
+
+    # Once this worker sees the next tick, last tick's catalog is not served
+    # even though it has not expired or been invalidated.
+    game_clock.advance(game_clock.Tick(id=8, day="Hearthday", hour=20))
+    monkeypatch.setattr(catalog.db, "async_engine", UnreachableEngine())
+    with pytest.raises(Unreachable):
+        asyncio.run(catalog.create_catalog())
@@ -0,0 +1,51 @@
+from src.cache import LRUCache, TTLCache, invalidate_all
+
+
+def test_entries_expire_after_ttl() -> None:
+    cache = TTLCache(ttl_seconds=-1)
+    cache.set("catalog", [1, 2, 3])
+
+    assert cache.get("catalog") is None
+
+
+def test_invalidate_clears_entries() -> None:
+    cache = TTLCache(ttl_seconds=60)
+    cache.set("catalog", [1, 2, 3])
+
+    assert cache.get("catalog") == [1, 2, 3]
+
+    cache.invalidate()
+
+    assert cache.get("catalog") is None
+
+
+def test_stale_generation_is_not_cached() -> None:
+    cache = TTLCache(ttl_seconds=60)
+    generation = cache.generation
+
+    invalidate_all()
+    cache.set("catalog", [1, 2, 3], generation=generation)
+
+    assert cache.get("catalog") is None
+
+
+def test_oldest_entry_evicted_at_maxsize() -> None:
+    cache = TTLCache(ttl_seconds=60, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+
+    assert cache.get("a") is None
+    assert cache.get("c") == 3
+
+
+def test_lru_keeps_recently_used_entries() -> None:
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
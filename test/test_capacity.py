@@ -0,0 +1,50 @@
+from src import capacity
+
+
+def test_limits_grow_by_one_starting_unit_per_unit_bought() -> None:
+    assert capacity.limits_for(0, 0) == capacity.Limits(potions=50, ml=10000)
+    assert capacity.limits_for(2, 1) == capacity.Limits(potions=150, ml=20000)
+
+
+def test_demand_horizon_starts_at_current_hour_and_wraps() -> None:
+    by_hour = {0: 1.0, 8: 2.0, 16: 4.0}
+    horizon = capacity.demand_horizon(by_hour, hour=10, ticks=4)
+    factor = capacity.UNMET_DEMAND_FACTOR
+    assert horizon == [4.0 * factor, 1.0 * factor, 2.0 * factor, 4.0 * factor]
+    assert capacity.demand_horizon({}, hour=10) == []
+
+
+def test_simulation_sells_demand_within_limits() -> None:
+    sold = capacity.simulate_sales([10.0] * 8, capacity.limits_for(0, 0))
+    assert sold == 80.0
+
+
+def test_simulation_is_capped_by_ml_throughput() -> None:
+    # 10000 ml every 4 ticks bottles 100 potions, 25 a tick on average.
+    demand = [40.0] * 8
+    assert capacity.simulate_sales(demand, capacity.limits_for(0, 0)) == 200.0
+    assert capacity.simulate_sales(demand, capacity.limits_for(0, 1)) == 320.0
+
+
+def test_no_purchase_without_demand() -> None:
+    assert capacity.plan_purchase([], units=(0, 0), gold=100000) == (0, 0)
+    assert capacity.plan_purchase([1.0] * 36, units=(0, 0), gold=100000) == (0, 0)
+
+
+def test_buys_the_binding_limit_when_it_pays_back() -> None:
+    potion_units, ml_units = capacity.plan_purchase(
+        [40.0] * capacity.PAYBACK_TICKS, units=(0, 0), gold=100000
+    )
+    assert ml_units >= 1
+    assert (potion_units, ml_units) != (0, 0)
+
+
+def test_purchase_keeps_gold_reserve_and_plan_bounds() -> None:
+    demand = [500.0] * capacity.PAYBACK_TICKS
+    assert capacity.plan_purchase(demand, units=(0, 0), gold=1400) == (0, 0)
+    potion_units, ml_units = capacity.plan_purchase(demand, units=(0, 0), gold=10**7)
+    assert potion_units <= capacity.MAX_UNITS_PER_PLAN
+    assert ml_units <= capacity.MAX_UNITS_PER_PLAN
+    assert (
+        potion_units + ml_units
+    ) * capacity.UNIT_PRICE <= 10**7 - capacity.GOLD_RESERVE
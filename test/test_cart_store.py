@@ -0,0 +1,45 @@
+from src.cart_store import InMemoryCartStore
+
+
+def test_cart_items_round_trip() -> None:
+    store = InMemoryCartStore()
+    cart_id = store.create("Sir Alembic")
+
+    assert store.set_item_quantity(cart_id, "RED_POTION_0", 2)
+    assert store.set_item_quantity(cart_id, "RED_POTION_0", 3)
+    assert store.set_item_quantity(cart_id, "GREEN_POTION_0", 1)
+    assert store.get_items(cart_id) == {"RED_POTION_0": 3, "GREEN_POTION_0": 1}
+
+
+def test_unknown_cart_is_not_open() -> None:
+    store = InMemoryCartStore()
+
+    assert store.get_items(99) is None
+    assert not store.set_item_quantity(99, "RED_POTION_0", 1)
+
+
+def test_closed_cart_is_evicted() -> None:
+    store = InMemoryCartStore()
+    cart_id = store.create("Sir Alembic")
+    store.close(cart_id)
+
+    assert store.get_items(cart_id) is None
+    assert not store.set_item_quantity(cart_id, "RED_POTION_0", 1)
+
+
+def test_idle_cart_expires() -> None:
+    store = InMemoryCartStore(ttl_seconds=-1)
+    cart_id = store.create("Sir Alembic")
+
+    assert store.get_items(cart_id) is None
+    assert store.create("Lady Retort") != cart_id
+
+
+def test_reset_forgets_carts_but_not_their_ids() -> None:
+    store = InMemoryCartStore()
+    cart_id = store.create("Sir Alembic")
+    other_id = store.create("Lady Retort")
+    store.reset()
+
+    assert store.get_items(cart_id) is None
+    assert store.create("Sir Alembic") not in (cart_id, other_id)
@@ -0,0 +1,48 @@
+import pytest
+
+from src.forecast import DemandForecaster
+from src.game_clock import Tick
+
+
+def test_first_tick_sets_the_level_then_smooths() -> None:
+    demand = DemandForecaster(alpha=0.5)
+    demand.record_sales(Tick(1, "Edgeday", 8), {"RED_POTION_0": 4})
+    demand.advance(Tick(2, "Edgeday", 10))
+
+    assert demand.forecast("RED_POTION_0", 8) == 4
+
+    demand.record_sales(Tick(13, "Bloomday", 8), {"RED_POTION_0": 2})
+    demand.advance(Tick(14, "Bloomday", 10))
+
+    assert demand.forecast("RED_POTION_0", 8) == pytest.approx(3)
+    assert demand.forecast("RED_POTION_0", 10) == 0
+
+
+def test_quiet_tick_counts_as_zero_demand() -> None:
+    demand = DemandForecaster(alpha=0.5)
+    demand.record_sales(Tick(1, "Edgeday", 8), {"RED_POTION_0": 4})
+    demand.advance(Tick(13, "Bloomday", 8))
+    demand.advance(Tick(25, "Arcanaday", 8))
+
+    assert demand.forecast_mix(8) == {"RED_POTION_0": pytest.approx(2)}
+
+
+def test_sales_for_an_old_tick_are_ignored() -> None:
+    demand = DemandForecaster(alpha=0.5)
+    demand.advance(Tick(5, "Edgeday", 8))
+    demand.record_sales(Tick(4, "Edgeday", 6), {"RED_POTION_0": 4})
+    demand.advance(Tick(6, "Edgeday", 10))
+
+    assert demand.forecast_mix(6) == {}
+    assert demand.forecast_mix(8) == {}
+
+
+def test_invalidate_forgets_history_until_reloaded() -> None:
+    demand = DemandForecaster(alpha=0.5)
+    demand.record_sales(Tick(1, "Edgeday", 8), {"RED_POTION_0": 4})
+    demand.advance(Tick(2, "Edgeday", 10))
+    demand.loaded = True
+    demand.invalidate()
+
+    assert demand.forecast_mix(8) == {}
+    assert not demand.loaded
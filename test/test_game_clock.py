@@ -0,0 +1,79 @@
+from collections import namedtuple
+
+from src import cache, game_clock, log
+
+TickRow = namedtuple("TickRow", "id day hour")
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def scalar_one(self):
+        (row,) = self.rows
+        return row[0]
+
+
+class FakeGameTime:
+    """game_time as a list of (id, day, hour) rows."""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        if sql.startswith("SELECT"):
+            latest = self.rows[-1:]
+            return FakeResult([TickRow(*row) for row in latest])
+        if sql.startswith("INSERT"):
+            self.rows.append((len(self.rows) + 1, params["day"], params["hour"]))
+            return FakeResult([(len(self.rows),)])
+        return FakeResult([])
+
+
+def test_advance_serves_current_tick_from_cache() -> None:
+    tick = game_clock.Tick(id=7, day="Hearthday", hour=18)
+    game_clock.advance(tick)
+
+    # No connection or database is needed while the cached tick is fresh.
+    assert game_clock.current() == tick
+    assert log._game_tick == "Hearthday:18"
+
+
+def test_invalidate_all_drops_cached_tick() -> None:
+    game_clock.advance(game_clock.Tick(id=8, day="Hearthday", hour=20))
+    cache.invalidate_all()
+
+    assert game_clock._cache.get("current") is None
+
+
+def test_record_appends_a_new_time() -> None:
+    game_time = FakeGameTime([(1, "Hearthday", 18)])
+
+    tick, created = game_clock.record(game_time, "Hearthday", 20)
+
+    assert created
+    assert tick == game_clock.Tick(id=2, day="Hearthday", hour=20)
+    assert len(game_time.rows) == 2
+
+
+def test_record_keeps_the_tick_of_a_retried_time() -> None:
+    game_time = FakeGameTime([(1, "Hearthday", 18), (2, "Hearthday", 20)])
+
+    tick, created = game_clock.record(game_time, "Hearthday", 20)
+
+    assert not created
+    assert tick == game_clock.Tick(id=2, day="Hearthday", hour=20)
+    assert len(game_time.rows) == 2
+
+
+def test_record_starts_a_new_week_at_a_repeated_time() -> None:
+    game_time = FakeGameTime([(1, "Hearthday", 18), (2, "Hearthday", 20)])
+
+    tick, created = game_clock.record(game_time, "Hearthday", 18)
+
+    assert created
+    assert tick.id == 3
@@ -0,0 +1,13 @@
+from src import game_state
+
+
+def test_truncate_statement_clears_every_table_at_once() -> None:
+    statement = game_state.truncate_statement(
+        ["gold_ledger", "orders", "carts"], lambda name: f'"{name}"'
+    )
+    assert statement == 'TRUNCATE "gold_ledger", "orders", "carts" CONTINUE IDENTITY'
+
+
+def test_state_tables_cover_orders_carts_and_inventory() -> None:
+    for table in ("orders", "order_items", "carts", "potion_inventory"):
+        assert table in game_state.STATE_TABLES
@@ -0,0 +1,161 @@
+import asyncio
+import contextlib
+import copy
+import json
+from collections import namedtuple
+
+import pytest
+
+from src import cache, idempotency
+
+ClaimRow = namedtuple("ClaimRow", "id")
+ResponseRow = namedtuple("ResponseRow", "response")
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def scalar_one(self):
+        (row,) = self.rows
+        return row[0]
+
+
+class FakeProcessedRequests:
+    """
+    processed_requests as {(endpoint, request_key): [id, response]}, with
+    begin() rolling the table back when the block raises. before_claim runs
+    just ahead of the claiming INSERT, to stand in for a concurrent request.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.statements = []
+        self.before_claim = None
+        self.info = {}
+
+    @contextlib.contextmanager
+    def begin(self):
+        saved = copy.deepcopy(self.rows)
+        try:
+            yield self
+        except BaseException:
+            self.rows = saved
+            raise
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append(sql)
+        if sql.startswith("SELECT response"):
+            row = self.rows.get((params["endpoint"], params["request_key"]))
+            return FakeResult([] if row is None else [ResponseRow(row[1])])
+        if sql.startswith("INSERT INTO processed_requests"):
+            if self.before_claim is not None:
+                self.before_claim()
+            request = (params["endpoint"], params["request_key"])
+            if request in self.rows:
+                return FakeResult([])
+            self.rows[request] = [len(self.rows) + 1, None]
+            return FakeResult([ClaimRow(self.rows[request][0])])
+        if sql.startswith("UPDATE processed_requests"):
+            for row in self.rows.values():
+                if row[0] == params["id"]:
+                    row[1] = json.loads(params["response"])
+            return FakeResult([])
+        raise AssertionError(f"unexpected query: {sql}")
+
+
+class FakeAsyncEngine:
+    def __init__(self, table: FakeProcessedRequests):
+        self.table = table
+
+    @contextlib.asynccontextmanager
+    async def begin(self):
+        with self.table.begin():
+            yield self
+
+    async def run_sync(self, fn, *args):
+        return fn(self.table, *args)
+
+
+@pytest.fixture
+def table(monkeypatch) -> FakeProcessedRequests:
+    table = FakeProcessedRequests()
+    monkeypatch.setattr(idempotency.db, "engine", table)
+    monkeypatch.setattr(idempotency.db, "async_engine", FakeAsyncEngine(table))
+    monkeypatch.setattr(idempotency, "_recent", cache.LRUCache(maxsize=1024))
+    return table
+
+
+def counting_write(response):
+    calls = []
+
+    def write(connection):
+        calls.append(connection)
+        return response
+
+    return write, calls
+
+
+def test_replay_returns_the_stored_response(table) -> None:
+    write, calls = counting_write({"delivered": 3})
+
+    assert idempotency.run_once("barrels.deliver", 7, write) == {"delivered": 3}
+    # Forget the in-process copy so the replay has to read processed_requests.
+    idempotency._recent.invalidate()
+    assert idempotency.run_once("barrels.deliver", 7, write) == {"delivered": 3}
+
+    assert len(calls) == 1
+
+
+def test_async_replay_returns_the_stored_response(table) -> None:
+    write, calls = counting_write({"total_gold_paid": 50})
+
+    first = asyncio.run(idempotency.run_once_async("carts.checkout", 1, write))
+    idempotency._recent.invalidate()
+    second = asyncio.run(idempotency.run_once_async("carts.checkout", 1, write))
+
+    assert first == second == {"total_gold_paid": 50}
+    assert len(calls) == 1
+
+
+def test_concurrent_claim_returns_the_winners_response(table) -> None:
+    def winner_commits():
+        table.rows[("carts.checkout", "1")] = [99, {"total_gold_paid": 50}]
+
+    table.before_claim = winner_commits
+    write, calls = counting_write({"total_gold_paid": 0})
+
+    response = asyncio.run(idempotency.run_once_async("carts.checkout", 1, write))
+
+    assert response == {"total_gold_paid": 50}
+    assert calls == []
+
+
+def test_failed_write_leaves_no_claim(table) -> None:
+    def failing_write(connection):
+        raise RuntimeError("stock ran out")
+
+    with pytest.raises(RuntimeError):
+        idempotency.run_once("bottler.deliver", 3, failing_write)
+
+    assert table.rows == {}
+    write, calls = counting_write({"bottled": 5})
+    assert idempotency.run_once("bottler.deliver", 3, write) == {"bottled": 5}
+    assert len(calls) == 1
+
+
+def test_evicted_requests_are_answered_from_the_database(table, monkeypatch) -> None:
+    monkeypatch.setattr(idempotency, "_recent", cache.LRUCache(maxsize=1))
+    write, calls = counting_write({"ok": True})
+    idempotency.run_once("barrels.deliver", 1, write)
+    idempotency.run_once("barrels.deliver", 2, write)
+    table.statements.clear()
+
+    assert idempotency.run_once("barrels.deliver", 1, write) == {"ok": True}
+
+    assert len(calls) == 2
+    assert [sql.split()[0] for sql in table.statements] == ["SELECT"]
@@ -0,0 +1,188 @@
+from collections import namedtuple
+
+import pytest
+import sqlalchemy
+
+from src import ledger
+from src.inventory_snapshot import (
+    InventorySnapshot,
+    ReadPoint,
+    _apply_on_begin,
+    _apply_on_checkin,
+    _drop_on_failed_commit,
+    _drop_on_rollback,
+    _set_aside_on_commit,
+)
+
+BalancesRow = namedtuple("BalancesRow", "read_at balances")
+
+
+class FakeResult:
+    def __init__(self, row):
+        self.row = row
+
+    def one(self):
+        return self.row
+
+
+class FakeConnection:
+    """Answers ledger.balances_read_at() as of the Postgres snapshot read_at."""
+
+    def __init__(self, balances: dict[str, int], read_at: str = "100:100:"):
+        self.balances = balances
+        self.read_at = read_at
+        self.info: dict = {}
+
+    def execute(self, statement, params=None):
+        return FakeResult(BalancesRow(self.read_at, self.balances))
+
+
+def balances(**overrides: int) -> dict[str, int]:
+    return {account: overrides.get(account, 0) for account in ledger.SUMMARY_ACCOUNTS}
+
+
+def test_committed_deltas_bump_the_version() -> None:
+    snapshot = InventorySnapshot(engine=None, reconcile_seconds=0)
+    loaded = snapshot.load(FakeConnection(balances(gold=100)))
+
+    snapshot.apply({"gold": -60, "red_ml": 500, "potion:RED_POTION_0": 3})
+
+    current = snapshot.current()
+    assert current.version == loaded.version + 1
+    assert current.balances == balances(gold=40, red_ml=500)
+
+
+def test_deltas_before_the_first_load_are_ignored() -> None:
+    snapshot = InventorySnapshot(engine=None, reconcile_seconds=0)
+    snapshot.apply({"gold": 10})
+
+    assert snapshot.current() is None
+
+
+def test_reconcile_repairs_drift() -> None:
+    snapshot = InventorySnapshot(engine=None, reconcile_seconds=0)
+    snapshot.load(FakeConnection(balances(gold=100)))
+
+    drift = snapshot.reconcile(FakeConnection(balances(gold=250, potions=4)))
+
+    assert drift == {"gold": (100, 250), "potions": (0, 4)}
+    assert snapshot.current().balances == balances(gold=250, potions=4)
+    assert snapshot.repairs == 1
+    assert snapshot.reconcile(FakeConnection(balances(gold=250, potions=4))) == {}
+
+
+def test_reconcile_yields_to_writes_applied_while_reading() -> None:
+    snapshot = InventorySnapshot(engine=None, reconcile_seconds=0)
+    snapshot.load(FakeConnection(balances(gold=100)))
+
+    class ApplyingConnection(FakeConnection):
+        def execute(self, statement, params=None):
+            snapshot.apply({"gold": 5})
+            return super().execute(statement, params)
+
+    assert snapshot.reconcile(ApplyingConnection(balances(gold=300))) == {}
+    assert snapshot.current().balances["gold"] == 105
+
+
+def test_only_committed_transactions_reach_the_snapshot() -> None:
+    connection = FakeConnection({})
+    connection.info["ledger_deltas"] = {"gold": 7}
+    _drop_on_rollback(connection)
+    connection.info["ledger_deltas"] = {"gold": 3}
+    _set_aside_on_commit(connection)
+    connection.info["ledger_deltas"] = {"gold": 2}
+    _set_aside_on_commit(connection)
+
+    assert connection.info == {
+        "committed_ledger_deltas": [(None, {"gold": 3}), (None, {"gold": 2})]
+    }
+
+
+def test_checkin_applies_set_aside_deltas(monkeypatch) -> None:
+    snapshot = InventorySnapshot(engine=None, reconcile_seconds=0)
+    snapshot.load(FakeConnection(balances(gold=100)))
+    monkeypatch.setattr("src.inventory_snapshot.snapshot", snapshot)
+
+    class Record:
+        info = {"committed_ledger_deltas": [(None, {"gold": 5})]}
+
+    _apply_on_checkin(None, Record)
+    _apply_on_checkin(None, Record)
+
+    assert snapshot.current().balances["gold"] == 105
+
+
+def test_failed_commit_never_reaches_the_snapshot(monkeypatch) -> None:
+    snapshot = InventorySnapshot(engine=None, reconcile_seconds=0)
+    snapshot.load(FakeConnection(balances(gold=100)))
+    monkeypatch.setattr("src.inventory_snapshot.snapshot", snapshot)
+
+    engine = sqlalchemy.create_engine("sqlite://")
+    for name, listener in (
+        ("commit", _set_aside_on_commit),
+        ("rollback", _drop_on_rollback),
+        ("handle_error", _drop_on_failed_commit),
+        ("begin", _apply_on_begin),
+        ("checkin", _apply_on_checkin),
+    ):
+        sqlalchemy.event.listen(engine, name, listener)
+
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA foreign_keys = ON")
+        connection.exec_driver_sql("CREATE TABLE parent (id INTEGER PRIMARY KEY)")
+        connection.exec_driver_sql(
+            "CREATE TABLE child (parent_id INTEGER REFERENCES parent (id)"
+            " DEFERRABLE INITIALLY DEFERRED)"
+        )
+        connection.commit()
+
+        # The foreign key is only checked by COMMIT, after the commit event.
+        connection.exec_driver_sql("INSERT INTO child VALUES (1)")
+        connection.info["ledger_deltas"] = {"gold": 5}
+        with pytest.raises(sqlalchemy.exc.IntegrityError):
+            connection.commit()
+        connection.rollback()
+
+        # A later successful commit on the same connection is applied by the
+        # next transaction's begin.
+        connection.exec_driver_sql("INSERT INTO parent VALUES (1)")
+        connection.info["ledger_deltas"] = {"gold": 7}
+        connection.commit()
+        connection.exec_driver_sql("SELECT 1")
+        assert snapshot.current().balances["gold"] == 107
+
+    assert snapshot.current().balances["gold"] == 107
+
+
+def test_read_point_includes_committed_transactions() -> None:
+    read_at = ReadPoint.parse("10:15:12,14")
+
+    assert read_at.includes(9)
+    assert read_at.includes(13)
+    assert not read_at.includes(12)
+    assert not read_at.includes(15)
+
+
+def test_reconcile_between_commit_and_checkin_applies_once(monkeypatch) -> None:
+    snapshot = InventorySnapshot(engine=None, reconcile_seconds=0)
+    snapshot.load(FakeConnection(balances(gold=100), read_at="20:20:"))
+    monkeypatch.setattr("src.inventory_snapshot.snapshot", snapshot)
+
+    class Record:
+        info: dict = {}
+
+    # Transaction 21 commits; its deltas wait for the connection's checkin.
+    Record.info.update(ledger_deltas={"gold": 5}, ledger_xid=21)
+    _set_aside_on_commit(Record)
+    # Transaction 23 is still committing when the reconciler reads.
+    writer = FakeConnection({})
+    writer.info.update(ledger_deltas={"gold": 7}, ledger_xid=23)
+    _set_aside_on_commit(writer)
+
+    drift = snapshot.reconcile(FakeConnection(balances(gold=105), read_at="22:24:23"))
+    assert drift == {"gold": (100, 105)}
+
+    _apply_on_checkin(None, Record)
+    _apply_on_begin(writer)
+
+    assert snapshot.current().balances["gold"] == 112
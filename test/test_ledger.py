@@ -0,0 +1,196 @@
+import contextlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from src import ledger
+from src.api import admin
+
+BalanceRow = namedtuple("BalanceRow", "account balance")
+PotionSumRow = namedtuple("PotionSumRow", "sku quantity")
+CheckpointRow = namedtuple(
+    "CheckpointRow",
+    "balances gold_ledger_id ml_ledger_id potion_ledger_id capacity_ledger_id",
+)
+
+START = datetime(2025, 5, 1, 12, 0)
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def all(self):
+        return self.rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def one(self):
+        (row,) = self.rows
+        return row
+
+    def scalar_one(self):
+        return self.one()[0]
+
+
+class FakeLedger:
+    """
+    Answers the ledger's read queries from in-memory tables. Entries are
+    (id, created_at, values); checkpoints are (created_at, CheckpointRow).
+    """
+
+    def __init__(self, balances=None):
+        self.balances = dict(balances or {})
+        self.gold = []
+        self.ml = []
+        self.potions = []
+        self.capacity = []
+        self.checkpoints = []
+        self.info = {}
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        params = params or {}
+        if "FROM ledger_checkpoints" in sql:
+            taken = [row for at, row in sorted(self.checkpoints) if at <= params["at"]]
+            return FakeResult(taken[-1:])
+        if "FROM ledger_balances" in sql:
+            return FakeResult([BalanceRow(*item) for item in self.balances.items()])
+        if "FROM gold_ledger" in sql:
+            entries = self._since(self.gold, params["gold_after"], params)
+            return FakeResult([(sum(entries),)])
+        if "FROM ml_ledger" in sql:
+            entries = self._since(self.ml, params["ml_after"], params)
+            return FakeResult([tuple(map(sum, zip((0, 0, 0, 0), *entries)))])
+        if "FROM potion_ledger" in sql:
+            sums: dict[str, int] = {}
+            for sku, quantity in self._since(
+                self.potions, params["potion_after"], params
+            ):
+                sums[sku] = sums.get(sku, 0) + quantity
+            return FakeResult([PotionSumRow(*item) for item in sums.items()])
+        if "FROM capacity_ledger" in sql:
+            entries = self._since(self.capacity, params["capacity_after"], params)
+            return FakeResult([tuple(map(sum, zip((0, 0), *entries)))])
+        raise AssertionError(f"unexpected query: {sql}")
+
+    @staticmethod
+    def _since(entries, after, params):
+        until = params.get("until")
+        return [
+            values
+            for id, created_at, values in entries
+            if id > after and (until is None or created_at <= until)
+        ]
+
+
+class FakeEngine:
+    def __init__(self, connection):
+        self.connection = connection
+
+    @contextlib.contextmanager
+    def begin(self):
+        yield self.connection
+
+
+def consistent_ledger() -> FakeLedger:
+    fake = FakeLedger(
+        {
+            "gold": 70,
+            "red_ml": 500,
+            "potions": 3,
+            "potion:RED_POTION_0": 3,
+            "potion_capacity": 50,
+        }
+    )
+    fake.gold = [(1, START, 100), (2, START, -30)]
+    fake.ml = [(1, START, (500, 0, 0, 0))]
+    fake.potions = [(1, START, ("RED_POTION_0", 5)), (2, START, ("RED_POTION_0", -2))]
+    fake.capacity = [(1, START, (50, 0))]
+    return fake
+
+
+def test_consistent_ledger_has_no_mismatches() -> None:
+    assert ledger.check_consistency(consistent_ledger()) == {}
+
+
+def test_check_consistency_reports_drift() -> None:
+    fake = consistent_ledger()
+    fake.balances["gold"] = 100
+    fake.balances["potion:GREEN_POTION_0"] = 1
+    fake.balances["potions"] = 4
+
+    assert ledger.check_consistency(fake) == {
+        "gold": (100, 70),
+        "potion:GREEN_POTION_0": (1, 0),
+        "potions": (4, 3),
+    }
+
+
+def test_balances_as_of_replays_entries_after_the_checkpoint() -> None:
+    fake = FakeLedger()
+    # Entries 1 and 2 are covered by the checkpoint, whose balances stand in
+    # for them; entry 4 comes after the time asked about.
+    fake.gold = [
+        (1, START, 999),
+        (2, START, 999),
+        (3, START + timedelta(hours=2), 25),
+        (4, START + timedelta(hours=6), 1000),
+    ]
+    fake.potions = [
+        (1, START, ("RED_POTION_0", 999)),
+        (2, START + timedelta(hours=2), ("RED_POTION_0", -1)),
+    ]
+    fake.checkpoints = [
+        (
+            START + timedelta(hours=1),
+            CheckpointRow(
+                {"gold": 150, "potion:RED_POTION_0": 4, "potions": 4}, 2, 0, 1, 0
+            ),
+        ),
+        # Taken after the time asked about, so it must not be used.
+        (
+            START + timedelta(hours=5),
+            CheckpointRow({"gold": 0}, 4, 0, 2, 0),
+        ),
+    ]
+
+    balances = ledger.balances_as_of(fake, START + timedelta(hours=3))
+
+    assert balances["gold"] == 175
+    assert balances["potion:RED_POTION_0"] == 3
+    assert balances["potions"] == 3
+    assert balances["red_ml"] == 0
+
+
+def test_balances_as_of_without_a_checkpoint_sums_every_entry() -> None:
+    fake = consistent_ledger()
+
+    balances = ledger.balances_as_of(fake, START)
+
+    assert {account: balances[account] for account in fake.balances} == fake.balances
+
+
+def test_consistency_endpoint_lists_mismatches(monkeypatch) -> None:
+    fake = consistent_ledger()
+    fake.balances["gold"] = 100
+    monkeypatch.setattr(admin.db, "engine", FakeEngine(fake))
+
+    report = admin.get_ledger_consistency()
+
+    assert not report.consistent
+    assert [mismatch.model_dump() for mismatch in report.mismatches] == [
+        {"account": "gold", "snapshot": 100, "ledger": 70}
+    ]
+
+
+def test_consistency_endpoint_on_a_consistent_ledger(monkeypatch) -> None:
+    monkeypatch.setattr(admin.db, "engine", FakeEngine(consistent_ledger()))
+
+    report = admin.get_ledger_consistency()
+
+    assert report.consistent
+    assert report.mismatches == []
@@ -0,0 +1,36 @@
+import io
+import json
+import logging
+
+from src import log
+
+
+def read_records(stream: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_records_carry_request_id_and_tick() -> None:
+    stream = io.StringIO()
+    log.configure(level="INFO", stream=stream)
+    log.set_game_tick("Edgeday", 14)
+    token = log.request_id.set("abc123")
+    try:
+        logging.getLogger("src.test").info("sold %d potions", 3, extra={"sku": "RED"})
+    finally:
+        log.request_id.reset(token)
+    log.shutdown()
+
+    [record] = read_records(stream)
+    assert record["message"] == "sold 3 potions"
+    assert record["request_id"] == "abc123"
+    assert record["tick"] == "Edgeday:14"
+    assert record["sku"] == "RED"
+
+
+def test_records_below_level_are_dropped() -> None:
+    stream = io.StringIO()
+    log.configure(level="INFO", stream=stream)
+    logging.getLogger("src.test").debug("hidden %s", "payload")
+    log.shutdown()
+
+    assert read_records(stream) == []
@@ -0,0 +1,53 @@
+import pytest
+import sqlalchemy
+
+from src import metrics
+
+
+def make_engine(name: str) -> sqlalchemy.Engine:
+    engine = sqlalchemy.create_engine(
+        "sqlite://",
+        poolclass=metrics.TimedQueuePool,
+        pool_logging_name=name,
+    )
+    metrics.instrument(engine, name)
+    return engine
+
+
+def test_pool_and_statement_metrics() -> None:
+    metrics.reset()
+    engine = make_engine("test_pool")
+
+    with engine.connect() as connection:
+        assert metrics.snapshot()["pools"]["test_pool"]["checked_out"] == 1
+        connection.execute(sqlalchemy.text("SELECT   1"))
+        connection.execute(sqlalchemy.text("SELECT 1"))
+
+    snapshot = metrics.snapshot()
+    pool = snapshot["pools"]["test_pool"]
+    assert pool["checked_out"] == 0
+    assert pool["checkouts"] == 1
+    assert pool["checkout_wait"]["count"] == 1
+
+    by_statement = {s["statement"]: s for s in snapshot["statements"]}
+    assert by_statement["SELECT 1"]["count"] == 2
+
+
+def test_failed_statement_drops_its_start_time() -> None:
+    engine = make_engine("test_errors")
+
+    with engine.connect() as connection:
+        with pytest.raises(sqlalchemy.exc.OperationalError):
+            connection.execute(sqlalchemy.text("SELECT * FROM missing"))
+        assert connection.info["statement_started"] == []
+
+
+def test_statements_past_limit_share_overflow_key(monkeypatch) -> None:
+    metrics.reset()
+    monkeypatch.setattr(metrics, "MAX_TRACKED_STATEMENTS", 2)
+
+    for i in range(4):
+        metrics.record_statement(f"SELECT {i}", 1.0)
+
+    statements = {s["statement"]: s["count"] for s in metrics.snapshot()["statements"]}
+    assert statements == {"SELECT 0": 1, "SELECT 1": 1, metrics.OVERFLOW_STATEMENT: 2}
@@ -0,0 +1,141 @@
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+import sqlalchemy
+from alembic import command
+from alembic.config import Config
+
+from src import cart_store, config, forecast, ledger
+from src.api import bottler, carts, catalog
+from src.api.carts import SearchSortOptions, SearchSortOrder
+
+ALEMBIC_DIR = Path(__file__).resolve().parent.parent / "alembic"
+
+
+def _search(**filters) -> tuple[sqlalchemy.TextClause, dict]:
+    statement, params = carts.search_statement(
+        filters.get("customer_name", ""),
+        filters.get("potion_sku", ""),
+        SearchSortOptions.timestamp,
+        SearchSortOrder.desc,
+    )
+    params.update(recipe_skus=["RED_POTION_0"], recipe_prices=[50], default_price=50)
+    return statement, params
+
+
+MIX = {"red": 50, "green": 0, "blue": 50, "dark": 0}
+
+# The statements the endpoints run on their hot paths, with sample
+# parameters and the table each must not read with a sequential scan once
+# an index is available.
+ENDPOINT_QUERIES = {
+    "checkout stock decrement": (
+        "potion_inventory",
+        carts.STOCK_DECREMENT,
+        {"reds": [50], "greens": [0], "blues": [50], "darks": [0], "quantities": [1]},
+    ),
+    "checkout stock lookup": ("potion_inventory", carts.MIX_STOCKED, MIX),
+    "catalog mixes in stock": (
+        "potion_inventory",
+        catalog.MIXES_IN_STOCK,
+        {"limit": catalog.MAX_CATALOG_SKUS},
+    ),
+    "bottling upsert": (
+        "potion_inventory",
+        bottler.STOCK_DELIVERY,
+        {
+            "skus": ["50_0_50_0"],
+            "reds": [50],
+            "greens": [0],
+            "blues": [50],
+            "darks": [0],
+            "quantities": [3],
+        },
+    ),
+    "open cart items": ("cart_items", cart_store.OPEN_CART_ITEMS, {"cart_id": 1}),
+    "search by customer": ("carts", *_search(customer_name="alembic")),
+    "search by potion": ("cart_items", *_search(potion_sku="red")),
+    "search newest first": ("carts", *_search()),
+    "forecast sales history": ("potion_ledger", forecast.SALES_HISTORY, {}),
+    "potion balances": (
+        "ledger_balances",
+        ledger.POTIONS_IN_STOCK,
+        {"prefix": ledger.POTION_ACCOUNT_PREFIX + "%"},
+    ),
+    "ledger entries since a checkpoint": (
+        "gold_ledger",
+        ledger.GOLD_SINCE,
+        {"gold_after": 0, "until": datetime.now(timezone.utc)},
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def migrated():
+    """
+    Runs every migration into a throwaway schema of the configured Postgres
+    and yields a connection whose search_path points at it.
+    """
+    engine = sqlalchemy.create_engine(config.get_settings().POSTGRES_URI)
+    try:
+        connection = engine.connect()
+    except sqlalchemy.exc.OperationalError as error:
+        pytest.skip(f"Postgres is not reachable: {error}")
+
+    schema = f"migration_test_{uuid.uuid4().hex[:8]}"
+    connection.execute(sqlalchemy.text(f"CREATE SCHEMA {schema}"))
+    connection.execute(sqlalchemy.text(f"SET search_path TO {schema}, public"))
+    connection.commit()
+
+    alembic_config = Config()
+    alembic_config.set_main_option("script_location", str(ALEMBIC_DIR))
+    alembic_config.attributes["connection"] = connection
+    try:
+        command.upgrade(alembic_config, "head")
+        connection.commit()
+        yield connection
+    finally:
+        connection.rollback()
+        connection.execute(sqlalchemy.text(f"DROP SCHEMA {schema} CASCADE"))
+        connection.commit()
+        connection.close()
+        engine.dispose()
+
+
+def test_upgrade_creates_every_table_the_code_queries(migrated) -> None:
+    tables = set(
+        migrated.execute(
+            sqlalchemy.text(
+                "SELECT tablename FROM pg_tables WHERE schemaname = current_schema()"
+            )
+        ).scalars()
+    )
+    for table in (
+        "potion_inventory",
+        "gold_ledger",
+        "ml_ledger",
+        "potion_ledger",
+        "capacity_ledger",
+        "orders",
+        "order_items",
+        "carts",
+        "cart_items",
+        "potions",
+        "ledger_balances",
+    ):
+        assert table in tables
+
+
+@pytest.mark.parametrize("name", sorted(ENDPOINT_QUERIES))
+def test_endpoint_query_uses_an_index(migrated, name: str) -> None:
+    table, statement, params = ENDPOINT_QUERIES[name]
+    # With sequential scans priced out, the planner only picks one when no
+    # index can answer the query.
+    migrated.execute(sqlalchemy.text("SET LOCAL enable_seqscan = off"))
+    explain = sqlalchemy.text(f"EXPLAIN {statement.text}")
+    plan = "\n".join(migrated.execute(explain, params).scalars())
+    migrated.rollback()
+
+    assert f"Seq Scan on {table}" not in plan, plan
@@ -0,0 +1,35 @@
+from src import ledger, plan_cache
+
+
+def counting_plan(calls: list[int]):
+    def plan() -> list[str]:
+        calls.append(1)
+        return ["plan"]
+
+    return plan
+
+
+def test_identical_inputs_plan_once() -> None:
+    plan_cache.invalidate()
+    calls: list[int] = []
+
+    first = plan_cache.get_or_plan("test", ("catalog", 10000), counting_plan(calls))
+    again = plan_cache.get_or_plan("test", ("catalog", 10000), counting_plan(calls))
+    other = plan_cache.get_or_plan("test", ("catalog", 500), counting_plan(calls))
+
+    assert first is again
+    assert other == ["plan"]
+    assert len(calls) == 2
+
+
+def test_ledger_write_and_invalidate_force_a_new_plan() -> None:
+    plan_cache.invalidate()
+    calls: list[int] = []
+
+    plan_cache.get_or_plan("test", 1, counting_plan(calls))
+    ledger._bump_version()
+    plan_cache.get_or_plan("test", 1, counting_plan(calls))
+    plan_cache.invalidate()
+    plan_cache.get_or_plan("test", 1, counting_plan(calls))
+
+    assert len(calls) == 3
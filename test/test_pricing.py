@@ -0,0 +1,121 @@
+import contextlib
+from collections import namedtuple
+
+import pytest
+
+from src import game_clock, pricing
+
+PriceRow = namedtuple("PriceRow", "sku price")
+TICK = game_clock.Tick(id=11, day="Hearthday", hour=18)
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakePotionPrices:
+    """potion_prices as {(tick_id, sku): price}, shared by every connection."""
+
+    def __init__(self):
+        self.prices = {}
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        if sql.startswith("INSERT INTO potion_prices"):
+            for sku, price in zip(params["skus"], params["prices"]):
+                self.prices.setdefault((params["tick_id"], sku), price)
+            return FakeResult([])
+        return FakeResult(
+            [
+                PriceRow(sku, price)
+                for (tick_id, sku), price in self.prices.items()
+                if tick_id == params["tick_id"]
+            ]
+        )
+
+
+class FakeEngine:
+    def __init__(self, connection, fail_on_commit=False):
+        self.connection = connection
+        self.fail_on_commit = fail_on_commit
+        self.transactions = 0
+
+    @contextlib.contextmanager
+    def begin(self):
+        self.transactions += 1
+        yield self.connection
+        if self.fail_on_commit:
+            raise RuntimeError("commit failed")
+
+
+@pytest.fixture
+def stocked(monkeypatch):
+    pricing._tables.invalidate()
+    monkeypatch.setattr(pricing.forecast.demand, "ensure_loaded", lambda c: None)
+    monkeypatch.setattr(pricing.recipes.registry, "ensure_loaded", lambda c: None)
+    monkeypatch.setattr(
+        pricing.ledger, "potion_balances", lambda c: {"RED_POTION_0": 6}
+    )
+    yield
+    pricing._tables.invalidate()
+
+
+def test_price_is_base_at_target_cover() -> None:
+    assert pricing.compute_price(demand=2, stock=6) == pricing.BASE_PRICE
+
+
+def test_scarce_stock_costs_more_and_surplus_less() -> None:
+    scarce = pricing.compute_price(demand=4, stock=2)
+    surplus = pricing.compute_price(demand=1, stock=40)
+
+    assert scarce > pricing.BASE_PRICE > surplus
+
+
+def test_price_stays_within_bounds() -> None:
+    assert pricing.compute_price(demand=100, stock=0) == round(
+        pricing.BASE_PRICE * pricing.MAX_FACTOR
+    )
+    assert pricing.compute_price(demand=0, stock=10_000) == round(
+        pricing.BASE_PRICE * pricing.MIN_FACTOR
+    )
+
+
+def test_unpriced_sku_falls_back_to_base_price() -> None:
+    assert pricing.price_of({"RED_POTION_0": 62}, "RED_POTION_0") == 62
+    assert pricing.price_of({"RED_POTION_0": 62}, "GREEN_POTION_0") == 50
+
+
+def test_price_table_is_stored_before_it_is_cached(stocked, monkeypatch) -> None:
+    table = FakePotionPrices()
+    engine = FakeEngine(table)
+    monkeypatch.setattr(pricing.db, "engine", engine)
+
+    prices = pricing.current_prices(table, TICK)
+
+    assert prices == {"RED_POTION_0": table.prices[(TICK.id, "RED_POTION_0")]}
+    assert engine.transactions == 1
+    assert pricing._tables.get(TICK.id) == prices
+
+
+def test_table_stored_by_another_worker_is_used(stocked, monkeypatch) -> None:
+    table = FakePotionPrices()
+    table.prices[(TICK.id, "RED_POTION_0")] = 77
+    engine = FakeEngine(table)
+    monkeypatch.setattr(pricing.db, "engine", engine)
+
+    assert pricing.current_prices(table, TICK) == {"RED_POTION_0": 77}
+    assert engine.transactions == 0
+
+
+def test_price_table_that_fails_to_store_is_not_cached(stocked, monkeypatch) -> None:
+    table = FakePotionPrices()
+    monkeypatch.setattr(pricing.db, "engine", FakeEngine(table, fail_on_commit=True))
+
+    with pytest.raises(RuntimeError):
+        pricing.current_prices(table, TICK)
+
+    assert pricing._tables.get(TICK.id) is None
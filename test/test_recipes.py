@@ -0,0 +1,133 @@
+from collections import namedtuple
+
+from src import recipes
+from src.recipes import DEFAULT_PRICE, RecipeRegistry
+
+PotionRow = namedtuple("PotionRow", "sku name price red green blue dark")
+StockRow = namedtuple("StockRow", "sku red green blue dark")
+MovedRow = namedtuple("MovedRow", "old new")
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeConnection:
+    """Answers the registry's queries: potions, then potion_inventory."""
+
+    def __init__(self, rows, stocked=()):
+        self.rows = rows
+        self.stocked = list(stocked)
+        self.info = {}
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append((sql, params))
+        if sql.startswith("UPDATE potion_inventory"):
+            return FakeResult(
+                [MovedRow(*pair) for pair in zip(params["old"], params["new"])]
+            )
+        if "FROM potion_inventory" in sql:
+            return FakeResult(self.stocked)
+        if "FROM potions" in sql:
+            return FakeResult(self.rows)
+        return FakeResult([])
+
+
+def test_builtin_colors_round_trip() -> None:
+    registry = RecipeRegistry()
+    red = registry.for_type((100, 0, 0, 0))
+
+    assert (red.sku, red.name, red.price) == ("RED_POTION_0", "red potion", 50)
+    assert registry.for_sku("RED_POTION_0") is red
+
+
+def test_mixes_get_a_generated_recipe_once() -> None:
+    registry = RecipeRegistry()
+    mix = registry.for_type((50, 0, 50, 0))
+
+    assert (mix.sku, mix.name, mix.price) == ("50_0_50_0", "50_0_50_0 potion", 50)
+    assert registry.for_type((50, 0, 50, 0)) is mix
+    assert registry.for_sku("50_0_50_0") is mix
+
+
+def test_unknown_skus_have_no_recipe() -> None:
+    registry = RecipeRegistry()
+
+    assert registry.for_sku("PURPLE_POTION_0") is None
+    assert registry.for_sku("50_0_40_0") is None
+    # A color's mix string is not a second name for it.
+    assert registry.for_sku("100_0_0_0") is None
+
+
+def test_load_replaces_recipes_from_the_potions_table() -> None:
+    registry = RecipeRegistry()
+    registry.for_type((50, 0, 50, 0))
+    registry.load(
+        FakeConnection(
+            [PotionRow("PURPLE_POTION_0", "purple potion", 65, 50, 0, 50, 0)]
+        )
+    )
+
+    purple = registry.for_type((50, 0, 50, 0))
+    assert (purple.sku, purple.price) == ("PURPLE_POTION_0", 65)
+    assert registry.for_sku("PURPLE_POTION_0") is purple
+    # The generated name stays an alias, so carts holding it still resolve.
+    assert registry.for_sku("50_0_50_0") is purple
+    assert registry.for_sku("RED_POTION_0").price == DEFAULT_PRICE
+    assert registry.loaded
+
+
+def test_load_moves_stock_to_a_renamed_mix() -> None:
+    registry = RecipeRegistry()
+    connection = FakeConnection(
+        [PotionRow("PURPLE_POTION_0", "purple potion", 65, 50, 0, 50, 0)],
+        stocked=[
+            StockRow("50_0_50_0", 50, 0, 50, 0),
+            StockRow("RED_POTION_0", 100, 0, 0, 0),
+        ],
+    )
+    registry.load(connection)
+
+    renames = [
+        params for sql, params in connection.statements if sql.startswith("UPDATE")
+    ]
+    # The stock row, then the mix's potion_ledger entries.
+    assert [params["old"] for params in renames] == [["50_0_50_0"], ["50_0_50_0"]]
+    assert all(params["new"] == ["PURPLE_POTION_0"] for params in renames)
+    assert any("ledger_balances" in sql for sql, _ in connection.statements)
+    assert connection.info["ledger_written"]
+
+    skus, prices = registry.sku_prices()
+    assert dict(zip(skus, prices))["50_0_50_0"] == 65
+
+
+def test_ensure_loaded_reloads_once_stale() -> None:
+    registry = RecipeRegistry()
+    connection = FakeConnection(
+        [PotionRow("PURPLE_POTION_0", "purple potion", 65, 50, 0, 50, 0)]
+    )
+    registry.load(FakeConnection([]))
+    registry.ensure_loaded(connection)
+    assert registry.for_sku("PURPLE_POTION_0") is None
+
+    registry.loaded_at -= recipes.RELOAD_SECONDS + 1
+    registry.ensure_loaded(connection)
+    assert registry.for_sku("PURPLE_POTION_0").price == 65
+
+
+def test_sku_prices_follow_new_recipes() -> None:
+    registry = RecipeRegistry()
+    skus, prices = registry.sku_prices()
+    assert "50_0_50_0" not in skus
+    assert len(skus) == len(prices)
+
+    registry.for_type((50, 0, 50, 0))
+    skus, prices = registry.sku_prices()
+    assert "50_0_50_0" in skus
+    assert registry.sku_prices() is registry.sku_prices()
@@ -0,0 +1,48 @@
+import threading
+
+from src.visits import VisitRow, VisitWriter
+
+
+class RecordingWriter(VisitWriter):
+    def __init__(self, **kwargs):
+        super().__init__(engine=None, **kwargs)
+        self.writes: list[list[VisitRow]] = []
+        self.release = threading.Event()
+
+    def write(self, rows):
+        self.release.wait(5)
+        self.writes.append(list(rows))
+
+
+def row(visit_id: int, customer_id: str) -> VisitRow:
+    return VisitRow(visit_id, customer_id, "Ana", "Wizard", 3)
+
+
+def test_batches_queued_during_a_write_are_written_together() -> None:
+    writer = RecordingWriter()
+    writer.submit([row(1, "a")])
+    writer.submit([row(2, "b")])
+    writer.submit([row(3, "c"), row(3, "d")])
+    writer.release.set()
+    writer.flush()
+    writer.stop()
+
+    assert [r for batch in writer.writes for r in batch] == [
+        row(1, "a"),
+        row(2, "b"),
+        row(3, "c"),
+        row(3, "d"),
+    ]
+    assert len(writer.writes) <= 2
+
+
+def test_submit_drops_batches_when_queue_is_full() -> None:
+    writer = RecordingWriter(max_pending=1)
+    writer.submit([row(1, "a")])
+
+    results = [writer.submit([row(i, "b")]) for i in range(2, 5)]
+    writer.release.set()
+    writer.flush()
+    writer.stop()
+
+    assert False in results